@@ -56,13 +56,43 @@ TEMPLATES = [
 
 ASGI_APPLICATION = 'FeedbackAnalysisConfig.asgi.application'
 
-CHANNEL_LAYERS = {
+WSGI_APPLICATION = 'FeedbackAnalysisConfig.wsgi.application'
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    # Realtime feedback events reach sockets held by every worker process
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Realtime dashboard fan-out (feedback/realtime.py): events are batched per process before being sent
+REALTIME_FLUSH_INTERVAL = config('REALTIME_FLUSH_INTERVAL', default=0.5, cast=float)
+REALTIME_MAX_BATCH = config('REALTIME_MAX_BATCH', default=200, cast=int)
+
+CACHES = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
 }
 
-WSGI_APPLICATION = 'FeedbackAnalysisConfig.wsgi.application'
+if REDIS_URL:
+    # Shared between all gunicorn workers
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
 
 DATABASES = {
     'default': {
@@ -75,9 +105,28 @@ COSMOS_DB = {
     'ENDPOINT': config('COSMOS_DB_ENDPOINT'),
     'PRIMARY_KEY': config('COSMOS_DB_PRIMARY_KEY'),
     'DATABASE': 'SentimentAnalysisDB',
-    'CONTAINER': 'FeedbackResults'
+    'CONTAINER': 'FeedbackResults',
+    # Items carry a month bucket in 'pk' (see cosmos_db_utils.partition_bucket); containers created
+    # before the partition scheme keep their own path, e.g. COSMOS_DB_PARTITION_KEY_PATH=/id
+    'PARTITION_KEY_PATH': config('COSMOS_DB_PARTITION_KEY_PATH', default='/pk'),
 }
 
+# Cosmos writes go through a local outbox table and are flushed in batches per partition
+COSMOS_OUTBOX_BATCH_SIZE = config('COSMOS_OUTBOX_BATCH_SIZE', default=100, cast=int)
+COSMOS_OUTBOX_FLUSH_WINDOW = config('COSMOS_OUTBOX_FLUSH_WINDOW', default=0.5, cast=float)
+COSMOS_OUTBOX_SWEEP_INTERVAL = config('COSMOS_OUTBOX_SWEEP_INTERVAL', default=30.0, cast=float)
+COSMOS_OUTBOX_LEASE_SECONDS = config('COSMOS_OUTBOX_LEASE_SECONDS', default=60, cast=int)
+# Start each server process's sweeper at startup; off when a `flush_cosmos_outbox --loop` process does the sweeping
+COSMOS_OUTBOX_AUTOSTART = config('COSMOS_OUTBOX_AUTOSTART', default=True, cast=bool)
+
+# Memory-mapped columnar snapshot of analyzed feedback behind the sentiment_trends endpoint
+SENTIMENT_SNAPSHOT_DIR = config('SENTIMENT_SNAPSHOT_DIR', default=str(BASE_DIR / 'snapshots' / 'sentiment'))
+SENTIMENT_SNAPSHOT_MAX_AGE = config('SENTIMENT_SNAPSHOT_MAX_AGE', default=5 * 60, cast=int)
+# Newest seconds of Cosmos writes (by _ts) left to the next refresh, as a margin for clock skew
+SENTIMENT_SNAPSHOT_LAG = config('SENTIMENT_SNAPSHOT_LAG', default=60, cast=int)
+# Most buckets one sentiment_trends response may hold (e.g. about 83 days of hourly buckets)
+SENTIMENT_TRENDS_MAX_BUCKETS = config('SENTIMENT_TRENDS_MAX_BUCKETS', default=2000, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -106,10 +155,108 @@ CSRF_TRUSTED_ORIGINS = ['https://mysentimentanalysisapp.azurewebsites.net']
 AZURE_SENTIMENT_ENDPOINT = config('AZURE_SENTIMENT_ENDPOINT')
 AZURE_SUBSCRIPTION_KEY = config('AZURE_SUBSCRIPTION_KEY')
 
+# Dotted path of the analysis backend; 'feedback.analysis.LocalBackend' runs offline for tests and benchmarks
+ANALYSIS_BACKEND = config('ANALYSIS_BACKEND', default='feedback.analysis.AzureTextAnalyticsBackend')
+
+# submit_feedback saves the row and analyzes it in a background worker pool
+FEEDBACK_ASYNC_ANALYSIS = config('FEEDBACK_ASYNC_ANALYSIS', default=True, cast=bool)
+BACKGROUND_WORKERS = config('BACKGROUND_WORKERS', default=4, cast=int)
+TASK_MAX_ATTEMPTS = config('TASK_MAX_ATTEMPTS', default=4, cast=int)
+TASK_RETRY_BACKOFF = config('TASK_RETRY_BACKOFF', default=1.0, cast=float)
+TASK_RETRY_BACKOFF_MAX = config('TASK_RETRY_BACKOFF_MAX', default=30.0, cast=float)
+# Job status must be readable from every worker process, so it never uses the per-process LocMemCache:
+# Redis when configured, otherwise a database table created by `manage.py createcachetable`
+CACHES['jobs'] = {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'job_status_cache',
+}
+JOB_STATUS_CACHE = 'shared' if REDIS_URL else 'jobs'
+JOB_STATUS_TTL = config('JOB_STATUS_TTL', default=7 * 24 * 60 * 60, cast=int)
+
+# Bulk feedback import (manage.py import_feedback and the import_feedback endpoint)
+IMPORT_CHUNK_SIZE = config('IMPORT_CHUNK_SIZE', default=100, cast=int)
+IMPORT_PARALLELISM = config('IMPORT_PARALLELISM', default=4, cast=int)
+IMPORT_UPLOAD_DIR = BASE_DIR / 'media' / 'imports'
+
+# Archive-and-purge of old feedback (feedback/archival.py)
+FEEDBACK_ARCHIVE_DIR = config('FEEDBACK_ARCHIVE_DIR', default=str(BASE_DIR / 'media' / 'archives'))
+FEEDBACK_ARCHIVE_CHUNK_SIZE = config('FEEDBACK_ARCHIVE_CHUNK_SIZE', default=1000, cast=int)
+
+# Single-document analysis requests are collected into multi-document calls (the service takes up to 10)
+TEXT_ANALYTICS_BATCH_SIZE = config('TEXT_ANALYTICS_BATCH_SIZE', default=10, cast=int)
+TEXT_ANALYTICS_BATCH_WAIT_MS = config('TEXT_ANALYTICS_BATCH_WAIT_MS', default=20, cast=int)
+TEXT_ANALYTICS_MAX_BATCHES_IN_FLIGHT = config('TEXT_ANALYTICS_MAX_BATCHES_IN_FLIGHT', default=4, cast=int)
+
+# Analysis results keyed by normalized text and options; the shared tier is used when a 'shared' cache exists
+ANALYSIS_CACHE_MAX_ENTRIES = config('ANALYSIS_CACHE_MAX_ENTRIES', default=2048, cast=int)
+ANALYSIS_CACHE_TTL = config('ANALYSIS_CACHE_TTL', default=24 * 60 * 60, cast=int)
+ANALYSIS_CACHE_SHARED_ALIAS = config('ANALYSIS_CACHE_SHARED_ALIAS', default='shared' if REDIS_URL else '')
+
+# Lesson transcripts cached by blob name (feedback/transcript_cache.py), revalidated by ETag once this old
+TRANSCRIPT_CACHE_DIR = config('TRANSCRIPT_CACHE_DIR', default=str(BASE_DIR / 'media' / 'transcript_cache'))
+TRANSCRIPT_CACHE_MAX_ENTRIES = config('TRANSCRIPT_CACHE_MAX_ENTRIES', default=64, cast=int)
+TRANSCRIPT_CACHE_REVALIDATE_AFTER = config('TRANSCRIPT_CACHE_REVALIDATE_AFTER', default=5 * 60, cast=int)
+
 AZURE_STORAGE_ACCOUNT_NAME = config('AZURE_STORAGE_ACCOUNT_NAME')
 AZURE_STORAGE_ACCOUNT_KEY = config('AZURE_STORAGE_ACCOUNT_KEY')
 AZURE_STORAGE_CONTAINER_NAME = config('AZURE_STORAGE_CONTAINER_NAME')
 AZURE_STORAGE_CONTAINER_TRANSCRIPT = config('AZURE_STORAGE_CONTAINER_TRANSCRIPT', default='transcript')
 AZURE_STORAGE_CONNECTION_STRING = config('AZURE_STORAGE_CONNECTION_STRING')
 
-OPENAI_API_KEY = config('OPENAI_API_KEY')
\ No newline at end of file
+OPENAI_API_KEY = config('OPENAI_API_KEY')
+
+OLLAMA_GENERATE_URL = config('OLLAMA_GENERATE_URL', default='http://localhost:11434/api/generate')
+
+# Pooled, keep-alive HTTP clients (one set per worker process)
+HTTP_POOL_CONNECTIONS = config('HTTP_POOL_CONNECTIONS', default=4, cast=int)
+HTTP_POOL_MAXSIZE = config('HTTP_POOL_MAXSIZE', default=16, cast=int)
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=5, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=30, cast=float)
+LLM_READ_TIMEOUT = config('LLM_READ_TIMEOUT', default=300, cast=float)
+# Connection limit of the shared aiohttp session used by the async views (one per event loop)
+ASYNC_HTTP_POOL_MAXSIZE = config('ASYNC_HTTP_POOL_MAXSIZE', default=200, cast=int)
+
+# LLM gateway (feedback/llm_gateway.py), per worker process: concurrent calls to the model server, how many
+# may queue behind them and for how long, and the circuit breaker. Summaries queue behind chat.
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=2, cast=int)
+LLM_MAX_QUEUE = config('LLM_MAX_QUEUE', default=20, cast=int)
+LLM_QUEUE_TIMEOUT = config('LLM_QUEUE_TIMEOUT', default=30, cast=float)
+LLM_CHAT_DEADLINE = config('LLM_CHAT_DEADLINE', default=120, cast=float)
+LLM_SUMMARY_DEADLINE = config('LLM_SUMMARY_DEADLINE', default=LLM_READ_TIMEOUT, cast=float)
+LLM_CIRCUIT_FAILURE_THRESHOLD = config('LLM_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+LLM_CIRCUIT_RESET_TIMEOUT = config('LLM_CIRCUIT_RESET_TIMEOUT', default=30, cast=float)
+
+# Persistent lesson summaries (feedback/summaries.py)
+LESSON_SUMMARY_CLAIM_TIMEOUT = config('LESSON_SUMMARY_CLAIM_TIMEOUT', default=LLM_READ_TIMEOUT + 30, cast=float)
+LESSON_SUMMARY_PRECOMPUTE = config('LESSON_SUMMARY_PRECOMPUTE', default=False, cast=bool)
+# Transcripts longer than this are summarized section by section, then the section summaries are combined
+SUMMARY_SECTION_WORDS = config('SUMMARY_SECTION_WORDS', default=1500, cast=int)
+SUMMARY_MAP_PARALLELISM = config('SUMMARY_MAP_PARALLELISM', default=4, cast=int)
+
+# Transcript retrieval for chatbot prompts (feedback/retrieval.py)
+RETRIEVAL_INDEX_DIR = config('RETRIEVAL_INDEX_DIR', default=str(BASE_DIR / 'media' / 'transcript_index'))
+RETRIEVAL_CHUNK_WORDS = config('RETRIEVAL_CHUNK_WORDS', default=200, cast=int)
+RETRIEVAL_TOP_K = config('RETRIEVAL_TOP_K', default=4, cast=int)
+
+# Chatbot sessions reusing the model's context between turns (feedback/chat_sessions.py). Without Redis,
+# sessions are per worker: a turn served by another worker starts a new session.
+CHAT_SESSION_IDLE_TIMEOUT = config('CHAT_SESSION_IDLE_TIMEOUT', default=1800, cast=int)
+CHAT_SESSION_MAX_SESSIONS = config('CHAT_SESSION_MAX_SESSIONS', default=500, cast=int)
+# Context tokens kept per session; past this the conversation restarts (llama2's window is 4096 tokens)
+CHAT_SESSION_MAX_CONTEXT = config('CHAT_SESSION_MAX_CONTEXT', default=3500, cast=int)
+CACHES['chat_sessions'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'chat-sessions',
+    'TIMEOUT': CHAT_SESSION_IDLE_TIMEOUT,
+    'OPTIONS': {'MAX_ENTRIES': CHAT_SESSION_MAX_SESSIONS},
+}
+CHAT_SESSION_CACHE = config('CHAT_SESSION_CACHE', default='shared' if REDIS_URL else 'chat_sessions')
+
+# Streaming uploads to Blob Storage (feedback/uploads.py): an upload holds at most
+# BLOB_UPLOAD_PARALLELISM + 1 blocks in memory; the pool is shared by all uploads of a worker
+BLOB_UPLOAD_BLOCK_SIZE = config('BLOB_UPLOAD_BLOCK_SIZE', default=4 * 1024 * 1024, cast=int)
+BLOB_UPLOAD_PARALLELISM = config('BLOB_UPLOAD_PARALLELISM', default=4, cast=int)
+BLOB_UPLOAD_POOL_SIZE = config('BLOB_UPLOAD_POOL_SIZE', default=16, cast=int)
+BLOB_UPLOAD_BLOCK_RETRIES = config('BLOB_UPLOAD_BLOCK_RETRIES', default=3, cast=int)
+# Chunk size of blob downloads; the streaming transcript download holds one chunk at a time
+BLOB_DOWNLOAD_CHUNK_SIZE = config('BLOB_DOWNLOAD_CHUNK_SIZE', default=4 * 1024 * 1024, cast=int)
\ No newline at end of file
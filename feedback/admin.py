@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Feedback
+from .models import CustomUser, Feedback, CosmosOutbox, SentimentRollup, LessonSummary
 
 
 class CustomUserAdmin(UserAdmin):
@@ -14,4 +14,7 @@ class CustomUserAdmin(UserAdmin):
 
 
 admin.site.register(CustomUser, CustomUserAdmin)
-admin.site.register(Feedback)
\ No newline at end of file
+admin.site.register(Feedback)
+admin.site.register(CosmosOutbox)
+admin.site.register(SentimentRollup)
+admin.site.register(LessonSummary)
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import re
+import uuid
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .analysis_cache import analysis_cache
+from .batching import DocumentBatcher
+from .clients import get_text_analytics_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SentimentScores:
+    positive: float
+    neutral: float
+    negative: float
+
+
+@dataclass
+class Assessment:
+    text: str
+    sentiment: str
+    confidence_scores: SentimentScores
+
+
+@dataclass
+class Opinion:
+    target: str
+    sentiment: str
+    assessments: list = field(default_factory=list)
+
+
+@dataclass
+class AnalysisResult:
+    sentiment: str
+    scores: SentimentScores
+    key_phrases: list = field(default_factory=list)
+    opinions: list = field(default_factory=list)
+
+    @classmethod
+    def from_documents(cls, sentiment_doc, key_phrases_doc=None):
+        opinions = [
+            Opinion(
+                target=mined_opinion.target.text,
+                sentiment=mined_opinion.target.sentiment,
+                assessments=[
+                    Assessment(assessment.text, assessment.sentiment, _scores(assessment.confidence_scores))
+                    for assessment in mined_opinion.assessments
+                ],
+            )
+            for sentence in sentiment_doc.sentences
+            for mined_opinion in sentence.mined_opinions or []
+        ]
+        return cls(
+            sentiment=sentiment_doc.sentiment,
+            scores=_scores(sentiment_doc.confidence_scores),
+            key_phrases=list(key_phrases_doc.key_phrases) if key_phrases_doc else [],
+            opinions=opinions,
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            sentiment=data['sentiment'],
+            scores=SentimentScores(**data['overall_scores']),
+            key_phrases=data['key_phrases'],
+            opinions=[
+                Opinion(
+                    target=opinion['target'],
+                    sentiment=opinion['sentiment'],
+                    assessments=[
+                        Assessment(a['text'], a['sentiment'], SentimentScores(**a['confidence_scores']))
+                        for a in opinion['assessments']
+                    ],
+                )
+                for opinion in data['opinions']
+            ],
+        )
+
+    def to_dict(self):
+        data = asdict(self)
+        return {
+            'sentiment': data['sentiment'],
+            'overall_scores': data['scores'],
+            'key_phrases': data['key_phrases'],
+            'opinions': data['opinions'],
+        }
+
+    def to_feedback_fields(self):
+        data = self.to_dict()
+        return {
+            'sentiment': self.sentiment,
+            'score_positive': self.scores.positive,
+            'score_neutral': self.scores.neutral,
+            'score_negative': self.scores.negative,
+            'key_phrases': data['key_phrases'],
+            'opinions': data['opinions'],
+        }
+
+    def to_cosmos(self, feedback_text, user_id):
+        return {
+            'id': str(uuid.uuid4()),
+            'feedback_text': feedback_text,
+            'overall_sentiment': self.sentiment,
+            'confidence_score_positive': self.scores.positive,
+            'confidence_score_neutral': self.scores.neutral,
+            'confidence_score_negative': self.scores.negative,
+            'key_phrases': self.key_phrases,
+            'opinions': self.to_dict()['opinions'],
+            'timestamp': datetime.utcnow().isoformat(),
+            'user_id': user_id
+        }
+
+
+def _scores(confidence_scores):
+    return SentimentScores(confidence_scores.positive, confidence_scores.neutral, confidence_scores.negative)
+
+
+class AzureTextAnalyticsBackend:
+    def __init__(self):
+        self.opinion_sentiment = self._batcher(
+            'sentiment-opinions',
+            lambda documents: get_text_analytics_client().analyze_sentiment(documents=documents,
+                                                                            show_opinion_mining=True)
+        )
+        self.sentiment = self._batcher(
+            'sentiment',
+            lambda documents: get_text_analytics_client().analyze_sentiment(documents=documents)
+        )
+        self.key_phrases = self._batcher(
+            'key-phrases',
+            lambda documents: get_text_analytics_client().extract_key_phrases(documents=documents)
+        )
+
+    @staticmethod
+    def _batcher(name, operation):
+        return DocumentBatcher(
+            name,
+            operation,
+            max_batch_size=settings.TEXT_ANALYTICS_BATCH_SIZE,
+            max_wait_ms=settings.TEXT_ANALYTICS_BATCH_WAIT_MS,
+            max_in_flight=settings.TEXT_ANALYTICS_MAX_BATCHES_IN_FLIGHT,
+        )
+
+    def submit_sentiment(self, text, opinion_mining=True):
+        return (self.opinion_sentiment if opinion_mining else self.sentiment).submit(text)
+
+    def submit_key_phrases(self, text):
+        return self.key_phrases.submit(text)
+
+
+class LocalBackend:
+    """
+    Offline word-list backend with the same document shapes as Azure, for
+    tests and benchmarks.
+    """
+
+    POSITIVE_WORDS = {'good', 'great', 'excellent', 'helpful', 'clear', 'love', 'liked', 'useful', 'amazing', 'easy'}
+    NEGATIVE_WORDS = {'bad', 'poor', 'boring', 'confusing', 'hard', 'hate', 'slow', 'unclear', 'useless', 'difficult'}
+    STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'is', 'was', 'it', 'this', 'that', 'to', 'of', 'in', 'i',
+                  'very', 'so', 'for', 'on', 'with', 'be', 'are', 'were', 'my', 'me', 'we', 'you'}
+
+    def submit_sentiment(self, text, opinion_mining=True):
+        words = re.findall(r"[a-z']+", text.lower())
+        positive = sum(word in self.POSITIVE_WORDS for word in words)
+        negative = sum(word in self.NEGATIVE_WORDS for word in words)
+        total = positive + negative + 1
+        scores = SimpleNamespace(positive=positive / total, neutral=1 / total, negative=negative / total)
+        sentiment = 'positive' if positive > negative else 'negative' if negative > positive else 'neutral'
+        document = SimpleNamespace(sentiment=sentiment, confidence_scores=scores,
+                                   sentences=[SimpleNamespace(mined_opinions=[] if opinion_mining else None)])
+        return _completed(document)
+
+    def submit_key_phrases(self, text):
+        words = [word for word in re.findall(r"[a-z']+", text.lower()) if word not in self.STOP_WORDS]
+        return _completed(SimpleNamespace(key_phrases=[word for word, _ in Counter(words).most_common(5)]))
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class AnalysisEngine:
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+
+    def analyze(self, text, opinion_mining=True, key_phrases=True):
+        cache_key = self.cache.make_key(text, opinion_mining=opinion_mining, key_phrases=key_phrases) \
+            if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return AnalysisResult.from_dict(cached)
+
+        # Both requests are in flight at once, so latency is the slower call rather than the sum.
+        sentiment_future = self.backend.submit_sentiment(text, opinion_mining=opinion_mining)
+        key_phrases_future = self.backend.submit_key_phrases(text) if key_phrases else None
+
+        result = AnalysisResult.from_documents(
+            sentiment_future.result(),
+            key_phrases_future.result() if key_phrases_future else None,
+        )
+        if cache_key:
+            self.cache.set(cache_key, result.to_dict())
+        return result
+
+    def analyze_many(self, texts, opinion_mining=True, key_phrases=True):
+        # Every document is submitted before any result is awaited, so the batcher
+        # packs them into full multi-document calls. Failed documents come back as exceptions.
+        pending = []
+        results = [None] * len(texts)
+        for index, text in enumerate(texts):
+            cache_key = self.cache.make_key(text, opinion_mining=opinion_mining, key_phrases=key_phrases) \
+                if self.cache else None
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                results[index] = AnalysisResult.from_dict(cached)
+                continue
+            pending.append((
+                index,
+                cache_key,
+                self.backend.submit_sentiment(text, opinion_mining=opinion_mining),
+                self.backend.submit_key_phrases(text) if key_phrases else None,
+            ))
+
+        for index, cache_key, sentiment_future, key_phrases_future in pending:
+            try:
+                result = AnalysisResult.from_documents(
+                    sentiment_future.result(),
+                    key_phrases_future.result() if key_phrases_future else None,
+                )
+            except Exception as e:
+                results[index] = e
+                continue
+            if cache_key:
+                self.cache.set(cache_key, result.to_dict())
+            results[index] = result
+        return results
+
+    async def aanalyze(self, text, opinion_mining=True, key_phrases=True):
+        # The shared cache tier may do network I/O, so cache access runs off the event loop.
+        cache_key = self.cache.make_key(text, opinion_mining=opinion_mining, key_phrases=key_phrases) \
+            if self.cache else None
+        if cache_key:
+            cached = await sync_to_async(self.cache.get, thread_sensitive=False)(cache_key)
+            if cached is not None:
+                return AnalysisResult.from_dict(cached)
+
+        # The backend futures resolve on the batcher threads; awaiting them holds no thread per request.
+        sentiment_future = asyncio.wrap_future(self.backend.submit_sentiment(text, opinion_mining=opinion_mining))
+        key_phrases_future = asyncio.wrap_future(self.backend.submit_key_phrases(text)) if key_phrases else None
+
+        result = AnalysisResult.from_documents(
+            await sentiment_future,
+            await key_phrases_future if key_phrases_future else None,
+        )
+        if cache_key:
+            await sync_to_async(self.cache.set, thread_sensitive=False)(cache_key, result.to_dict())
+        return result
+
+
+analysis_engine = AnalysisEngine(import_string(settings.ANALYSIS_BACKEND)(), cache=analysis_cache)
@@ -0,0 +1,110 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    # Pasted copies of the same feedback usually differ only in Unicode forms and whitespace.
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache for analysis results. The memory tier is an LRU
+    shared by the threads of one process; the optional shared tier is a Django
+    cache alias (e.g. Redis) shared by all gunicorn workers.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, shared_alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(text, **options):
+        payload = json.dumps([normalize_text(text), sorted(options.items())], separators=(',', ':'))
+        return 'analysis:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = self._shared_get(key)
+        if value is not None:
+            self._memory_set(key, value)
+            with self._lock:
+                self._counters['shared_hits'] += 1
+            return copy.deepcopy(value)
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        value = copy.deepcopy(value)
+        self._memory_set(key, value)
+        self._shared_set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['memory_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _memory_set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _shared_get(self, key):
+        if not self.shared_alias:
+            return None
+        try:
+            return caches[self.shared_alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared analysis cache unavailable: {str(e)}")
+            return None
+
+    def _shared_set(self, key, value):
+        if not self.shared_alias:
+            return
+        try:
+            caches[self.shared_alias].set(key, value, timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"Shared analysis cache unavailable: {str(e)}")
+
+
+analysis_cache = AnalysisCache(
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl=settings.ANALYSIS_CACHE_TTL,
+    shared_alias=settings.ANALYSIS_CACHE_SHARED_ALIAS,
+)
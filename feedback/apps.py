@@ -1,7 +1,28 @@
 # feedback/apps.py
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _serving():
+    # Background threads belong to server processes (gunicorn, daphne, runserver's reloaded child),
+    # not to migrate, test or one-off management commands.
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program not in ('manage.py', 'django-admin', '__main__.py'):
+        return True
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
 
 
 class FeedbackConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'feedback'
\ No newline at end of file
+    name = 'feedback'
+
+    def ready(self):
+        # Rows left in the outbox by a crash or a failed flush are retried without waiting for new writes.
+        if settings.COSMOS_OUTBOX_AUTOSTART and _serving():
+            from .outbox import outbox_flusher
+            outbox_flusher.start()
\ No newline at end of file
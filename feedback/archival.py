@@ -0,0 +1,57 @@
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Feedback
+
+logger = logging.getLogger(__name__)
+
+
+def archive_feedback(older_than_days=None, chunk_size=None, progress=None):
+    """
+    Copies feedback into a gzipped JSONL file and deletes it, one primary-key chunk at a time.
+    Each chunk is flushed to the archive before its short delete transaction, so an interrupted
+    run loses nothing and a rerun continues with the rows that are left.
+    """
+    chunk_size = chunk_size or settings.FEEDBACK_ARCHIVE_CHUNK_SIZE
+    selected = Feedback.objects.all()
+    cutoff = None
+    if older_than_days is not None:
+        cutoff = timezone.now() - timedelta(days=int(older_than_days))
+        selected = selected.filter(submitted_at__lt=cutoff)
+
+    os.makedirs(settings.FEEDBACK_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.FEEDBACK_ARCHIVE_DIR, f"feedback-{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz")
+
+    archived, last_id = 0, 0
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        while True:
+            rows = list(selected.filter(id__gt=last_id).order_by('id').values()[:chunk_size])
+            if not rows:
+                break
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            archive.flush()
+
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                selected.filter(id__in=ids).delete()
+            archived += len(rows)
+            last_id = ids[-1]
+            if progress:
+                progress(archived=archived, last_id=last_id, path=path)
+
+    if not archived:
+        os.remove(path)
+        path = None
+    logger.info(f"Archived and deleted {archived} feedback rows"
+                f"{f' older than {cutoff:%Y-%m-%d %H:%M}' if cutoff else ''} to {path}")
+    return {'archived': archived, 'path': path}
@@ -0,0 +1,206 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_http_methods
+
+from .analysis import analysis_engine
+from .azure_storage import adownload_file
+from .chat_sessions import chat_sessions, session_owner
+from .downloads import atranscript_download
+from .llm import aget_chatbot_response, astream_chatbot_response, CHAT_ERROR, SUMMARY_ERROR
+from .llm_gateway import LLMUnavailable, unavailable_response
+from .outbox import enqueue_cosmos_write
+from .realtime import analysis_event, feedback_publisher
+from .retrieval import index_transcript
+from .streaming import asse_stream, sse_response
+from .summaries import lesson_summaries, precompute_lesson_summary
+from .tasks import get_executor
+from .uploads import BlobUploadHandler, can_upload
+
+logger = logging.getLogger(__name__)
+
+# Async counterparts of the I/O-bound views, served under /feedback/async/ when running on ASGI
+# (uvicorn/daphne). A single worker keeps many of these in flight while waiting on Azure or Ollama.
+
+
+async def _user_id(request):
+    user = await request.auser()
+    return str(user.id) if user.is_authenticated else 'anonymous'
+
+
+async def _queue_cosmos_write(cosmos_data):
+    await sync_to_async(enqueue_cosmos_write)(cosmos_data)
+
+
+@csrf_exempt
+async def analyze_feedback(request):
+    if request.method == 'POST':
+        feedback_text = request.POST.get('feedback', '')
+        if not feedback_text:
+            return JsonResponse({'error': 'No feedback provided'}, status=400)
+
+        try:
+            result = await analysis_engine.aanalyze(feedback_text)
+
+            # Queue for Cosmos DB
+            await _queue_cosmos_write(result.to_cosmos(feedback_text, await _user_id(request)))
+            feedback_publisher.publish(analysis_event(result))
+
+            return JsonResponse({'results': [result.to_dict()]})
+        except Exception as e:
+            logger.error(f"Error in analyze_feedback: {str(e)}", exc_info=True)
+            return JsonResponse({'error': 'Failed to analyze sentiment due to a server error'}, status=500)
+    else:
+        return render(request, 'feedback/form.html')
+
+
+@csrf_exempt
+async def analyze_feedback_bot(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            feedback_text = data.get('feedback')
+
+            if not feedback_text:
+                return JsonResponse({'error': 'No feedback provided'}, status=400)
+
+            result = await analysis_engine.aanalyze(feedback_text)
+
+            # Queue the feedback for Cosmos DB
+            await _queue_cosmos_write(result.to_cosmos(feedback_text, await _user_id(request)))
+            feedback_publisher.publish(analysis_event(result))
+
+            return JsonResponse({'status': 'success', 'message': 'Feedback submitted successfully'})
+
+        except Exception as e:
+            logger.error(f"Error in analyze_feedback_bot: {str(e)}", exc_info=True)
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+@csrf_exempt
+@require_POST
+async def upload_transcript(request):
+    if not can_upload(await request.auser()):
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    # Parsing the body stages the blocks (see uploads.py), so it runs in a worker thread
+    request.upload_handlers = [BlobUploadHandler(request)]
+    files = await sync_to_async(lambda: request.FILES, thread_sensitive=False)()
+    if 'file' not in files:
+        return JsonResponse({'error': 'No file provided'}, status=400)
+
+    file = files['file']
+    if file.error is None:
+        # Lecture media goes through the same endpoint; only transcripts are indexed and summarized
+        if (file.content_type or '').startswith('text/'):
+            get_executor().submit(index_transcript, file.name)
+            if settings.LESSON_SUMMARY_PRECOMPUTE:
+                get_executor().submit(precompute_lesson_summary, file.name)
+        return JsonResponse({'message': 'File uploaded successfully'})
+    else:
+        return JsonResponse({'error': 'Failed to upload file'}, status=500)
+
+
+async def get_transcript(request, blob_name):
+    try:
+        transcript = await adownload_file(blob_name)
+        return JsonResponse({'transcript': transcript})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_http_methods(['GET', 'HEAD'])
+async def download_transcript(request, blob_name):
+    return await atranscript_download(request, blob_name)
+
+
+@csrf_exempt
+async def chatbot(request):
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        message = data.get('message')
+        transcript_name = data.get('transcript_name')
+
+        if not message or not transcript_name:
+            return JsonResponse({'error': 'No message or transcript name provided'}, status=400)
+
+        transcript = await adownload_file(transcript_name)
+        if transcript is None:
+            return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
+
+        try:
+            if 'session_id' not in data:
+                return JsonResponse({'response': await aget_chatbot_response(message, transcript)})
+            response, session_id = await chat_sessions.areply(session_owner(await request.auser()),
+                                                              data['session_id'], message, transcript)
+        except LLMUnavailable as e:
+            return unavailable_response(e)
+        return JsonResponse({'response': response, 'session_id': session_id})
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@csrf_exempt
+@require_POST
+async def chatbot_stream(request):
+    data = json.loads(request.body)
+    message = data.get('message')
+    transcript_name = data.get('transcript_name')
+
+    if not message or not transcript_name:
+        return JsonResponse({'error': 'No message or transcript name provided'}, status=400)
+
+    transcript = await adownload_file(transcript_name)
+    if transcript is None:
+        return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
+
+    if 'session_id' not in data:
+        return sse_response(asse_stream(astream_chatbot_response(message, transcript), CHAT_ERROR))
+    owner = session_owner(await request.auser())
+    session = await chat_sessions.aopen(owner, data['session_id'], transcript)
+    return sse_response(asse_stream(chat_sessions.astream(owner, session, message, transcript), CHAT_ERROR,
+                                    {'session_id': session.session_id}))
+
+
+@csrf_exempt
+@require_POST
+async def summarize_lesson(request):
+    data = json.loads(request.body)
+    transcript_name = data.get('transcript_name')
+
+    if not transcript_name:
+        return JsonResponse({'error': 'No transcript name provided'}, status=400)
+
+    try:
+        transcript = await adownload_file(transcript_name)
+        if transcript is None:
+            return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
+
+        summary = await lesson_summaries.aget(transcript)
+        return JsonResponse({'summary': summary})
+    except LLMUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error in summarize_lesson: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def summarize_lesson_stream(request):
+    data = json.loads(request.body)
+    transcript_name = data.get('transcript_name')
+
+    if not transcript_name:
+        return JsonResponse({'error': 'No transcript name provided'}, status=400)
+
+    transcript = await adownload_file(transcript_name)
+    if transcript is None:
+        return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
+
+    return sse_response(asse_stream(lesson_summaries.astream(transcript), SUMMARY_ERROR))
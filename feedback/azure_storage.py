@@ -1,40 +1,61 @@
-from azure.storage.blob import BlobServiceClient
 from django.conf import settings
 import logging
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+from . import clients
+from .transcript_cache import transcript_cache
 
 logger = logging.getLogger(__name__)
 
 def get_blob_service_client():
     try:
-        return BlobServiceClient.from_connection_string(settings.AZURE_STORAGE_CONNECTION_STRING)
+        return clients.get_blob_service_client()
     except Exception as e:
         logger.error(f"Error connecting to Azure Blob Storage: {str(e)}")
         return None
 
-def upload_file(file_content, blob_name):
-    blob_service_client = get_blob_service_client()
-    if not blob_service_client:
-        return False
-    try:
-        container_client = blob_service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT)
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(file_content, overwrite=True)
-        return True
-    except Exception as e:
-        logger.error(f"Error uploading file to Azure Blob Storage: {str(e)}")
-        return False
+def _conditional(cached):
+    # Ask storage to send the blob only if it changed since the cached copy
+    if cached is None:
+        return {}
+    return {'etag': cached.etag, 'match_condition': MatchConditions.IfModified}
 
 def download_file(blob_name):
+    cached = transcript_cache.get(blob_name)
+    if cached and cached.is_fresh(transcript_cache.revalidate_after):
+        return cached.text
+
     blob_service_client = get_blob_service_client()
     if not blob_service_client:
-        return None
+        return cached.text if cached else None
     try:
         container_client = blob_service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT)
         blob_client = container_client.get_blob_client(blob_name)
-        return blob_client.download_blob().readall().decode('utf-8')
+        downloader = blob_client.download_blob(**_conditional(cached))
+        text = downloader.readall().decode('utf-8')
+        transcript_cache.set(blob_name, text, downloader.properties.etag)
+        return text
+    except HttpResponseError as e:
+        if cached and e.status_code == 304:
+            return transcript_cache.mark_checked(blob_name, cached).text
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return cached.text if cached else None
     except Exception as e:
         logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        # A stale transcript is more useful to the chatbot than none
+        return cached.text if cached else None
+
+def get_transcript_blob_client(blob_name):
+    blob_service_client = get_blob_service_client()
+    if not blob_service_client:
         return None
+    return blob_service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT) \
+        .get_blob_client(blob_name)
+
+def aget_transcript_blob_client(blob_name):
+    blob_service_client = clients.get_async_blob_service_client()
+    return blob_service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT) \
+        .get_blob_client(blob_name)
 
 def list_blobs():
     blob_service_client = get_blob_service_client()
@@ -45,4 +66,25 @@ def list_blobs():
         return [blob.name for blob in container_client.list_blobs()]
     except Exception as e:
         logger.error(f"Error listing blobs in Azure Blob Storage: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+async def adownload_file(blob_name):
+    cached = transcript_cache.get(blob_name)
+    if cached and cached.is_fresh(transcript_cache.revalidate_after):
+        return cached.text
+
+    try:
+        blob_service_client = clients.get_async_blob_service_client()
+        container_client = blob_service_client.get_container_client(settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT)
+        downloader = await container_client.get_blob_client(blob_name).download_blob(**_conditional(cached))
+        text = (await downloader.readall()).decode('utf-8')
+        transcript_cache.set(blob_name, text, downloader.properties.etag)
+        return text
+    except HttpResponseError as e:
+        if cached and e.status_code == 304:
+            return transcript_cache.mark_checked(blob_name, cached).text
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return cached.text if cached else None
+    except Exception as e:
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return cached.text if cached else None
@@ -0,0 +1,99 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentAnalysisError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+class DocumentBatcher:
+    """
+    Collects single-document requests from concurrent callers and sends them
+    to the service as one multi-document call. Each caller gets a Future that
+    resolves to its own document result.
+    """
+
+    def __init__(self, name, operation, max_batch_size=10, max_wait_ms=20, max_in_flight=4):
+        self.name = name
+        self.operation = operation
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def submit(self, text):
+        future = Future()
+        self._ensure_started().put((text, future))
+        return future
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._queue
+        with self._lock:
+            if self._pid != pid:
+                # Threads do not survive a fork, so each worker process starts its own collector.
+                self._queue = queue.Queue()
+                executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                              thread_name_prefix=f"{self.name}-dispatch")
+                threading.Thread(target=self._collect, args=(self._queue, executor),
+                                 name=f"{self.name}-collector", daemon=True).start()
+                self._pid = pid
+        return self._queue
+
+    def _collect(self, pending, executor):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self.operation([text for text, _ in batch])
+        except Exception as e:
+            logger.error(f"Error in {self.name} batch of {len(batch)} documents: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # Documents sent as plain strings get the ids "0", "1", ... in batch order. Results are matched
+        # on those ids, or by position if they carry none; a document left without a result fails
+        # instead of leaving its caller waiting forever.
+        by_index = {}
+        for position, result in enumerate(results):
+            document_id = str(getattr(result, 'id', position))
+            by_index.setdefault(int(document_id) if document_id.isdigit() else position, result)
+        if len(by_index) != len(batch):
+            logger.error(f"{self.name} returned {len(by_index)} results for a batch of {len(batch)} documents")
+
+        for index, (_, future) in enumerate(batch):
+            result = by_index.get(index)
+            if result is None:
+                future.set_exception(DocumentAnalysisError('MissingResult', f"No result for document {index}"))
+            elif getattr(result, 'is_error', False):
+                future.set_exception(DocumentAnalysisError(result.error.code, result.error.message))
+            else:
+                future.set_result(result)
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .llm import (CHAT_MODEL, CHAT_ERROR, format_chat_prompt, format_chat_turn, generate_json, agenerate_json,
+                  stream_generate, astream_generate)
+from .retrieval import join_chunks, relevant_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def transcript_key(transcript):
+    return hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    transcript_key: str
+    context: list = None  # Ollama's token state after the last turn; None until the first turn completes
+    sent_chunks: list = field(default_factory=list)  # retrieval chunk ids already in the context
+    whole_transcript: bool = False  # the first turn sent the full transcript
+    turns: int = 0
+
+
+class ChatSessionStore:
+    """
+    Server-side chatbot sessions per user and transcript. The first turn sends the system message and
+    transcript passages; later turns send Ollama the previous `context` plus only the new message (and
+    any newly relevant passages), so their cost no longer grows with the transcript.
+
+    Sessions live in a Django cache: entries expire after `idle_timeout` without a turn, and the cache's
+    own limit (MAX_ENTRIES locally, maxmemory on Redis) caps the memory they use. A session whose context
+    exceeds `max_context` tokens starts over with a fresh prompt rather than overflowing the model window.
+    """
+
+    def __init__(self, cache_alias, idle_timeout=1800, max_context=3500, model=CHAT_MODEL):
+        self.cache_alias = cache_alias
+        self.idle_timeout = idle_timeout
+        self.max_context = max_context
+        self.model = model
+
+    def _cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, owner, session_id):
+        return f"chat_session:{owner}:{session_id}"
+
+    def _new(self, transcript):
+        return ChatSession(session_id=uuid.uuid4().hex, transcript_key=transcript_key(transcript))
+
+    def _check(self, session, transcript):
+        # Unknown or expired ids, and sessions opened on another transcript, get a fresh session.
+        if session is None or session.transcript_key != transcript_key(transcript):
+            return self._new(transcript)
+        return session
+
+    def open(self, owner, session_id, transcript):
+        session = self._cache().get(self._key(owner, session_id)) if session_id else None
+        return self._check(session, transcript)
+
+    async def aopen(self, owner, session_id, transcript):
+        session = await self._cache().aget(self._key(owner, session_id)) if session_id else None
+        return self._check(session, transcript)
+
+    def prompt(self, session, message, transcript):
+        """Prompt for the next turn; records the passages it adds on `session` (saved only if the turn succeeds)."""
+        chunks = None if session.whole_transcript else relevant_chunks(transcript, message)
+        if session.context is None:
+            session.whole_transcript = chunks is None
+            session.sent_chunks = sorted(chunks) if chunks is not None else []
+            return format_chat_prompt(message, transcript if chunks is None else join_chunks(chunks.values()))
+        new = [] if chunks is None else [i for i in chunks if i not in session.sent_chunks]
+        session.sent_chunks = sorted(session.sent_chunks + new)
+        return format_chat_turn(message, join_chunks(chunks[i] for i in new) if new else None)
+
+    def _advance(self, session, context):
+        session.turns += 1
+        session.context = context or None
+        if session.context is not None and len(session.context) > self.max_context:
+            logger.info(f"Chat session {session.session_id} reached {len(session.context)} tokens; starting over")
+            session.context, session.sent_chunks, session.whole_transcript = None, [], False
+        return session
+
+    def save(self, owner, session, context):
+        self._cache().set(self._key(owner, session.session_id), self._advance(session, context),
+                          timeout=self.idle_timeout)
+
+    async def asave(self, owner, session, context):
+        await self._cache().aset(self._key(owner, session.session_id), self._advance(session, context),
+                                 timeout=self.idle_timeout)
+
+    def reset(self, owner, session_id):
+        self._cache().delete(self._key(owner, session_id))
+
+    def reply(self, owner, session_id, message, transcript):
+        session = self.open(owner, session_id, transcript)
+        result = generate_json(self.model, self.prompt(session, message, transcript), session.context)
+        if result is None:
+            return CHAT_ERROR, session.session_id
+        self.save(owner, session, result.get('context'))
+        return result['response'], session.session_id
+
+    async def areply(self, owner, session_id, message, transcript):
+        session = await self.aopen(owner, session_id, transcript)
+        # Retrieval may build or load an index, so keep it off the event loop
+        prompt = await sync_to_async(self.prompt, thread_sensitive=False)(session, message, transcript)
+        result = await agenerate_json(self.model, prompt, session.context)
+        if result is None:
+            return CHAT_ERROR, session.session_id
+        await self.asave(owner, session, result.get('context'))
+        return result['response'], session.session_id
+
+    def stream(self, owner, session, message, transcript):
+        # The context arrives with the final chunk; a disconnected client leaves the session at its previous turn.
+        done = {}
+        yield from stream_generate(self.model, self.prompt(session, message, transcript), session.context,
+                                   on_done=done.update)
+        self.save(owner, session, done.get('context'))
+
+    async def astream(self, owner, session, message, transcript):
+        done = {}
+        prompt = await sync_to_async(self.prompt, thread_sensitive=False)(session, message, transcript)
+        async for token in astream_generate(self.model, prompt, session.context, on_done=done.update):
+            yield token
+        await self.asave(owner, session, done.get('context'))
+
+
+chat_sessions = ChatSessionStore(
+    cache_alias=settings.CHAT_SESSION_CACHE,
+    idle_timeout=settings.CHAT_SESSION_IDLE_TIMEOUT,
+    max_context=settings.CHAT_SESSION_MAX_CONTEXT,
+)
+
+
+def session_owner(user):
+    return str(user.pk) if user.is_authenticated else 'anonymous'
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import threading
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from azure.ai.textanalytics import TextAnalyticsClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+from azure.storage.blob import BlobServiceClient
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Creates each client once per worker process and keeps its HTTP connections
+    alive. Clients created before a fork are dropped in the child, since the
+    sockets they hold are shared with the parent.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._clients = {}
+        self._sessions = {}
+
+    def get(self, name, factory):
+        if self._pid != os.getpid():
+            self.reset()
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory(self._session(name))
+                    logger.info(f"Created pooled client '{name}' in process {self._pid}")
+        return client
+
+    def _session(self, name):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                              pool_maxsize=settings.HTTP_POOL_MAXSIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self._sessions[name] = session
+        return session
+
+    def stats(self):
+        stats = {}
+        for name, session in list(self._sessions.items()):
+            created = requests_sent = 0
+            # The same adapter is mounted for http:// and https://
+            for adapter in {id(a): a for a in session.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        created += pool.num_connections
+                        requests_sent += pool.num_requests
+            stats[name] = {
+                'requests': requests_sent,
+                'connections_created': created,
+                'connections_reused': max(requests_sent - created, 0),
+            }
+        return {'pid': self._pid, 'clients': stats}
+
+
+registry = ClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def _azure_transport(session):
+    return RequestsTransport(session=session, session_owner=False,
+                             connection_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                             read_timeout=settings.HTTP_READ_TIMEOUT)
+
+
+def get_text_analytics_client():
+    return registry.get('text_analytics', lambda session: TextAnalyticsClient(
+        endpoint=settings.AZURE_SENTIMENT_ENDPOINT,
+        credential=AzureKeyCredential(settings.AZURE_SUBSCRIPTION_KEY),
+        transport=_azure_transport(session),
+    ))
+
+
+def get_blob_service_client():
+    return registry.get('blob_storage', lambda session: BlobServiceClient.from_connection_string(
+        settings.AZURE_STORAGE_CONNECTION_STRING,
+        transport=_azure_transport(session),
+        # Downloads are fetched (and streamed) in chunks of this size rather than up to 32 MiB at once
+        max_single_get_size=settings.BLOB_DOWNLOAD_CHUNK_SIZE,
+        max_chunk_get_size=settings.BLOB_DOWNLOAD_CHUNK_SIZE,
+    ))
+
+
+def get_llm_session():
+    return registry.get('llm', lambda session: session)
+
+
+def client_stats():
+    stats = registry.stats()
+    stats['async_sessions'] = len(_async_clients)
+    return stats
+
+
+# Async clients are bound to the event loop that created them, so they are kept per loop and closed with it.
+_async_clients = {}
+_async_closers = {}
+
+
+async def _close_with_loop(loop):
+    # Runs until the loop shuts down. asyncio.run, and asgiref when it runs an async view in a loop of its
+    # own (under WSGI, one per request), cancel the tasks left at the end; the loop's clients are closed
+    # then, newest first, so the blob client goes before the session it borrows.
+    try:
+        await loop.create_future()
+    finally:
+        _async_closers.pop(loop, None)
+        for name, client in reversed(list(_async_clients.pop(loop, {}).items())):
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Error closing async client '{name}': {str(e)}")
+
+
+def _async_client(name, factory):
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+        _async_closers[loop] = loop.create_task(_close_with_loop(loop))
+    if name not in clients:
+        clients[name] = factory()
+    return clients[name]
+
+
+def get_async_http_session():
+    return _async_client('http', lambda: aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=settings.ASYNC_HTTP_POOL_MAXSIZE),
+        timeout=aiohttp.ClientTimeout(connect=settings.HTTP_CONNECT_TIMEOUT, sock_read=settings.LLM_READ_TIMEOUT),
+    ))
+
+
+def get_async_blob_service_client():
+    return _async_client('blob_storage', lambda: AsyncBlobServiceClient.from_connection_string(
+        settings.AZURE_STORAGE_CONNECTION_STRING,
+        transport=AioHttpTransport(session=get_async_http_session(), session_owner=False,
+                                   connection_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                                   read_timeout=settings.HTTP_READ_TIMEOUT),
+        max_single_get_size=settings.BLOB_DOWNLOAD_CHUNK_SIZE,
+        max_chunk_get_size=settings.BLOB_DOWNLOAD_CHUNK_SIZE,
+    ))
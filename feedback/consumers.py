@@ -1,37 +1,74 @@
 # feedback/consumers.py
 
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .realtime import FEEDBACK_GROUP, build_snapshot, matches
+
+FILTER_FIELDS = ('status', 'sentiment')
+
+
 class FeedbackConsumer(AsyncWebsocketConsumer):
+    # Dashboard feed: a snapshot on connect, then batched frames of feedback events matching the
+    # connection's filters. Filters come from the query string (?status=approved&sentiment=negative,positive)
+    # and can be changed with {"action": "subscribe", "status": [...], "sentiment": [...]}.
+    # Bulk changes arrive as one {"bulk": action, "status", "count", "ids"} event, filtered on status only.
+    # {"message": ...} from a connected manager or admin is relayed to every dashboard as before.
+
     async def connect(self):
-        await self.channel_layer.group_add(
-            "feedback_group",
-            self.channel_name
-        )
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated or user.role not in ['manager', 'admin']:
+            await self.close()
+            return
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.filters = self._parse_filters({field: ','.join(query.get(field, [])) for field in FILTER_FIELDS})
+
+        await self.channel_layer.group_add(FEEDBACK_GROUP, self.channel_name)
         await self.accept()
+        await self.send_snapshot()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            "feedback_group",
-            self.channel_name
-        )
+        await self.channel_layer.group_discard(FEEDBACK_GROUP, self.channel_name)
 
     async def receive(self, text_data):
-        data = json.loads(text_data)
-        message = data['message']
-
-        await self.channel_layer.group_send(
-            "feedback_group",
-            {
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if data.get('action') == 'subscribe':
+            self.filters = self._parse_filters(data)
+            await self.send_snapshot()
+        elif 'message' in data:
+            await self.channel_layer.group_send(FEEDBACK_GROUP, {
                 'type': 'feedback_message',
-                'message': message
-            }
-        )
+                'message': data['message']
+            })
 
     async def feedback_message(self, event):
-        message = event['message']
+        await self.send(text_data=json.dumps({'message': event['message']}))
+
+    async def send_snapshot(self):
+        snapshot = await database_sync_to_async(build_snapshot)(self.filters)
+        await self.send(text_data=json.dumps({'type': 'snapshot', 'filters': self._filters_json(), **snapshot}))
+
+    async def feedback_batch(self, event):
+        events = [item for item in event['events'] if matches(item, self.filters)]
+        if events:
+            await self.send(text_data=json.dumps({'type': 'batch', 'events': events}))
+
+    @staticmethod
+    def _parse_filters(data):
+        filters = {}
+        for field in FILTER_FIELDS:
+            values = data.get(field) or []
+            if isinstance(values, str):
+                values = [value for value in values.split(',') if value]
+            filters[field] = frozenset(str(value) for value in values)
+        return filters
 
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
\ No newline at end of file
+    def _filters_json(self):
+        return {field: sorted(values) for field, values in self.filters.items()}
@@ -1,9 +1,32 @@
 from azure.cosmos import CosmosClient, PartitionKey
 from django.conf import settings
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class QueryPage:
+    def __init__(self, items, continuation, request_charge):
+        self.items = items
+        self.continuation = continuation
+        self.request_charge = request_charge
+
+
+def partition_bucket(timestamp):
+    # Feedback is partitioned by month of its UTC timestamp, e.g. '2024-08'
+    return timestamp[:7]
+
+
+def month_buckets(start, end):
+    buckets = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
 class CosmosDBManager:
     def __init__(self):
         self.client = CosmosClient(settings.COSMOS_DB['ENDPOINT'], settings.COSMOS_DB['PRIMARY_KEY'])
@@ -19,15 +42,68 @@ class CosmosDBManager:
             logger.error(f"Error storing sentiment result: {str(e)}")
             raise
 
-    def get_sentiment_results(self, query):
+    def get_sentiment_results(self, query, parameters=None, partition_key=None):
         try:
-            return list(self.container.query_items(query=query, enable_cross_partition_query=True))
+            return list(self.iter_query(query, parameters=parameters, partition_key=partition_key))
         except Exception as e:
             logger.error(f"Error querying sentiment results: {str(e)}")
             raise
 
+    def query_page(self, query, parameters=None, partition_key=None, page_size=100, continuation=None):
+        # Without a partition key the query fans out to every partition.
+        options = {'partition_key': partition_key} if partition_key is not None \
+            else {'enable_cross_partition_query': True}
+        pages = self.container.query_items(
+            query=query, parameters=parameters or [], max_item_count=page_size, **options
+        ).by_page(continuation)
+        items = list(next(pages, []))
+        return QueryPage(items, pages.continuation_token, self._last_request_charge())
+
+    def iter_query(self, query, parameters=None, partition_key=None, page_size=100):
+        # Yields items one page at a time instead of loading the whole result.
+        continuation = None
+        total_charge = 0.0
+        while True:
+            page = self.query_page(query, parameters, partition_key, page_size, continuation)
+            total_charge += page.request_charge
+            yield from page.items
+            continuation = page.continuation
+            if not continuation:
+                break
+        logger.info(f"Query on partition {partition_key or '*'} consumed {total_charge:.2f} RU")
+
+    def iter_feedback(self, since=None, until=None, page_size=100):
+        # With the month partition scheme a time range only touches the partitions it covers.
+        conditions, parameters = [], []
+        if since:
+            conditions.append('c.timestamp >= @since')
+            parameters.append({'name': '@since', 'value': since.isoformat()})
+        if until:
+            conditions.append('c.timestamp < @until')
+            parameters.append({'name': '@until', 'value': until.isoformat()})
+        query = 'SELECT * FROM c' + (' WHERE ' + ' AND '.join(conditions) if conditions else '') \
+            + ' ORDER BY c.timestamp'
+
+        if since and settings.COSMOS_DB['PARTITION_KEY_PATH'] == '/pk':
+            for bucket in month_buckets(since, until or datetime.utcnow()):
+                yield from self.iter_query(query, parameters, partition_key=bucket, page_size=page_size)
+        else:
+            yield from self.iter_query(query, parameters, page_size=page_size)
+
+    def iter_feedback_written(self, since_ts, until_ts, page_size=100):
+        # Items by server write time (_ts, epoch seconds) rather than their own timestamp, so items that
+        # reach Cosmos late (outbox backlog, re-sent imports) are still found. Spans every partition.
+        query = 'SELECT * FROM c WHERE c._ts > @since AND c._ts <= @until'
+        parameters = [{'name': '@since', 'value': since_ts}, {'name': '@until', 'value': until_ts}]
+        yield from self.iter_query(query, parameters, page_size=page_size)
+
+    def _last_request_charge(self):
+        headers = self.container.client_connection.last_response_headers or {}
+        return float(headers.get('x-ms-request-charge', 0))
+
     def store_feedback(self, feedback_data):
         try:
+            self.assign_partition(feedback_data)
             result = self.container.create_item(body=feedback_data)
             logger.info(f"Stored feedback: {result['id']}")
             return result
@@ -35,4 +111,27 @@ class CosmosDBManager:
             logger.error(f"Error storing feedback: {str(e)}")
             raise
 
+    def assign_partition(self, item):
+        item.setdefault('pk', partition_bucket(item['timestamp']))
+        return item
+
+    def partition_key_for(self, item):
+        return str(item[settings.COSMOS_DB['PARTITION_KEY_PATH'].lstrip('/')])
+
+    def upsert_batch(self, partition_key, items):
+        # Items sharing a partition key go in one transactional batch (up to 100 operations);
+        # upserts make re-sent items idempotent.
+        try:
+            if len(items) == 1:
+                self.container.upsert_item(body=items[0])
+            else:
+                self.container.execute_item_batch(
+                    batch_operations=[('upsert', (item,)) for item in items],
+                    partition_key=partition_key
+                )
+            logger.info(f"Stored {len(items)} feedback items in partition {partition_key}")
+        except Exception as e:
+            logger.error(f"Error storing feedback batch in partition {partition_key}: {str(e)}")
+            raise
+
 cosmos_db = CosmosDBManager()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import logging
+import re
+
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .azure_storage import aget_transcript_blob_client, get_transcript_blob_client
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Attempts when the blob is replaced between reading its properties and starting the download
+ATTEMPTS = 2
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, inclusive, or None when the header should be ignored
+    (malformed or several ranges; the whole blob is sent). Raises ValueError if it is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_allows(request, etag, last_modified):
+    # A range is only honoured if the client's copy (If-Range) is still current; otherwise send everything.
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    if value.startswith('W/'):
+        return False
+    return parse_http_date_safe(value) == last_modified
+
+
+def _set_headers(response, properties, last_modified):
+    response['ETag'] = properties.etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def plan_download(request, properties):
+    """
+    Decides the response from the blob's properties alone. Returns (response, None) when no transfer
+    is needed (304, 412, 416 or HEAD), otherwise (None, (status, offset, length)).
+    """
+    last_modified = int(properties.last_modified.timestamp())
+    size = properties.size
+    content_type = properties.content_settings.content_type or 'application/octet-stream'
+    base = _set_headers(HttpResponse(content_type=content_type), properties, last_modified)
+    conditional = get_conditional_response(request, etag=properties.etag, last_modified=last_modified,
+                                           response=base)
+    if conditional is not base:
+        return conditional, None
+
+    status, start, end = 200, 0, size - 1
+    if 'Range' in request.headers and _if_range_allows(request, properties.etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = _set_headers(HttpResponse(status=416), properties, last_modified)
+            response['Content-Range'] = f"bytes */{size}"
+            return response, None
+        if byte_range is not None:
+            status, (start, end) = 206, byte_range
+
+    length = end - start + 1
+    if request.method == 'HEAD' or length == 0:
+        base.status_code = status
+        base['Content-Length'] = length
+        if status == 206:
+            base['Content-Range'] = f"bytes {start}-{end}/{size}"
+        return base, None
+    return None, (status, start, length)
+
+
+def _streaming_response(chunks, properties, status, start, length):
+    content_type = properties.content_settings.content_type or 'application/octet-stream'
+    response = StreamingHttpResponse(chunks, status=status, content_type=content_type)
+    _set_headers(response, properties, int(properties.last_modified.timestamp()))
+    response['Content-Length'] = length
+    if status == 206:
+        response['Content-Range'] = f"bytes {start}-{start + length - 1}/{properties.size}"
+    return response
+
+
+def _replaced(error):
+    # The blob no longer has the ETag we planned with; the SDK does not always map 412 to its own class.
+    return isinstance(error, HttpResponseError) and error.status_code == 412
+
+
+def transcript_download(request, blob_name):
+    """Relays the blob (or the requested range of it) to the client one chunk at a time."""
+    blob_client = get_transcript_blob_client(blob_name)
+    if blob_client is None:
+        return JsonResponse({'error': 'Storage unavailable'}, status=503)
+    try:
+        for _ in range(ATTEMPTS):
+            properties = blob_client.get_blob_properties()
+            response, plan = plan_download(request, properties)
+            if response is not None:
+                return response
+            status, start, length = plan
+            try:
+                # Pinned to the ETag the headers describe, so a concurrent upload cannot mix two versions
+                downloader = blob_client.download_blob(offset=start, length=length, etag=properties.etag,
+                                                       match_condition=MatchConditions.IfNotModified)
+            except HttpResponseError as e:
+                if _replaced(e):
+                    continue
+                raise
+            return _streaming_response(downloader.chunks(), properties, status, start, length)
+    except HttpResponseError as e:
+        if e.status_code == 404:
+            return JsonResponse({'error': 'Transcript not found'}, status=404)
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return JsonResponse({'error': 'Failed to download transcript'}, status=502)
+    except Exception as e:
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return JsonResponse({'error': 'Failed to download transcript'}, status=502)
+    return JsonResponse({'error': 'Transcript is being replaced; try again'}, status=503)
+
+
+async def atranscript_download(request, blob_name):
+    blob_client = aget_transcript_blob_client(blob_name)
+    try:
+        for _ in range(ATTEMPTS):
+            properties = await blob_client.get_blob_properties()
+            response, plan = plan_download(request, properties)
+            if response is not None:
+                return response
+            status, start, length = plan
+            try:
+                downloader = await blob_client.download_blob(offset=start, length=length, etag=properties.etag,
+                                                             match_condition=MatchConditions.IfNotModified)
+            except HttpResponseError as e:
+                if _replaced(e):
+                    continue
+                raise
+            return _streaming_response(downloader.chunks(), properties, status, start, length)
+    except HttpResponseError as e:
+        if e.status_code == 404:
+            return JsonResponse({'error': 'Transcript not found'}, status=404)
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return JsonResponse({'error': 'Failed to download transcript'}, status=502)
+    except Exception as e:
+        logger.error(f"Error downloading file from Azure Blob Storage: {str(e)}")
+        return JsonResponse({'error': 'Failed to download transcript'}, status=502)
+    return JsonResponse({'error': 'Transcript is being replaced; try again'}, status=503)
@@ -0,0 +1,176 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .analysis import analysis_engine
+from .batching import DocumentAnalysisError
+from .models import Feedback
+from .outbox import enqueue_cosmos_writes
+from .realtime import bulk_event, publish_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+def detect_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_feedback_texts(path, file_format=None, text_field='feedback'):
+    # Yields (row_number, text) one row at a time, so memory does not grow with the file.
+    file_format = file_format or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'jsonl':
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for row_number, record in enumerate(records, start=1):
+            text = (record.get(text_field) or '').strip()
+            if text:
+                yield row_number, text
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Checkpoint:
+    """
+    Highest row number whose chunk has been fully written, stored in the import file's directory under
+    the file's content hash, so an identical file uploaded again resumes instead of starting over.
+    It only saves work: rows carry an import key, so a chunk written just before a crash is skipped on resume.
+    """
+
+    def __init__(self, path, import_id):
+        self.path = os.path.join(os.path.dirname(os.path.abspath(path)), f".import-{import_id}.checkpoint.json")
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'last_row': 0, 'imported': 0, 'skipped': 0, 'failed': 0}
+
+    def save(self, state):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _import_id(path):
+    # Uploads are saved under a new name each time, so the id comes from the content, not the path.
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _import_chunk(import_id, chunk, user):
+    # Runs on a pool thread: analysis of one chunk.
+    results = analysis_engine.analyze_many([text for _, text in chunk])
+    user_id = str(user.id) if user else 'anonymous'
+
+    rows, cosmos_items, failed = [], [], 0
+    for (row_number, text), result in zip(chunk, results):
+        if isinstance(result, DocumentAnalysisError):
+            # The service rejected this document; the rest of the chunk is still imported.
+            logger.warning(f"Import row {row_number} could not be analyzed: {str(result)}")
+            failed += 1
+            continue
+        if isinstance(result, Exception):
+            # The whole call failed (throttling, outage): stop without moving the checkpoint past these rows.
+            raise result
+        import_key = f"{import_id}-{row_number}"
+        cosmos_item = result.to_cosmos(text, user_id)
+        cosmos_item['id'] = f"import-{import_key}"
+        cosmos_items.append(cosmos_item)
+        rows.append(Feedback(user=user, text=text, analysis_status='completed', import_key=import_key,
+                             **result.to_feedback_fields()))
+
+    return chunk[-1][0], rows, cosmos_items, failed
+
+
+def import_feedback(path, file_format=None, text_field='feedback', user=None, chunk_size=None,
+                    parallelism=None, restart=False, progress=None):
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    parallelism = parallelism or settings.IMPORT_PARALLELISM
+    import_id = _import_id(path)
+    checkpoint = Checkpoint(path, import_id)
+    if restart:
+        checkpoint.clear()
+    state = checkpoint.load()
+
+    if state['last_row']:
+        logger.info(f"Resuming import of {path} after row {state['last_row']}")
+    rows = ((row_number, text) for row_number, text in read_feedback_texts(path, file_format, text_field)
+            if row_number > state['last_row'])
+
+    def finish(future):
+        # Local rows are written from this thread only, which keeps SQLite free of competing writers.
+        last_row, feedback_rows, cosmos_items, failed = future.result()
+        with transaction.atomic():
+            # Rows committed by an earlier run (crash before the checkpoint save, --restart, a re-upload)
+            # are neither written nor counted in the rollups again.
+            existing = set(Feedback.objects.filter(
+                import_key__in=[row.import_key for row in feedback_rows]
+            ).values_list('import_key', flat=True))
+            new_rows = [row for row in feedback_rows if row.import_key not in existing]
+            new_items = [item for item, row in zip(cosmos_items, feedback_rows) if row.import_key not in existing]
+            Feedback.objects.bulk_create(new_rows, batch_size=500)
+            enqueue_cosmos_writes(new_items)
+            if new_rows:
+                publish_on_commit(bulk_event('import', 'submitted', len(new_rows)))
+        state.update(last_row=last_row, imported=state['imported'] + len(new_rows),
+                     skipped=state['skipped'] + len(existing), failed=state['failed'] + failed)
+        checkpoint.save(state)
+        if progress:
+            progress(**state)
+
+    # At most 2 * parallelism chunks are held at once, and chunks are checkpointed in file order,
+    # so a resumed import never skips rows that were not written.
+    # A chunk that fails as a whole raises here and ends the import; rerunning it resumes from that chunk.
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='feedback-import') as executor:
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                if len(in_flight) >= parallelism * 2:
+                    finish(in_flight.popleft())
+                in_flight.append(executor.submit(_import_chunk, import_id, chunk, user))
+            while in_flight:
+                finish(in_flight.popleft())
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    checkpoint.clear()
+    logger.info(f"Imported {state['imported']} feedback rows from {path} "
+                f"({state['skipped']} already imported, {state['failed']} failed)")
+    return state
+
+
+def import_uploaded_file(path, **kwargs):
+    # Uploads are saved under a one-off name that nothing refers to after the job, so the file is removed
+    # whether or not the import finished; uploading the same content again resumes from its checkpoint.
+    try:
+        return import_feedback(path, **kwargs)
+    finally:
+        os.remove(path)
@@ -0,0 +1,99 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Feedback
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+LIST_FIELDS = ('id', 'text', 'status', 'submitted_at', 'sentiment', 'score_positive', 'score_neutral',
+               'score_negative', 'is_assistance_request', 'analysis_status', 'user__username')
+FILTER_KEYS = ('status', 'sentiment', 'since', 'until', 'assistance')
+
+
+def encode_cursor(feedback):
+    raw = f"{feedback.submitted_at.isoformat()}|{feedback.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        submitted_at, feedback_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(submitted_at), int(feedback_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _parse_datetime(value):
+    moment = datetime.fromisoformat(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _parse_bool(value):
+    if value in (True, 'true', '1'):
+        return True
+    if value in (False, 'false', '0'):
+        return False
+    raise ValueError('assistance must be true or false')
+
+
+def parse_filters(params, strict=False):
+    # Raises ValueError on bad input; the views turn that into a 400. `strict` also rejects unknown keys,
+    # for callers where a misspelt filter must not silently select everything.
+    if strict:
+        unknown = set(params) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filter {', '.join(sorted(unknown))}")
+    filters = {}
+    if params.get('status'):
+        if params['status'] not in dict(Feedback.STATUS_CHOICES):
+            raise ValueError('Unknown status')
+        filters['status'] = params['status']
+    if params.get('sentiment'):
+        if params['sentiment'] not in dict(Feedback.SENTIMENT_CHOICES):
+            raise ValueError('Unknown sentiment')
+        filters['sentiment'] = params['sentiment']
+    if params.get('since'):
+        filters['submitted_at__gte'] = _parse_datetime(params['since'])
+    if params.get('until'):
+        filters['submitted_at__lt'] = _parse_datetime(params['until'])
+    if params.get('assistance') not in (None, ''):
+        filters['is_assistance_request'] = _parse_bool(params['assistance'])
+    return filters
+
+
+def feedback_page(filters, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of feedback, newest first, and the cursor for the next page (None on the last page).
+    Seeking past (submitted_at, id) keeps every page an index range scan, however deep it is.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    queryset = Feedback.objects.filter(**filters).select_related('user').only(*LIST_FIELDS) \
+        .order_by('-submitted_at', '-id')
+    if cursor:
+        submitted_at, feedback_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=feedback_id))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def serialize_feedback(feedback):
+    return {
+        'id': feedback.id,
+        'user': feedback.user.username if feedback.user else None,
+        'text': feedback.text,
+        'status': feedback.status,
+        'submitted_at': feedback.submitted_at.isoformat(),
+        'is_assistance_request': feedback.is_assistance_request,
+        'analysis_status': feedback.analysis_status,
+        'sentiment': feedback.sentiment,
+        'scores': {
+            'positive': feedback.score_positive,
+            'neutral': feedback.score_neutral,
+            'negative': feedback.score_negative,
+        },
+    }
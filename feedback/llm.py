@@ -0,0 +1,250 @@
+import json
+import logging
+import time
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .clients import get_llm_session, get_async_http_session
+from .llm_gateway import PRIORITY_CHAT, PRIORITY_SUMMARY, deadline_for, llm_gateway
+from .retrieval import transcript_context
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL = 'llama2'
+SUMMARY_MODEL = 'llama3.1'
+SUMMARY_HEADER = "Key Concepts in Data Science:"
+
+CHAT_SYSTEM_MESSAGE = (
+    "You are an AI assistant helping students understand educational content. "
+    "Provide concise and accurate answers based on the transcript content. "
+    "Format your responses with key points and brief explanations."
+)
+
+SUMMARY_SYSTEM_MESSAGE = """
+Summarize the key concepts from the lesson content below, ensuring a clear and concise presentation. Follow these guidelines strictly:
+
+1. Start with "Key Concepts in Data Science:" as the main header.
+2. Do not use bullet points or numbering.
+3. Present the summary as a cohesive paragraph.
+4. Focus on the most important information and key takeaways.
+5. Aim for a summary of about 100-150 words.
+
+Ensure the summary is clear, concise, and easy to understand.
+"""
+
+SECTION_SUMMARY_MESSAGE = (
+    "Below is one section of a longer lesson transcript. Summarize the concepts it teaches in 3-5 plain "
+    "sentences. Do not use bullet points, and do not mention that this is a section or a transcript."
+)
+
+CHAT_ERROR = "Sorry, I encountered an error while processing your request."
+SUMMARY_ERROR = "Sorry, I encountered an error while summarizing the lesson."
+
+
+class LLMError(Exception):
+    pass
+
+
+def format_chat_prompt(message, transcript_text):
+    return f"{CHAT_SYSTEM_MESSAGE}\n\nTranscript: {transcript_text}\n\nUser: {message}\nAI:"
+
+
+def format_chat_turn(message, transcript_text=None):
+    # A follow-up turn of a chat session: the system message and earlier passages are already in the context.
+    if transcript_text:
+        return f"Transcript (continued): {transcript_text}\n\nUser: {message}\nAI:"
+    return f"User: {message}\nAI:"
+
+
+def build_chat_prompt(message, transcript):
+    # Only the transcript passages relevant to the question are sent (see retrieval.py)
+    return format_chat_prompt(message, transcript_context(transcript, message))
+
+
+async def abuild_chat_prompt(message, transcript):
+    # Building or loading an index is CPU and disk work, so keep it off the event loop
+    return await sync_to_async(build_chat_prompt, thread_sensitive=False)(message, transcript)
+
+
+def build_summary_prompt(transcript):
+    return f"{SUMMARY_SYSTEM_MESSAGE}\n\nTranscript: {transcript}\n\nSummary:"
+
+
+def build_section_summary_prompt(section):
+    return f"{SECTION_SUMMARY_MESSAGE}\n\nSection: {section}\n\nSummary:"
+
+
+def format_summary(summary):
+    if not summary.startswith(SUMMARY_HEADER):
+        summary = f"{SUMMARY_HEADER}\n\n" + summary
+    return summary
+
+
+def _payload(model, prompt, context, stream):
+    payload = {'model': model, 'prompt': prompt, 'stream': stream}
+    if context:
+        # The token state Ollama returned for an earlier turn; the prompt continues from it.
+        payload['context'] = context
+    return payload
+
+
+def _read_timeout(slot):
+    return min(settings.LLM_READ_TIMEOUT, slot.timeout())
+
+
+def _check_deadline(slot):
+    if time.monotonic() > slot.deadline:
+        raise LLMError("LLM response exceeded its deadline")
+
+
+def generate_json(model, prompt, context=None, priority=PRIORITY_CHAT):
+    # Every call to the model server goes through the gateway, which may raise LLMUnavailable.
+    with llm_gateway.slot(priority, deadline_for(priority)) as slot:
+        response = get_llm_session().post(settings.OLLAMA_GENERATE_URL,
+                                          timeout=(settings.HTTP_CONNECT_TIMEOUT, _read_timeout(slot)),
+                                          json=_payload(model, prompt, context, False))
+        if response.status_code != 200:
+            logger.error(f"LLM request failed with status {response.status_code}")
+            slot.fail()
+            return None
+        return response.json()
+
+
+def generate(model, prompt, priority=PRIORITY_CHAT):
+    result = generate_json(model, prompt, priority=priority)
+    return result['response'] if result is not None else None
+
+
+async def agenerate_json(model, prompt, context=None, priority=PRIORITY_CHAT):
+    async with llm_gateway.aslot(priority, deadline_for(priority)) as slot:
+        session = get_async_http_session()
+        timeout = aiohttp.ClientTimeout(connect=settings.HTTP_CONNECT_TIMEOUT, sock_read=_read_timeout(slot))
+        async with session.post(settings.OLLAMA_GENERATE_URL, timeout=timeout,
+                                json=_payload(model, prompt, context, False)) as response:
+            if response.status != 200:
+                logger.error(f"LLM request failed with status {response.status}")
+                slot.fail()
+                return None
+            return await response.json()
+
+
+async def agenerate(model, prompt, priority=PRIORITY_CHAT):
+    result = await agenerate_json(model, prompt, priority=priority)
+    return result['response'] if result is not None else None
+
+
+def stream_generate(model, prompt, context=None, on_done=None, priority=PRIORITY_CHAT):
+    # Yields tokens as Ollama produces them. Closing the generator (e.g. when the client disconnects)
+    # closes the connection, which makes Ollama stop generating. `on_done` receives the final chunk,
+    # which carries the `context` for a follow-up turn.
+    with llm_gateway.slot(priority, deadline_for(priority)) as slot:
+        response = get_llm_session().post(settings.OLLAMA_GENERATE_URL,
+                                          timeout=(settings.HTTP_CONNECT_TIMEOUT, _read_timeout(slot)),
+                                          stream=True, json=_payload(model, prompt, context, True))
+        try:
+            if response.status_code != 200:
+                logger.error(f"LLM stream request failed with status {response.status_code}")
+                raise LLMError(f"LLM request failed with status {response.status_code}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    if on_done is not None:
+                        on_done(chunk)
+                    return
+                _check_deadline(slot)
+        finally:
+            response.close()
+
+
+async def astream_generate(model, prompt, context=None, on_done=None, priority=PRIORITY_CHAT):
+    async with llm_gateway.aslot(priority, deadline_for(priority)) as slot:
+        session = get_async_http_session()
+        timeout = aiohttp.ClientTimeout(connect=settings.HTTP_CONNECT_TIMEOUT, sock_read=_read_timeout(slot))
+        async with session.post(settings.OLLAMA_GENERATE_URL, timeout=timeout,
+                                json=_payload(model, prompt, context, True)) as response:
+            if response.status != 200:
+                logger.error(f"LLM stream request failed with status {response.status}")
+                raise LLMError(f"LLM request failed with status {response.status}")
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    if on_done is not None:
+                        on_done(chunk)
+                    return
+                _check_deadline(slot)
+
+
+def _summary_start(buffered, done=False):
+    # Returns the opening text once it is known whether the model wrote the header itself, else None.
+    if done or len(buffered) >= len(SUMMARY_HEADER) or not SUMMARY_HEADER.startswith(buffered):
+        return format_summary(buffered)
+    return None
+
+
+def stream_chatbot_response(message, transcript):
+    return stream_generate(CHAT_MODEL, build_chat_prompt(message, transcript))
+
+
+def stream_lesson_summary(transcript):
+    buffered, started = '', False
+    for token in stream_generate(SUMMARY_MODEL, build_summary_prompt(transcript), priority=PRIORITY_SUMMARY):
+        if started:
+            yield token
+            continue
+        buffered += token
+        start = _summary_start(buffered)
+        if start is not None:
+            started = True
+            yield start
+    if not started:
+        yield _summary_start(buffered, done=True)
+
+
+async def astream_chatbot_response(message, transcript):
+    async for token in astream_generate(CHAT_MODEL, await abuild_chat_prompt(message, transcript)):
+        yield token
+
+
+async def astream_lesson_summary(transcript):
+    buffered, started = '', False
+    async for token in astream_generate(SUMMARY_MODEL, build_summary_prompt(transcript), priority=PRIORITY_SUMMARY):
+        if started:
+            yield token
+            continue
+        buffered += token
+        start = _summary_start(buffered)
+        if start is not None:
+            started = True
+            yield start
+    if not started:
+        yield _summary_start(buffered, done=True)
+
+
+def get_chatbot_response(message, transcript):
+    response = generate(CHAT_MODEL, build_chat_prompt(message, transcript))
+    return response if response is not None else CHAT_ERROR
+
+
+def get_lesson_summary(transcript):
+    summary = generate(SUMMARY_MODEL, build_summary_prompt(transcript), priority=PRIORITY_SUMMARY)
+    return format_summary(summary) if summary is not None else SUMMARY_ERROR
+
+
+async def aget_chatbot_response(message, transcript):
+    response = await agenerate(CHAT_MODEL, await abuild_chat_prompt(message, transcript))
+    return response if response is not None else CHAT_ERROR
+
+
+async def aget_lesson_summary(transcript):
+    summary = await agenerate(SUMMARY_MODEL, build_summary_prompt(transcript), priority=PRIORITY_SUMMARY)
+    return format_summary(summary) if summary is not None else SUMMARY_ERROR
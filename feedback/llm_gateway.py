@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: interactive chat is served ahead of queued summaries.
+PRIORITY_CHAT = 0
+PRIORITY_SUMMARY = 1
+
+
+class LLMUnavailable(Exception):
+    """The gateway refused the call (queue full, queue wait exceeded or circuit open); retry after `retry_after`."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.granted = False
+        self.cancelled = False
+        self.refusal = None
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def grant(self):
+        self.granted = True
+        self._wake()
+
+    def refuse(self, error):
+        self.refusal = error
+        self._wake()
+
+    def _wake(self):
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(lambda: self._future.done() or self._future.set_result(None))
+
+    def wait(self, timeout):
+        self._event.wait(timeout)
+
+    async def await_grant(self, timeout):
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class Slot:
+    """A granted call. `timeout()` is the time left before the request's deadline."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.failed = False
+
+    def timeout(self):
+        return max(0.1, self.deadline - time.monotonic())
+
+    def fail(self):
+        # For failures reported without an exception, e.g. a non-200 response.
+        self.failed = True
+
+
+class LLMGateway:
+    """
+    Admission control for the model server, shared by the threads and the event loops of a worker.
+    At most `max_concurrency` calls run at once; the rest wait in a bounded priority queue (FIFO within
+    a priority) for up to `queue_timeout`. `failure_threshold` consecutive failures open the circuit:
+    calls are refused for `reset_timeout`, then a single probe decides whether it closes again.
+    Refusals raise LLMUnavailable at once with a retry-after hint instead of tying up the worker.
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=20, queue_timeout=30, failure_threshold=5, reset_timeout=30):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._average_duration = 5.0
+        self._counters = {'granted': 0, 'queued': 0, 'rejected_busy': 0, 'rejected_open': 0, 'timed_out': 0,
+                          'failures': 0}
+
+    def _retry_after(self):
+        # Roughly when a slot frees up for a caller joining the back of the queue.
+        return self._average_duration * (self._queued + 1) / self.max_concurrency
+
+    def _admit(self, priority, loop=None):
+        with self._lock:
+            if self._opened_at is not None:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0 or self._probing or self._active >= self.max_concurrency:
+                    self._counters['rejected_open'] += 1
+                    raise LLMUnavailable("The language model is unavailable", max(remaining, 1))
+                logger.info("LLM circuit half-open; sending a probe request")
+                self._probing = True
+            elif self._active >= self.max_concurrency or self._queued:
+                if self._queued >= self.max_queue:
+                    self._counters['rejected_busy'] += 1
+                    raise LLMUnavailable("The language model is busy", self._retry_after())
+                waiter = _Waiter(loop)
+                heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+                self._queued += 1
+                self._counters['queued'] += 1
+                return waiter
+            self._active += 1
+            self._counters['granted'] += 1
+            return None
+
+    def _abandon(self, waiter):
+        # Called when a queued caller stops waiting; returns True if it was granted a slot in the meantime.
+        with self._lock:
+            if waiter.granted:
+                return True
+            if waiter.refusal is not None:
+                return False
+            waiter.cancelled = True
+            self._queued -= 1
+            self._counters['timed_out'] += 1
+            return False
+
+    def _release(self, outcome, duration):
+        # `outcome` is True (success), False (failure) or None (abandoned, e.g. the client disconnected).
+        with self._lock:
+            if outcome is not None:
+                self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+            if outcome:
+                if self._opened_at is not None:
+                    logger.info("LLM circuit closed")
+                self._failures, self._opened_at = 0, None
+            elif outcome is False:
+                self._failures += 1
+                self._counters['failures'] += 1
+                if self._probing or self._failures >= self.failure_threshold:
+                    if self._opened_at is None or self._probing:
+                        logger.warning(f"LLM circuit open after {self._failures} consecutive failures")
+                    self._opened_at = time.monotonic()
+            self._probing = False
+
+            if self._opened_at is not None and self._waiters:
+                # The circuit is open: the queued calls would only fail too, so they are refused now.
+                retry_after = max(self._opened_at + self.reset_timeout - time.monotonic(), 1)
+                for _, _, waiter in self._waiters:
+                    if not waiter.cancelled:
+                        self._queued -= 1
+                        self._counters['rejected_open'] += 1
+                        waiter.refuse(LLMUnavailable("The language model is unavailable", retry_after))
+                self._waiters = []
+
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if not waiter.cancelled:
+                    # Hand the slot straight to the next caller.
+                    self._queued -= 1
+                    self._counters['granted'] += 1
+                    waiter.grant()
+                    return
+            self._active -= 1
+
+    def _queue_wait(self, deadline):
+        return min(self.queue_timeout, deadline - time.monotonic())
+
+    def _start(self, deadline):
+        if deadline - time.monotonic() <= 0:
+            self._release(None, 0)
+            raise LLMUnavailable("The request deadline passed while queued", self._retry_after())
+        return Slot(deadline)
+
+    def _finish(self, slot, error):
+        if isinstance(error, Exception):
+            outcome = False
+        elif error is not None:
+            outcome = None  # GeneratorExit / CancelledError: the caller went away, not the model
+        else:
+            outcome = not slot.failed
+        self._release(outcome, time.monotonic() - slot.started)
+
+    @contextmanager
+    def slot(self, priority, deadline):
+        """Holds one of the concurrent calls until the block exits; `deadline` is a time.monotonic() value."""
+        waiter = self._admit(priority)
+        if waiter is not None:
+            waiter.wait(self._queue_wait(deadline))
+            if not self._abandon(waiter):
+                raise waiter.refusal or LLMUnavailable("The language model is busy", self._retry_after())
+        slot = self._start(deadline)
+        try:
+            yield slot
+        except BaseException as e:
+            self._finish(slot, e)
+            raise
+        self._finish(slot, None)
+
+    @asynccontextmanager
+    async def aslot(self, priority, deadline):
+        waiter = self._admit(priority, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.await_grant(self._queue_wait(deadline))
+            except BaseException:
+                if self._abandon(waiter):
+                    self._release(None, 0)
+                raise
+            if not self._abandon(waiter):
+                raise waiter.refusal or LLMUnavailable("The language model is busy", self._retry_after())
+        slot = self._start(deadline)
+        try:
+            yield slot
+        except BaseException as e:
+            self._finish(slot, e)
+            raise
+        self._finish(slot, None)
+
+    def stats(self):
+        with self._lock:
+            state = 'closed' if self._opened_at is None else ('half-open' if self._probing else 'open')
+            return dict(self._counters, active=self._active, queued=self._queued, circuit=state,
+                        max_concurrency=self.max_concurrency, max_queue=self.max_queue)
+
+
+llm_gateway = LLMGateway(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+    failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.LLM_CIRCUIT_RESET_TIMEOUT,
+)
+
+
+def deadline_for(priority):
+    return time.monotonic() + (settings.LLM_CHAT_DEADLINE if priority == PRIORITY_CHAT
+                               else settings.LLM_SUMMARY_DEADLINE)
+
+
+def unavailable_response(error):
+    response = JsonResponse({'error': str(error), 'retry_after': error.retry_after}, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from feedback.archival import archive_feedback
+
+
+class Command(BaseCommand):
+    help = "Archive feedback to gzipped JSONL and delete it in chunks (schedule with --older-than-days)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            help="Only archive feedback submitted more than this many days ago (default: all)")
+        parser.add_argument('--chunk-size', type=int, help="Rows archived and deleted per transaction")
+
+    def handle(self, *args, **options):
+        def progress(archived, last_id, path):
+            self.stdout.write(f"{archived} archived (up to id {last_id})")
+
+        result = archive_feedback(older_than_days=options['older_than_days'],
+                                  chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {result['archived']} feedback rows to {result['path']}"))
@@ -0,0 +1,21 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from feedback.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Push pending Cosmos DB outbox items (once, or continuously with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep flushing every sweep interval")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = drain_outbox()
+            self.stdout.write(f"Sent {sent} outbox items to Cosmos DB")
+            if not options['loop']:
+                return
+            time.sleep(settings.COSMOS_OUTBOX_FLUSH_WINDOW if sent else settings.COSMOS_OUTBOX_SWEEP_INTERVAL)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from feedback.importer import import_feedback
+from feedback.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL survey export, analyze it in batches and store the results (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to a .csv or .jsonl file")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format (default: from extension)")
+        parser.add_argument('--text-field', default='feedback', help="Column/key holding the feedback text")
+        parser.add_argument('--user', help="Username to attribute the imported feedback to")
+        parser.add_argument('--chunk-size', type=int, help="Rows analyzed and written per chunk")
+        parser.add_argument('--parallel', type=int, help="Chunks processed concurrently")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start from the top")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        def progress(last_row, imported, skipped, failed):
+            self.stdout.write(f"Row {last_row}: {imported} imported, {skipped} already imported, {failed} failed")
+
+        try:
+            state = import_feedback(
+                options['path'],
+                file_format=options['format'],
+                text_field=options['text_field'],
+                user=user,
+                chunk_size=options['chunk_size'],
+                parallelism=options['parallel'],
+                restart=options['restart'],
+                progress=progress,
+            )
+        except FileNotFoundError:
+            raise CommandError(f"File '{options['path']}' does not exist")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {state['imported']} feedback rows "
+            f"({state['skipped']} already imported, {state['failed']} failed)"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from feedback.cosmos_db_utils import cosmos_db
+from feedback.models import CosmosOutbox
+from feedback.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the sentiment rollups from the raw feedback in Cosmos DB (and items still in the outbox)"
+
+    def handle(self, *args, **options):
+        # Items still waiting in the outbox are counted in the rollups but not yet in Cosmos.
+        pending = {entry.item_id: entry.body for entry in CosmosOutbox.objects.only('item_id', 'body')}
+        cosmos_items = (item for item in cosmos_db.iter_feedback(page_size=1000) if item['id'] not in pending)
+        buckets = rebuild_rollups(cosmos_items, pending.values())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} sentiment rollup buckets"))
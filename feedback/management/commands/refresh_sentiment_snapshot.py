@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from feedback.snapshot import sentiment_snapshot
+
+
+class Command(BaseCommand):
+    help = "Append newly analyzed feedback from Cosmos DB to the columnar sentiment snapshot (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Discard the snapshot and rebuild it from scratch")
+
+    def handle(self, *args, **options):
+        appended = sentiment_snapshot.refresh(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {appended} rows ({sentiment_snapshot.meta()['rows']} in snapshot)"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from feedback.models import Feedback
+from feedback.tasks import process_feedback_analysis
+
+
+class Command(BaseCommand):
+    help = "Re-run background analysis for feedback left pending or failed (e.g. after a worker restart)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help="Also retry feedback whose analysis failed")
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'processing']
+        if options['include_failed']:
+            statuses.append('failed')
+
+        feedback_ids = list(Feedback.objects.filter(analysis_status__in=statuses).values_list('id', flat=True))
+        for feedback_id in feedback_ids:
+            process_feedback_analysis(feedback_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(feedback_ids)} feedback analyses"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0003_alter_feedback_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='analysis',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='analysis_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='analysis_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='analysis_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], max_length=10, null=True),
+        ),
+    ]
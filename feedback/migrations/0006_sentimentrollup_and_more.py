@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0005_cosmosoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('sentiment', models.CharField(max_length=10)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('sum_positive', models.FloatField(default=0)),
+                ('sum_neutral', models.FloatField(default=0)),
+                ('sum_negative', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket_start', 'sentiment'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sentimentrollup',
+            constraint=models.UniqueConstraint(fields=('bucket_start', 'sentiment'), name='unique_sentiment_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+def copy_analysis_to_fields(apps, schema_editor):
+    Feedback = apps.get_model('feedback', 'Feedback')
+    batch = []
+    for feedback in Feedback.objects.filter(analysis__isnull=False).iterator(chunk_size=500):
+        scores = feedback.analysis.get('overall_scores') or {}
+        feedback.sentiment = feedback.analysis.get('sentiment')
+        feedback.score_positive = scores.get('positive')
+        feedback.score_neutral = scores.get('neutral')
+        feedback.score_negative = scores.get('negative')
+        feedback.key_phrases = feedback.analysis.get('key_phrases') or []
+        feedback.opinions = feedback.analysis.get('opinions') or []
+        batch.append(feedback)
+        if len(batch) >= 500:
+            Feedback.objects.bulk_update(batch, ['sentiment', 'score_positive', 'score_neutral', 'score_negative',
+                                                 'key_phrases', 'opinions'])
+            batch = []
+    if batch:
+        Feedback.objects.bulk_update(batch, ['sentiment', 'score_positive', 'score_neutral', 'score_negative',
+                                             'key_phrases', 'opinions'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0006_sentimentrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='key_phrases',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='opinions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='score_negative',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='score_neutral',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='score_positive',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='sentiment',
+            field=models.CharField(blank=True, choices=[('positive', 'Positive'), ('neutral', 'Neutral'), ('negative', 'Negative'), ('mixed', 'Mixed')], max_length=10, null=True),
+        ),
+        migrations.RunPython(copy_analysis_to_fields, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='feedback',
+            name='analysis',
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['status', '-submitted_at'], name='feedback_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['sentiment', '-submitted_at'], name='feedback_sentiment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['user', '-submitted_at'], name='feedback_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['is_assistance_request'], name='feedback_assistance_idx'),
+        ),
+    ]
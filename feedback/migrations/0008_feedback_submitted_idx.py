@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0007_feedback_analysis_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['-submitted_at', '-id'], name='feedback_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0009_lessonsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
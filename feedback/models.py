@@ -28,11 +28,116 @@ class Feedback(models.Model):
     rejected_at = models.DateTimeField(null=True, blank=True)
     is_assistance_request = models.BooleanField(default=False)  # New field
 
+    # Background analysis pipeline (see feedback/tasks.py)
+    ANALYSIS_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    analysis_status = models.CharField(max_length=10, choices=ANALYSIS_STATUS_CHOICES, null=True, blank=True)
+    analysis_attempts = models.PositiveSmallIntegerField(default=0)
+    analysis_error = models.TextField(blank=True)
+
+    # Analysis results, stored locally so filtering and counting do not need Cosmos DB
+    SENTIMENT_CHOICES = (
+        ('positive', 'Positive'),
+        ('neutral', 'Neutral'),
+        ('negative', 'Negative'),
+        ('mixed', 'Mixed'),
+    )
+    sentiment = models.CharField(max_length=10, choices=SENTIMENT_CHOICES, null=True, blank=True)
+    score_positive = models.FloatField(null=True, blank=True)
+    score_neutral = models.FloatField(null=True, blank=True)
+    score_negative = models.FloatField(null=True, blank=True)
+    key_phrases = models.JSONField(default=list, blank=True)
+    opinions = models.JSONField(default=list, blank=True)
+
+    # '<import id>-<row number>' for rows written by feedback/importer.py, so a re-run import skips them
+    import_key = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+
     def __str__(self):
         return f"Feedback by {self.user.username if self.user else 'Anonymous'} - {self.status}"
 
+    def analysis_results(self):
+        if self.sentiment is None:
+            return None
+        return {
+            'sentiment': self.sentiment,
+            'overall_scores': {
+                'positive': self.score_positive,
+                'neutral': self.score_neutral,
+                'negative': self.score_negative,
+            },
+            'key_phrases': self.key_phrases,
+            'opinions': self.opinions,
+        }
+
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['-submitted_at', '-id'], name='feedback_submitted_idx'),
+            models.Index(fields=['status', '-submitted_at'], name='feedback_status_idx'),
+            models.Index(fields=['sentiment', '-submitted_at'], name='feedback_sentiment_idx'),
+            models.Index(fields=['user', '-submitted_at'], name='feedback_user_idx'),
+            models.Index(fields=['is_assistance_request'], name='feedback_assistance_idx'),
+        ]
 
 
+class CosmosOutbox(models.Model):
+    # Cosmos DB items written in the same transaction as the local rows and pushed by feedback/outbox.py
+    item_id = models.CharField(max_length=255, unique=True)
+    partition_key = models.CharField(max_length=255)
+    body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Outbox item {self.item_id} ({self.partition_key})"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['next_attempt_at', 'id']),
+        ]
+
 
+class SentimentRollup(models.Model):
+    # Hourly per-sentiment counters, updated whenever feedback is queued for Cosmos (feedback/rollups.py)
+    bucket_start = models.DateTimeField()
+    sentiment = models.CharField(max_length=10)
+    count = models.PositiveBigIntegerField(default=0)
+    sum_positive = models.FloatField(default=0)
+    sum_neutral = models.FloatField(default=0)
+    sum_negative = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.sentiment} @ {self.bucket_start:%Y-%m-%d %H:00}: {self.count}"
+
+    class Meta:
+        ordering = ['bucket_start', 'sentiment']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket_start', 'sentiment'], name='unique_sentiment_rollup_bucket'),
+        ]
+
+
+class LessonSummary(models.Model):
+    # Generated lesson summaries keyed by a hash of model + prompt + transcript (feedback/summaries.py).
+    # A 'pending' row is the claim of the worker currently generating that summary.
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+    )
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    summary = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary {self.key[:12]} ({self.model}, {self.status})"
@@ -0,0 +1,67 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Feedback
+from .realtime import bulk_event, publish_feedback_on_commit, publish_on_commit
+
+logger = logging.getLogger(__name__)
+
+# action: (new status, timestamp field, statuses it may move from, roles allowed to perform it)
+TRANSITIONS = {
+    'review': ('reviewed', 'reviewed_at', ('submitted',), ('manager', 'admin')),
+    'approve': ('approved', 'approved_at', ('submitted', 'reviewed'), ('admin',)),
+    'reject': ('rejected', 'rejected_at', ('submitted', 'reviewed'), ('admin',)),
+}
+MAX_IDS = 10000
+
+
+def can_moderate(user, action):
+    return action in TRANSITIONS and user.role in TRANSITIONS[action][3]
+
+
+def transition(feedback, action):
+    """Moves one feedback to the action's status; dashboards are told once the change commits."""
+    new_status, timestamp_field, _, _ = TRANSITIONS[action]
+    feedback.status = new_status
+    setattr(feedback, timestamp_field, timezone.now())
+    feedback.save(update_fields=['status', timestamp_field])
+    publish_feedback_on_commit(feedback)
+    logger.info(f"Feedback {feedback.id} {action}: status {new_status}")
+    return feedback
+
+
+def bulk_transition(action, ids=None, filters=None):
+    """
+    Moves the selected feedback to the action's status with one UPDATE that writes only the status and
+    its timestamp. Rows in a status the action may not move from are left alone and reported as skipped;
+    with a filter, `skipped_ids` lists at most the first MAX_IDS of them while `skipped` counts them all.
+    A filter matching more than MAX_IDS movable rows raises ValueError. Dashboards get one aggregate event.
+    """
+    new_status, timestamp_field, from_statuses, _ = TRANSITIONS[action]
+    if ids is not None:
+        selected = Feedback.objects.filter(id__in=ids)
+    else:
+        selected = Feedback.objects.filter(**filters)
+
+    allowed = selected.filter(status__in=from_statuses)
+    with transaction.atomic():
+        if ids is not None:
+            eligible = list(allowed.values_list('id', flat=True))
+            allowed = Feedback.objects.filter(id__in=eligible, status__in=from_statuses)
+            skipped_ids = sorted(set(ids) - set(eligible))
+            skipped = len(skipped_ids)
+        else:
+            matched = allowed.count()
+            if matched > MAX_IDS:
+                raise ValueError(f"Filter matches {matched} feedback; narrow it to at most {MAX_IDS}")
+            blocked = selected.exclude(status__in=from_statuses)
+            skipped = blocked.count()
+            skipped_ids = list(blocked.order_by('id').values_list('id', flat=True)[:MAX_IDS])
+        updated = allowed.update(status=new_status, **{timestamp_field: timezone.now()})
+        if updated:
+            publish_on_commit(bulk_event(action, new_status, updated, sorted(eligible) if ids is not None else None))
+
+    logger.info(f"Bulk {action}: {updated} feedback moved to {new_status}, {skipped} skipped")
+    return {'action': action, 'updated': updated, 'skipped': skipped, 'skipped_ids': skipped_ids}
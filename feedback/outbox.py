@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cosmos_db_utils import cosmos_db
+from .models import CosmosOutbox
+from .rollups import record_feedback
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_OPERATIONS = 100  # Cosmos transactional batch limit
+
+
+def enqueue_cosmos_write(item):
+    enqueue_cosmos_writes([item])
+
+
+def enqueue_cosmos_writes(items):
+    # Call inside the transaction that writes the matching local rows: the outbox rows and
+    # sentiment rollups commit or roll back with them, and the flusher is only woken once they are visible.
+    if not items:
+        return
+    for item in items:
+        cosmos_db.assign_partition(item)
+    record_feedback(items)
+    CosmosOutbox.objects.bulk_create([
+        CosmosOutbox(item_id=item['id'], partition_key=cosmos_db.partition_key_for(item), body=item)
+        for item in items
+    ], batch_size=500)
+    transaction.on_commit(lambda: outbox_flusher.notify(len(items)))
+
+
+def _claim(limit):
+    now = timezone.now()
+    claimable = CosmosOutbox.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+    )
+    ids = list(claimable.order_by('id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+
+    # The conditional update makes the claim safe when several workers flush at once.
+    token = uuid.uuid4()
+    claimable.filter(id__in=ids).update(
+        claim_token=token, claimed_until=now + timedelta(seconds=settings.COSMOS_OUTBOX_LEASE_SECONDS)
+    )
+    return list(CosmosOutbox.objects.filter(claim_token=token))
+
+
+def flush_outbox(limit=None):
+    entries = _claim(limit or settings.COSMOS_OUTBOX_BATCH_SIZE)
+
+    by_partition = defaultdict(list)
+    for entry in entries:
+        by_partition[entry.partition_key].append(entry)
+
+    sent = 0
+    for partition_key, partition_entries in by_partition.items():
+        for start in range(0, len(partition_entries), MAX_BATCH_OPERATIONS):
+            batch = partition_entries[start:start + MAX_BATCH_OPERATIONS]
+            ids = [entry.id for entry in batch]
+            try:
+                cosmos_db.upsert_batch(partition_key, [entry.body for entry in batch])
+            except Exception as e:
+                from .tasks import backoff_delay
+                attempts = max(entry.attempts for entry in batch) + 1
+                CosmosOutbox.objects.filter(id__in=ids).update(
+                    attempts=attempts,
+                    next_attempt_at=timezone.now() + timedelta(seconds=backoff_delay(attempts)),
+                    claim_token=None,
+                    claimed_until=None,
+                    last_error=str(e),
+                )
+                continue
+            CosmosOutbox.objects.filter(id__in=ids).delete()
+            sent += len(batch)
+    return sent, len(entries)
+
+
+def drain_outbox():
+    total = 0
+    while True:
+        sent, claimed = flush_outbox()
+        total += sent
+        if claimed < settings.COSMOS_OUTBOX_BATCH_SIZE:
+            return total
+
+
+class OutboxFlusher:
+    """
+    Background thread that pushes outbox rows to Cosmos. It flushes once a full
+    batch is waiting or the flush window has passed since the first new row, and
+    sweeps periodically for retries and rows left by other processes.
+    """
+
+    def __init__(self):
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._ensure_started()
+
+    def notify(self, count=1):
+        self._ensure_started()
+        with self._lock:
+            self._pending += count
+            if self._pending >= settings.COSMOS_OUTBOX_BATCH_SIZE:
+                self._batch_full.set()
+        self._wake.set()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._pending = 0
+                self._wake = threading.Event()
+                self._batch_full = threading.Event()
+                threading.Thread(target=self._run, name='cosmos-outbox-flusher', daemon=True).start()
+                self._pid = pid
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=settings.COSMOS_OUTBOX_SWEEP_INTERVAL)
+            self._wake.clear()
+            self._batch_full.wait(timeout=settings.COSMOS_OUTBOX_FLUSH_WINDOW)
+            self._batch_full.clear()
+            with self._lock:
+                self._pending = 0
+            try:
+                drain_outbox()
+            except Exception as e:
+                logger.error(f"Error flushing Cosmos outbox: {str(e)}", exc_info=True)
+            finally:
+                close_old_connections()
+
+
+outbox_flusher = OutboxFlusher()
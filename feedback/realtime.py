@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Feedback
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_GROUP = "feedback_group"
+SNAPSHOT_RECENT = 20
+SNAPSHOT_CACHE_SECONDS = 5
+
+
+def feedback_event(feedback):
+    return {
+        'id': feedback.id,
+        'status': feedback.status,
+        'analysis_status': feedback.analysis_status,
+        'sentiment': feedback.sentiment,
+        'scores': [feedback.score_positive, feedback.score_neutral, feedback.score_negative],
+        'is_assistance_request': feedback.is_assistance_request,
+        'submitted_at': feedback.submitted_at.isoformat() if feedback.submitted_at else None,
+    }
+
+
+def bulk_event(action, status, count, ids=None):
+    # One event for a change to many rows; it carries no sentiment, so only status filters apply to it.
+    return {'bulk': action, 'status': status, 'count': count, 'ids': ids}
+
+
+def analysis_event(result):
+    # Ad-hoc analyses are not stored as feedback rows: no id or status, so status filters exclude them.
+    return {
+        'id': None,
+        'status': None,
+        'analysis_status': 'completed',
+        'sentiment': result.sentiment,
+        'scores': [result.scores.positive, result.scores.neutral, result.scores.negative],
+    }
+
+
+def matches(event, filters):
+    return all(not allowed or field not in event or event[field] in allowed for field, allowed in filters.items())
+
+
+def build_snapshot(filters):
+    # Sent once per connection; cached briefly so a dashboard reload storm costs a handful of queries.
+    cache_key = 'realtime_snapshot:' + '|'.join(f"{field}={','.join(sorted(values))}"
+                                                for field, values in sorted(filters.items()))
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        selected = Feedback.objects.filter(**{f'{field}__in': values for field, values in filters.items() if values})
+        recent = selected.only('id', 'status', 'analysis_status', 'sentiment', 'score_positive', 'score_neutral',
+                               'score_negative', 'is_assistance_request', 'submitted_at') \
+            .order_by('-submitted_at', '-id')[:SNAPSHOT_RECENT]
+        snapshot = {
+            'by_status': dict(selected.order_by().values_list('status').annotate(count=Count('id'))),
+            'by_sentiment': {sentiment or 'unanalyzed': count for sentiment, count in
+                             selected.order_by().values_list('sentiment').annotate(count=Count('id'))},
+            'recent': [feedback_event(feedback) for feedback in recent],
+        }
+        cache.set(cache_key, snapshot, timeout=SNAPSHOT_CACHE_SECONDS)
+    return snapshot
+
+
+class FeedbackPublisher:
+    """
+    Coalesces feedback events from this process and sends them to the channel layer as one
+    batched group message per REALTIME_FLUSH_INTERVAL, instead of one message per event.
+    """
+
+    def __init__(self):
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        self._ensure_started()
+        with self._lock:
+            self._pending.append(event)
+        self._wake.set()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._pending = []
+                self._wake = threading.Event()
+                threading.Thread(target=self._run, name='feedback-realtime-publisher', daemon=True).start()
+                self._pid = pid
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let a burst accumulate before sending it as one frame.
+            time.sleep(settings.REALTIME_FLUSH_INTERVAL)
+            with self._lock:
+                self._wake.clear()
+                events, self._pending = self._pending, []
+            self.flush(events)
+
+    def flush(self, events):
+        for start in range(0, len(events), settings.REALTIME_MAX_BATCH):
+            batch = events[start:start + settings.REALTIME_MAX_BATCH]
+            try:
+                async_to_sync(get_channel_layer().group_send)(FEEDBACK_GROUP, {
+                    'type': 'feedback.batch',
+                    'events': batch,
+                })
+            except Exception as e:
+                logger.warning(f"Could not publish {len(batch)} feedback events: {str(e)}")
+
+
+feedback_publisher = FeedbackPublisher()
+
+
+def publish_feedback(feedback):
+    feedback_publisher.publish(feedback_event(feedback))
+
+
+def publish_on_commit(event):
+    # Outside a transaction this publishes at once; inside one, only if it commits.
+    transaction.on_commit(lambda: feedback_publisher.publish(event))
+
+
+def publish_feedback_on_commit(feedback):
+    transaction.on_commit(lambda: publish_feedback(feedback))
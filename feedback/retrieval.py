@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .azure_storage import download_file
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i in is it its of on or so that the their there this to was
+we were what when where which who why will with you your
+""".split())
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_sentences(text, max_words):
+    sentences = []
+    for sentence in SENTENCE_RE.split(text):
+        words = sentence.split()
+        # Unpunctuated speech-to-text output can be one huge "sentence"; cut it into windows.
+        sentences.extend(' '.join(words[i:i + max_words]) for i in range(0, len(words), max_words))
+    return sentences
+
+
+def split_chunks(transcript, chunk_words):
+    # Packs whole sentences into chunks of about `chunk_words` words; each chunk repeats the previous
+    # chunk's last sentence (if short) so an answer spanning a boundary is still found in one piece.
+    chunks, current, size = [], [], 0
+    for sentence in split_sentences(transcript, chunk_words):
+        words = len(sentence.split())
+        if current and size + words > chunk_words:
+            chunks.append(' '.join(current))
+            overlap = len(current[-1].split())
+            current, size = (current[-1:], overlap) if overlap <= chunk_words // 4 else ([], 0)
+        current.append(sentence)
+        size += words
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+class TranscriptIndex:
+    """
+    BM25 index over the chunks of one transcript, stored term-major (a CSC
+    layout) so a query touches only the postings of its own terms.
+    """
+
+    def __init__(self, chunks, vocabulary, term_indptr, term_chunks, term_freqs, chunk_lengths):
+        self.chunks = chunks
+        self.vocabulary = vocabulary
+        self.term_indptr = term_indptr
+        self.term_chunks = term_chunks
+        self.term_freqs = term_freqs
+        self.chunk_lengths = chunk_lengths
+        n_chunks = len(chunks)
+        document_freqs = np.diff(term_indptr)
+        self.idf = np.log1p((n_chunks - document_freqs + 0.5) / (document_freqs + 0.5))
+        self.average_length = chunk_lengths.mean() if n_chunks else 0.0
+
+    @classmethod
+    def build(cls, transcript, chunk_words):
+        chunks = split_chunks(transcript, chunk_words)
+        postings = {}
+        chunk_lengths = np.zeros(len(chunks), dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            chunk_lengths[chunk_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).append((chunk_id, count))
+
+        vocabulary = sorted(postings)
+        lengths = [len(postings[term]) for term in vocabulary]
+        term_indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=term_indptr[1:])
+        flat = [posting for term in vocabulary for posting in postings[term]]
+        term_chunks = np.array([chunk_id for chunk_id, _ in flat], dtype=np.int32)
+        term_freqs = np.array([count for _, count in flat], dtype=np.float32)
+        return cls(chunks, {term: i for i, term in enumerate(vocabulary)}, term_indptr, term_chunks, term_freqs,
+                   chunk_lengths)
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez(tmp_path, chunks=np.array(self.chunks, dtype=str), vocabulary=np.array(vocabulary, dtype=str),
+                 term_indptr=self.term_indptr, term_chunks=self.term_chunks, term_freqs=self.term_freqs,
+                 chunk_lengths=self.chunk_lengths)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['chunks'].tolist(), {term: i for i, term in enumerate(data['vocabulary'].tolist())},
+                       data['term_indptr'], data['term_chunks'], data['term_freqs'], data['chunk_lengths'])
+
+    def search(self, query, top_k):
+        """Indices of the `top_k` best-scoring chunks, in transcript order."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_lengths / (self.average_length or 1.0))
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_indptr[term_id], self.term_indptr[term_id + 1]
+            chunk_ids, freqs = self.term_chunks[start:end], self.term_freqs[start:end]
+            scores[chunk_ids] += self.idf[term_id] * freqs * (BM25_K1 + 1) / (freqs + norms[chunk_ids])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+        if not len(matched):
+            # Nothing in common with the question (e.g. "summarize this"): fall back to the opening chunks.
+            matched = np.arange(min(top_k, len(self.chunks)))
+        return sorted(matched.tolist())
+
+
+class TranscriptIndexStore:
+    """Indexes persisted as .npz files named by transcript hash, with a small per-process LRU of loaded ones."""
+
+    def __init__(self, directory, chunk_words=200, max_loaded=16):
+        self.directory = directory
+        self.chunk_words = chunk_words
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, transcript):
+        payload = f"{self.chunk_words}\0{transcript}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, transcript):
+        key = self._key(transcript)
+        with self._lock:
+            index = self._loaded.get(key)
+            if index is not None:
+                self._loaded.move_to_end(key)
+                return index
+
+        path = os.path.join(self.directory, f"{key}.npz")
+        try:
+            index = TranscriptIndex.load(path)
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            index = TranscriptIndex.build(transcript, self.chunk_words)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                index.save(path)
+            except OSError as e:
+                logger.warning(f"Could not persist transcript index: {str(e)}")
+            logger.info(f"Indexed transcript into {len(index.chunks)} chunks")
+
+        with self._lock:
+            self._loaded[key] = index
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return index
+
+
+transcript_indexes = TranscriptIndexStore(
+    directory=str(settings.RETRIEVAL_INDEX_DIR),
+    chunk_words=settings.RETRIEVAL_CHUNK_WORDS,
+)
+
+
+def relevant_chunks(transcript, question, top_k=None):
+    """
+    {chunk id: text} of the chunks relevant to the question, in transcript order, or None when the
+    transcript is short enough to go to the model whole.
+    """
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    if len(transcript.split()) <= settings.RETRIEVAL_CHUNK_WORDS * top_k:
+        return None
+    index = transcript_indexes.get(transcript)
+    return {i: index.chunks[i] for i in index.search(question, top_k)}
+
+
+def join_chunks(chunks):
+    return '\n...\n'.join(chunks)
+
+
+def transcript_context(transcript, question, top_k=None):
+    # Short transcripts go to the model whole; longer ones are cut down to the chunks relevant to the question.
+    chunks = relevant_chunks(transcript, question, top_k)
+    return transcript if chunks is None else join_chunks(chunks.values())
+
+
+def index_transcript(blob_name):
+    # Build the index right after an upload rather than on the first chatbot question
+    transcript = download_file(blob_name)
+    if transcript is None:
+        logger.warning(f"Could not index {blob_name}: transcript unavailable")
+        return
+    transcript_indexes.get(transcript)
@@ -0,0 +1,87 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import SentimentRollup
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELDS = (
+    ('sum_positive', 'confidence_score_positive'),
+    ('sum_neutral', 'confidence_score_neutral'),
+    ('sum_negative', 'confidence_score_negative'),
+)
+
+
+def bucket_for(timestamp):
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def aggregate_items(items, totals=None):
+    # Same population as the old GROUP BY c.overall_sentiment: items without it are not counted.
+    totals = totals if totals is not None else defaultdict(lambda: {'count': 0, 'sum_positive': 0.0,
+                                                                     'sum_neutral': 0.0, 'sum_negative': 0.0})
+    for item in items:
+        sentiment = item.get('overall_sentiment')
+        if not sentiment or 'timestamp' not in item:
+            continue
+        bucket = totals[(bucket_for(item['timestamp']), sentiment)]
+        bucket['count'] += 1
+        for field, key in SCORE_FIELDS:
+            bucket[field] += item.get(key) or 0.0
+    return totals
+
+
+def record_feedback(items):
+    # Call inside the transaction that stores the feedback, so counters and data commit together.
+    for (bucket_start, sentiment), delta in aggregate_items(items).items():
+        increments = {field: F(field) + value for field, value in delta.items()}
+        if SentimentRollup.objects.filter(bucket_start=bucket_start, sentiment=sentiment).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                SentimentRollup.objects.create(bucket_start=bucket_start, sentiment=sentiment, **delta)
+        except IntegrityError:
+            # Another request created the bucket first.
+            SentimentRollup.objects.filter(bucket_start=bucket_start, sentiment=sentiment).update(**increments)
+
+
+def sentiment_summary(since=None, until=None):
+    rollups = SentimentRollup.objects.all()
+    if since:
+        rollups = rollups.filter(bucket_start__gte=since)
+    if until:
+        rollups = rollups.filter(bucket_start__lt=until)
+
+    summary = []
+    for row in rollups.values('sentiment').annotate(
+            total=Sum('count'), positive=Sum('sum_positive'), neutral=Sum('sum_neutral'),
+            negative=Sum('sum_negative')).order_by('sentiment'):
+        total = row['total'] or 0
+        summary.append({
+            'overall_sentiment': row['sentiment'],
+            'count': total,
+            'avg_positive': row['positive'] / total if total else None,
+            'avg_neutral': row['neutral'] / total if total else None,
+            'avg_negative': row['negative'] / total if total else None,
+        })
+    return summary
+
+
+def rebuild_rollups(cosmos_items, pending_items=()):
+    totals = aggregate_items(cosmos_items)
+    aggregate_items(pending_items, totals)
+    with transaction.atomic():
+        SentimentRollup.objects.all().delete()
+        SentimentRollup.objects.bulk_create([
+            SentimentRollup(bucket_start=bucket_start, sentiment=sentiment, **values)
+            for (bucket_start, sentiment), values in totals.items()
+        ], batch_size=500)
+    logger.info(f"Rebuilt {len(totals)} sentiment rollup buckets")
+    return len(totals)
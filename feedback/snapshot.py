@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+
+from .cosmos_db_utils import cosmos_db
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    'timestamp': np.int64,  # epoch seconds, UTC; rows are appended in timestamp order
+    'sentiment': np.int8,
+    'positive': np.float32,
+    'neutral': np.float32,
+    'negative': np.float32,
+    'user_id': np.int64,  # -1 for anonymous
+    'id_hash': np.uint64,  # of the Cosmos id, to skip items seen before
+}
+FORMAT_VERSION = 2
+SENTIMENTS = ('positive', 'neutral', 'negative', 'mixed')
+SENTIMENT_CODES = {name: code for code, name in enumerate(SENTIMENTS)}
+INTERVALS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+WEEK_ORIGIN = 4 * 86400  # 1970-01-05 was a Monday
+
+
+def _epoch(moment):
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return int(moment.timestamp())
+
+
+def _user_code(user_id):
+    return int(user_id) if str(user_id).isdigit() else -1
+
+
+def _id_hash(item_id):
+    return int.from_bytes(hashlib.blake2b(str(item_id).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class SentimentSnapshot:
+    """
+    Columnar copy of the analyzed feedback in Cosmos, one raw NumPy file per column, sorted by
+    timestamp. Readers memory-map only the first `rows` entries recorded in meta.json, so an append
+    in progress is never visible.
+
+    Refreshes fetch the items Cosmos received (by _ts) since the last one, so items that arrive late
+    with an older timestamp are not missed; ids already in the snapshot are skipped. New rows that all
+    sort after the last one are appended; otherwise the columns are rewritten as a new generation of
+    files and meta.json is switched to it, leaving the old files intact for readers still using them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._mapped = None
+        self._mapped_key = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _column_path(self, name, generation):
+        return self._path(f'{name}.{generation}.bin')
+
+    def meta(self):
+        try:
+            with open(self._path('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._empty_meta()
+
+    @staticmethod
+    def _empty_meta():
+        return {'version': FORMAT_VERSION, 'rows': 0, 'generation': 0, 'high_water': None, 'refreshed_at': None}
+
+    def _write_meta(self, meta):
+        tmp_path = self._path('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path('meta.json'))
+
+    def columns(self):
+        meta = self.meta()
+        key = (meta.get('version'), meta.get('generation', 0), meta['rows'])
+        with self._lock:
+            if key != self._mapped_key:
+                rows = meta['rows'] if meta.get('version') == FORMAT_VERSION else 0
+                self._mapped = {
+                    name: np.memmap(self._column_path(name, meta['generation']), dtype=dtype, mode='r',
+                                    shape=(rows,))
+                    if rows else np.empty(0, dtype=dtype)
+                    for name, dtype in COLUMNS.items()
+                }
+                self._mapped_key = key
+            return self._mapped
+
+    @contextmanager
+    def _writer_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path('.lock'), 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def refresh(self, rebuild=False):
+        with self._writer_lock():
+            meta = self.meta()
+            if rebuild or meta.get('version') != FORMAT_VERSION:
+                self._remove_columns()
+                meta = self._empty_meta()
+                self._write_meta(meta)
+
+            # Cosmos sets _ts when it accepts a write; the newest few seconds are left for the next
+            # refresh in case this host's clock runs ahead of the service.
+            until_ts = int(time.time()) - settings.SENTIMENT_SNAPSHOT_LAG
+            generation = meta['generation']
+
+            # Truncate any partial append left by an interrupted refresh.
+            for name, dtype in COLUMNS.items():
+                path = self._column_path(name, generation)
+                if os.path.exists(path):
+                    os.truncate(path, meta['rows'] * np.dtype(dtype).itemsize)
+
+            first_build = meta['high_water'] is None
+            if first_build:
+                # Everything, in timestamp order, appended as it streams in. Items written while it
+                # runs are fetched again by the next refresh and skipped by id.
+                items = cosmos_db.iter_feedback(page_size=1000)
+            else:
+                items = cosmos_db.iter_feedback_written(meta['high_water'], until_ts, page_size=1000)
+
+            appended = 0
+            batch = []
+            for item in items:
+                if item.get('overall_sentiment') not in SENTIMENT_CODES:
+                    continue
+                batch.append(item)
+                if len(batch) >= 10000:
+                    appended += self._add(meta, batch, dedupe=not first_build)
+                    batch = []
+            appended += self._add(meta, batch, dedupe=not first_build)
+
+            meta['high_water'] = until_ts
+            meta['refreshed_at'] = time.time()
+            self._write_meta(meta)
+            logger.info(f"Sentiment snapshot refreshed: {appended} rows added, {meta['rows']} total")
+            return appended
+
+    def _remove_columns(self):
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.bin'):
+                os.remove(self._path(file_name))
+
+    def _add(self, meta, items, dedupe=True):
+        # Adds the items not already in the snapshot, keeping the columns sorted by timestamp.
+        if not items:
+            return 0
+        values = {
+            'timestamp': [_epoch(datetime.fromisoformat(item['timestamp'])) for item in items],
+            'sentiment': [SENTIMENT_CODES[item['overall_sentiment']] for item in items],
+            'positive': [item.get('confidence_score_positive') or 0.0 for item in items],
+            'neutral': [item.get('confidence_score_neutral') or 0.0 for item in items],
+            'negative': [item.get('confidence_score_negative') or 0.0 for item in items],
+            'user_id': [_user_code(item.get('user_id')) for item in items],
+            'id_hash': [_id_hash(item['id']) for item in items],
+        }
+        new = {name: np.asarray(values[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+        rows, generation = meta['rows'], meta['generation']
+        current = {name: np.memmap(self._column_path(name, generation), dtype=dtype, mode='r', shape=(rows,))
+                   if rows else np.empty(0, dtype=dtype)
+                   for name, dtype in COLUMNS.items()}
+        keep = np.ones(len(items), dtype=bool)
+        if dedupe:
+            _, first = np.unique(new['id_hash'], return_index=True)
+            keep[:] = False
+            keep[first] = True
+            keep &= ~np.isin(new['id_hash'], current['id_hash'])
+        order = np.argsort(new['timestamp'][keep], kind='stable')
+        new = {name: column[keep][order] for name, column in new.items()}
+        if not len(new['timestamp']):
+            return 0
+
+        if not rows or new['timestamp'][0] >= current['timestamp'][-1]:
+            for name in COLUMNS:
+                with open(self._column_path(name, generation), 'ab') as f:
+                    new[name].tofile(f)
+        else:
+            # Late items sort before rows already written: write the merged columns as a new generation.
+            merged_order = np.argsort(np.concatenate((current['timestamp'], new['timestamp'])), kind='stable')
+            generation += 1
+            for name in COLUMNS:
+                np.concatenate((current[name], new[name]))[merged_order].tofile(self._column_path(name, generation))
+            meta['generation'] = generation
+            meta['rows'] = rows + len(new['timestamp'])
+            self._write_meta(meta)
+            for name in COLUMNS:
+                try:
+                    os.remove(self._column_path(name, generation - 1))
+                except OSError:
+                    pass  # still mapped on Windows; removed by the next rebuild
+            return len(new['timestamp'])
+
+        meta['rows'] = rows + len(new['timestamp'])
+        return len(new['timestamp'])
+
+    def is_stale(self):
+        refreshed_at = self.meta()['refreshed_at']
+        return refreshed_at is None or time.time() - refreshed_at > settings.SENTIMENT_SNAPSHOT_MAX_AGE
+
+    def trends(self, interval, start, end, sentiment=None, user_id=None, window=None, percentiles=(50, 90)):
+        width = INTERVALS[interval]
+        origin_offset = WEEK_ORIGIN if interval == 'week' else 0
+        start_epoch, end_epoch = _epoch(start), _epoch(end)
+        origin = (start_epoch - origin_offset) // width * width + origin_offset
+        n_buckets = max(-(-(end_epoch - origin) // width), 0)
+        if n_buckets > settings.SENTIMENT_TRENDS_MAX_BUCKETS:
+            raise ValueError(f"The range spans {n_buckets} {interval} buckets; "
+                             f"narrow it to at most {settings.SENTIMENT_TRENDS_MAX_BUCKETS}")
+        if window is not None and not 1 <= window <= n_buckets:
+            raise ValueError(f"window must be between 1 and the number of buckets ({n_buckets})")
+
+        columns = self.columns()
+        # Rows are sorted by timestamp, so the range is two binary searches and a slice of the mapping.
+        lo, hi = np.searchsorted(columns['timestamp'], [start_epoch, end_epoch])
+        ts = columns['timestamp'][lo:hi]
+        codes = columns['sentiment'][lo:hi]
+        scores = {name: columns[name][lo:hi] for name in ('positive', 'neutral', 'negative')}
+
+        mask = np.ones(len(ts), dtype=bool)
+        if sentiment:
+            mask &= codes == SENTIMENT_CODES[sentiment]
+        if user_id is not None:
+            mask &= columns['user_id'][lo:hi] == _user_code(user_id)
+        if not mask.all():
+            ts, codes = ts[mask], codes[mask]
+            scores = {name: values[mask] for name, values in scores.items()}
+
+        buckets = ((ts - origin) // width).astype(np.int64)
+        counts = np.bincount(buckets, minlength=n_buckets)[:n_buckets]
+        by_sentiment = np.bincount(buckets * len(SENTIMENTS) + codes,
+                                   minlength=n_buckets * len(SENTIMENTS))[:n_buckets * len(SENTIMENTS)]
+        by_sentiment = by_sentiment.reshape(n_buckets, len(SENTIMENTS))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sums = {name: np.bincount(buckets, weights=values, minlength=n_buckets)[:n_buckets]
+                    for name, values in scores.items()}
+            means = {name: total / counts for name, total in sums.items()}
+
+            # Per-bucket percentiles of the positive score: sort by (bucket, score) once, then index
+            # each bucket's slice at the rank for every percentile.
+            order = np.lexsort((scores['positive'], buckets))
+            sorted_scores = scores['positive'][order]
+            bucket_starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if n_buckets else np.zeros(0, np.int64)
+            positive_percentiles = {}
+            for p in percentiles:
+                ranks = bucket_starts + np.floor((counts - 1) * p / 100.0).astype(np.int64)
+                values = np.full(n_buckets, np.nan)
+                has_rows = counts > 0
+                values[has_rows] = sorted_scores[ranks[has_rows]]
+                positive_percentiles[p] = values
+
+            moving_average = None
+            if window:
+                cumulative_sum = np.concatenate(([0.0], np.cumsum(sums['positive'])))
+                cumulative_count = np.concatenate(([0], np.cumsum(counts)))
+                lagged = np.maximum(np.arange(1, n_buckets + 1) - window, 0)
+                moving_average = (cumulative_sum[1:] - cumulative_sum[lagged]) / \
+                    (cumulative_count[1:] - cumulative_count[lagged])
+
+        def number(value):
+            return None if np.isnan(value) else round(float(value), 4)
+
+        return [{
+            'bucket_start': datetime.fromtimestamp(origin + i * width, tz=dt_timezone.utc).isoformat(),
+            'count': int(counts[i]),
+            'sentiments': {name: int(by_sentiment[i, code]) for code, name in enumerate(SENTIMENTS)},
+            'mean_scores': {name: number(means[name][i]) for name in means},
+            'positive_percentiles': {f'p{p}': number(values[i]) for p, values in positive_percentiles.items()},
+            'positive_moving_average': number(moving_average[i]) if moving_average is not None else None,
+        } for i in range(n_buckets)]
+
+
+sentiment_snapshot = SentimentSnapshot(str(settings.SENTIMENT_SNAPSHOT_DIR))
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+
+from .llm_gateway import LLMUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Server-sent events for the streaming chatbot and summary endpoints. The stream is a series of
+# `token` events ({"text": ...}) followed by `done` (with `done_data`, e.g. the chat session id), or by
+# `error` ({"error": ...}, plus "retry_after" seconds when the LLM gateway turned the request away) if
+# generation fails.
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_stream(tokens, error_message, done_data=None):
+    try:
+        for token in tokens:
+            yield sse_event('token', {'text': token})
+        yield sse_event('done', done_data or {})
+    except GeneratorExit:
+        # WSGI server noticed the client went away; closing `tokens` closes the LLM connection.
+        logger.info("Streaming client disconnected")
+        raise
+    except LLMUnavailable as e:
+        yield sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+    except Exception as e:
+        logger.error(f"Error while streaming LLM response: {str(e)}", exc_info=True)
+        yield sse_event('error', {'error': error_message})
+    finally:
+        tokens.close()
+
+
+async def asse_stream(tokens, error_message, done_data=None):
+    try:
+        async for token in tokens:
+            yield sse_event('token', {'text': token})
+        yield sse_event('done', done_data or {})
+    except asyncio.CancelledError:
+        # Django cancels the response when the ASGI client disconnects.
+        logger.info("Streaming client disconnected")
+        raise
+    except LLMUnavailable as e:
+        yield sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+    except Exception as e:
+        logger.error(f"Error while streaming LLM response: {str(e)}", exc_info=True)
+        yield sse_event('error', {'error': error_message})
+    finally:
+        await tokens.aclose()
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
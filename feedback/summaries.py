@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .azure_storage import download_file
+from .llm import (SUMMARY_MODEL, SUMMARY_ERROR, LLMError, build_summary_prompt, build_section_summary_prompt,
+                  format_summary, generate, agenerate, stream_lesson_summary, astream_lesson_summary)
+from .llm_gateway import PRIORITY_SUMMARY
+from .models import LessonSummary
+from .retrieval import split_sentences
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.5
+
+
+def summary_key(transcript, model=SUMMARY_MODEL, build_prompt=build_summary_prompt, depends_on=()):
+    # The prompt embeds the template and the transcript, so editing either produces a new key.
+    parts = [model, build_prompt(transcript), *(str(part) for part in depends_on)]
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def lesson_summary_key(transcript, model=SUMMARY_MODEL):
+    # A transcript longer than one section is summarized from its section summaries (see reduce), so its
+    # summary also changes with the section size and the section prompt template.
+    if len(transcript.split()) <= settings.SUMMARY_SECTION_WORDS:
+        return summary_key(transcript, model)
+    return summary_key(transcript, model,
+                       depends_on=(settings.SUMMARY_SECTION_WORDS, build_section_summary_prompt('')))
+
+
+def split_sections(text, target_words):
+    """
+    Splits at sentence boundaries into sections of roughly `target_words`. A section ends at a sentence
+    whose hash hits a fixed pattern (once past half the target), so boundaries depend on nearby content
+    only: an edit changes the sections around it, not every section after it.
+    """
+    divisor = max(1, target_words // 40)
+    sections, current, size = [], [], 0
+    for sentence in split_sentences(text, target_words):
+        current.append(sentence)
+        size += len(sentence.split())
+        at_boundary = size >= target_words // 2 and zlib.crc32(sentence.encode('utf-8')) % divisor == 0
+        if at_boundary or size >= target_words * 2:
+            sections.append(' '.join(current))
+            current, size = [], 0
+    if current:
+        sections.append(' '.join(current))
+    return sections
+
+
+_section_executor = None
+_section_executor_pid = None
+_section_executor_lock = threading.Lock()
+
+
+def section_executor():
+    # One bounded pool per process for section summaries, shared by all requests.
+    global _section_executor, _section_executor_pid
+    pid = os.getpid()
+    if _section_executor_pid != pid:
+        with _section_executor_lock:
+            if _section_executor_pid != pid:
+                _section_executor = ThreadPoolExecutor(max_workers=settings.SUMMARY_MAP_PARALLELISM,
+                                                       thread_name_prefix='lesson-summary')
+                _section_executor_pid = pid
+    return _section_executor
+
+
+class LessonSummaryStore:
+    """
+    Lesson summaries persisted in the database. Concurrent requests for the same
+    summary share one LLM call: threads and coroutines of a process wait on one
+    future, and processes coordinate through the row's 'pending' claim.
+    """
+
+    def __init__(self, model=SUMMARY_MODEL):
+        self.model = model
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        return LessonSummary.objects.filter(key=key, status='ready').values_list('summary', flat=True).first()
+
+    def get(self, transcript):
+        key = lesson_summary_key(transcript, self.model)
+        summary = self.lookup(key)
+        if summary is not None:
+            return summary
+
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        claim = None
+        try:
+            summary, claim = self._claim_or_wait(key, time.sleep)
+            if summary is None:
+                prompt = build_summary_prompt(self.reduce(transcript))
+                summary = self._finish(key, generate(self.model, prompt, PRIORITY_SUMMARY), claim)
+            future.set_result(summary)
+            return summary
+        except Exception as e:
+            self._release(key, claim)
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+
+    async def aget(self, transcript):
+        key = lesson_summary_key(transcript, self.model)
+        summary = await sync_to_async(self.lookup)(key)
+        if summary is not None:
+            return summary
+
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        claim = None
+        try:
+            summary, claim = await self._aclaim_or_wait(key)
+            if summary is None:
+                content = await sync_to_async(self.reduce, thread_sensitive=False)(transcript)
+                summary = await sync_to_async(self._finish)(
+                    key, await agenerate(self.model, build_summary_prompt(content), PRIORITY_SUMMARY), claim
+                )
+            future.set_result(summary)
+            return summary
+        except Exception as e:
+            await sync_to_async(self._release)(key, claim)
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+            if not future.done():
+                # Cancelled (client disconnected): waiters and other workers retry on their next request.
+                future.set_exception(LLMError("Summary generation was interrupted"))
+                await sync_to_async(self._release)(key, claim)
+
+    def stream(self, transcript):
+        # A hit is sent as a single chunk. A miss goes through the same claim as get: the leader streams from
+        # the LLM and stores the completed text, concurrent requests receive it as a single chunk.
+        key = lesson_summary_key(transcript, self.model)
+        summary = self.lookup(key)
+        if summary is not None:
+            yield summary
+            return
+
+        future, leader = self._join(key)
+        if not leader:
+            yield future.result()
+            return
+        claim = None
+        try:
+            summary, claim = self._claim_or_wait(key, time.sleep)
+            if summary is not None:
+                future.set_result(summary)
+                yield summary
+                return
+            chunks = []
+            for chunk in stream_lesson_summary(self.reduce(transcript)):
+                chunks.append(chunk)
+                yield chunk
+            summary = ''.join(chunks)
+            self._store(key, summary)
+            future.set_result(summary)
+        except Exception as e:
+            self._release(key, claim)
+            future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                # The client disconnected mid-stream.
+                future.set_exception(LLMError("Summary generation was interrupted"))
+                self._release(key, claim)
+            self._leave(key)
+
+    async def astream(self, transcript):
+        key = lesson_summary_key(transcript, self.model)
+        summary = await sync_to_async(self.lookup)(key)
+        if summary is not None:
+            yield summary
+            return
+
+        future, leader = self._join(key)
+        if not leader:
+            yield await asyncio.wrap_future(future)
+            return
+        claim = None
+        try:
+            summary, claim = await self._aclaim_or_wait(key)
+            if summary is not None:
+                future.set_result(summary)
+                yield summary
+                return
+            chunks = []
+            content = await sync_to_async(self.reduce, thread_sensitive=False)(transcript)
+            async for chunk in astream_lesson_summary(content):
+                chunks.append(chunk)
+                yield chunk
+            summary = ''.join(chunks)
+            await sync_to_async(self._store)(key, summary)
+            future.set_result(summary)
+        except Exception as e:
+            await sync_to_async(self._release)(key, claim)
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+            if not future.done():
+                # Cancelled or closed mid-stream (client disconnected).
+                future.set_exception(LLMError("Summary generation was interrupted"))
+                await sync_to_async(self._release)(key, claim)
+
+    def reduce(self, transcript):
+        """
+        Text for the final summary prompt: the transcript itself when it fits in one section,
+        otherwise the section summaries (map step), reduced again until they fit.
+        """
+        content = transcript
+        while len(content.split()) > settings.SUMMARY_SECTION_WORDS:
+            sections = split_sections(content, settings.SUMMARY_SECTION_WORDS)
+            reduced = '\n\n'.join(self._summarize_sections(sections))
+            if len(reduced.split()) >= len(content.split()):
+                break
+            content = reduced
+        return content
+
+    def _summarize_sections(self, sections):
+        keys = [summary_key(section, self.model, build_section_summary_prompt) for section in sections]
+        # Unchanged sections of an edited transcript keep their key, so only new sections reach the LLM.
+        done = dict(LessonSummary.objects.filter(key__in=keys, status='ready').values_list('key', 'summary'))
+        missing = [(key, section) for key, section in zip(keys, sections) if key not in done]
+        if missing:
+            logger.info(f"Summarizing {len(missing)} of {len(sections)} transcript sections")
+            prompts = [build_section_summary_prompt(section) for _, section in missing]
+            summarize = partial(generate, self.model, priority=PRIORITY_SUMMARY)
+            for (key, _), summary in zip(missing, section_executor().map(summarize, prompts)):
+                if summary is None:
+                    raise LLMError("Section summary failed")
+                done[key] = summary.strip()
+                self._store(key, done[key])
+        return [done[key] for key in keys]
+
+    def _join(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _leave(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _try_claim(self, key):
+        """
+        Returns (summary, claim): the finished summary if another worker stored it, or, if we now hold the
+        claim, the pending row's updated_at, which identifies our claim until another worker takes it over.
+        """
+        row = LessonSummary.objects.filter(key=key).only('id', 'status', 'summary', 'updated_at').first()
+        if row is None:
+            try:
+                return None, LessonSummary.objects.create(key=key, model=self.model, status='pending').updated_at
+            except IntegrityError:
+                return None, None
+        if row.status == 'ready':
+            return row.summary, None
+        stale_before = timezone.now() - timedelta(seconds=settings.LESSON_SUMMARY_CLAIM_TIMEOUT)
+        if row.updated_at < stale_before:
+            # The claiming worker died or gave up; take the claim over.
+            claimed_at = timezone.now()
+            taken = LessonSummary.objects.filter(id=row.id, status='pending', updated_at=row.updated_at) \
+                .update(updated_at=claimed_at)
+            return None, claimed_at if taken else None
+        return None, None
+
+    def _claim_or_wait(self, key, sleep):
+        # Returns (summary, claim) like _try_claim; both are None when the wait timed out without a claim.
+        deadline = time.monotonic() + settings.LESSON_SUMMARY_CLAIM_TIMEOUT
+        while True:
+            summary, claim = self._try_claim(key)
+            if summary is not None or claim is not None or time.monotonic() > deadline:
+                return summary, claim
+            sleep(POLL_INTERVAL)
+
+    async def _aclaim_or_wait(self, key):
+        deadline = time.monotonic() + settings.LESSON_SUMMARY_CLAIM_TIMEOUT
+        while True:
+            summary, claim = await sync_to_async(self._try_claim)(key)
+            if summary is not None or claim is not None or time.monotonic() > deadline:
+                return summary, claim
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _finish(self, key, summary, claim):
+        if summary is None:
+            self._release(key, claim)
+            return SUMMARY_ERROR
+        summary = format_summary(summary)
+        self._store(key, summary)
+        return summary
+
+    def _release(self, key, claim):
+        # Drop our claim after a failed generation so the next request tries again. A caller that generated
+        # without a claim, or whose claim was taken over, leaves the other worker's row alone.
+        if claim is not None:
+            LessonSummary.objects.filter(key=key, status='pending', updated_at=claim).delete()
+
+    def _store(self, key, summary):
+        LessonSummary.objects.update_or_create(
+            key=key, defaults={'model': self.model, 'status': 'ready', 'summary': summary}
+        )
+
+
+lesson_summaries = LessonSummaryStore()
+
+
+def precompute_lesson_summary(blob_name):
+    transcript = download_file(blob_name)
+    if transcript is None:
+        logger.warning(f"Could not precompute summary for {blob_name}: transcript unavailable")
+        return
+    lesson_summaries.get(transcript)
+    logger.info(f"Precomputed lesson summary for {blob_name}")
@@ -0,0 +1,153 @@
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .analysis import analysis_engine
+from .models import Feedback
+from .outbox import enqueue_cosmos_write
+from .realtime import publish_feedback
+from .snapshot import sentiment_snapshot
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor_pid != pid:
+        with _executor_lock:
+            if _executor_pid != pid:
+                # Worker threads do not survive a fork, so each process gets its own pool.
+                _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS,
+                                               thread_name_prefix='feedback-task')
+                _executor_pid = pid
+    return _executor
+
+
+def backoff_delay(attempt):
+    delay = settings.TASK_RETRY_BACKOFF * (2 ** (attempt - 1))
+    return min(delay, settings.TASK_RETRY_BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+def enqueue_feedback_analysis(feedback_id):
+    return get_executor().submit(process_feedback_analysis, feedback_id)
+
+
+def process_feedback_analysis(feedback_id):
+    try:
+        _process_feedback_analysis(feedback_id)
+    finally:
+        close_old_connections()
+
+
+def _process_feedback_analysis(feedback_id):
+    result = None
+    max_attempts = settings.TASK_MAX_ATTEMPTS
+
+    for attempt in range(1, max_attempts + 1):
+        updated = Feedback.objects.filter(id=feedback_id).update(
+            analysis_status='processing', analysis_attempts=attempt
+        )
+        if not updated:
+            logger.warning(f"Feedback {feedback_id} no longer exists, skipping analysis")
+            return
+
+        try:
+            feedback = Feedback.objects.get(id=feedback_id)
+            # A successful analysis is not repeated on retry.
+            if result is None:
+                result = analysis_engine.analyze(feedback.text)
+
+            user_id = str(feedback.user_id) if feedback.user_id else 'anonymous'
+            fields = dict(analysis_status='completed', analysis_error='', **result.to_feedback_fields())
+            with transaction.atomic():
+                Feedback.objects.filter(id=feedback_id).update(**fields)
+                enqueue_cosmos_write(result.to_cosmos(feedback.text, user_id))
+            logger.info(f"Feedback {feedback_id} analyzed on attempt {attempt}")
+            for name, value in fields.items():
+                setattr(feedback, name, value)
+            publish_feedback(feedback)
+            return
+        except Exception as e:
+            if attempt == max_attempts:
+                logger.error(f"Analysis of feedback {feedback_id} failed after {attempt} attempts: {str(e)}",
+                             exc_info=True)
+                Feedback.objects.filter(id=feedback_id).update(analysis_status='failed', analysis_error=str(e))
+                feedback = Feedback.objects.filter(id=feedback_id).first()
+                if feedback:
+                    publish_feedback(feedback)
+                return
+            delay = backoff_delay(attempt)
+            logger.warning(f"Analysis of feedback {feedback_id} failed (attempt {attempt}), "
+                           f"retrying in {delay:.1f}s: {str(e)}")
+            time.sleep(delay)
+
+
+_snapshot_refresh_running = threading.Event()
+
+
+def refresh_snapshot_in_background():
+    # At most one refresh per process; the snapshot's file lock serializes processes.
+    if _snapshot_refresh_running.is_set():
+        return
+    _snapshot_refresh_running.set()
+
+    def run():
+        try:
+            sentiment_snapshot.refresh()
+        except Exception as e:
+            logger.error(f"Sentiment snapshot refresh failed: {str(e)}", exc_info=True)
+        finally:
+            _snapshot_refresh_running.clear()
+
+    get_executor().submit(run)
+
+
+# Long-running jobs (imports, archival) report progress through a cache shared by all workers (Redis or the
+# database, see JOB_STATUS_CACHE), so any worker can answer status requests.
+
+def _job_cache():
+    return caches[settings.JOB_STATUS_CACHE]
+
+
+def get_job(job_id):
+    return _job_cache().get(f'job:{job_id}')
+
+
+def update_job(job_id, **fields):
+    job = get_job(job_id) or {'id': job_id}
+    job.update(fields, updated_at=timezone.now().isoformat())
+    _job_cache().set(f'job:{job_id}', job, timeout=settings.JOB_STATUS_TTL)
+    return job
+
+
+def start_job(kind, fn, *args, **kwargs):
+    job_id = uuid.uuid4().hex
+    update_job(job_id, kind=kind, state='queued')
+
+    def run():
+        update_job(job_id, state='running')
+        try:
+            result = fn(*args, progress=lambda **fields: update_job(job_id, **fields), **kwargs)
+            update_job(job_id, state='completed', result=result)
+        except Exception as e:
+            logger.error(f"{kind} job {job_id} failed: {str(e)}", exc_info=True)
+            update_job(job_id, state='failed', error=str(e))
+        finally:
+            close_old_connections()
+
+    get_executor().submit(run)
+    return job_id
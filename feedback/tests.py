@@ -1,3 +1,1508 @@
 # feedback/tests.py
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+from channels.testing.websocket import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .analysis import AnalysisEngine, LocalBackend
+from .analysis_cache import AnalysisCache
+from .archival import archive_feedback
+from .azure_storage import download_file
+from .batching import DocumentAnalysisError, DocumentBatcher
+from .chat_sessions import ChatSessionStore
+from .clients import ClientRegistry, client_stats, get_async_blob_service_client, get_async_http_session
+from .consumers import FeedbackConsumer
+from .cosmos_db_utils import CosmosDBManager, month_buckets, partition_bucket
+from .downloads import parse_range
+from .importer import Checkpoint, import_feedback, import_uploaded_file
+from .listing import feedback_page, parse_filters, serialize_feedback
+from .llm import CHAT_ERROR, SUMMARY_ERROR, SUMMARY_HEADER, LLMError
+from .llm_gateway import PRIORITY_CHAT, PRIORITY_SUMMARY, LLMGateway, LLMUnavailable
+from .models import CosmosOutbox, CustomUser, Feedback, LessonSummary, SentimentRollup
+from .moderation import bulk_transition
+from .outbox import enqueue_cosmos_writes, flush_outbox
+from .retrieval import (
+    TranscriptIndex, TranscriptIndexStore, index_transcript, relevant_chunks, split_chunks, split_sentences,
+    transcript_context,
+)
+from .rollups import rebuild_rollups, record_feedback, sentiment_summary
+from .snapshot import SentimentSnapshot
+from .summaries import LessonSummaryStore, lesson_summary_key, split_sections
+from .tasks import get_job, process_feedback_analysis, start_job
+from .transcript_cache import CachedTranscript, TranscriptCache
+from .uploads import BlobUploadHandler, BlockBlobUpload
+
+
+class AnalysisEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = AnalysisEngine(LocalBackend(), cache=AnalysisCache(max_entries=16))
+
+    def test_analyze_scores_sentiment_and_key_phrases(self):
+        result = self.engine.analyze("The lecture was great and very helpful")
+        self.assertEqual(result.sentiment, 'positive')
+        self.assertGreater(result.scores.positive, result.scores.negative)
+        self.assertIn('lecture', result.key_phrases)
+
+    def test_analyze_without_key_phrases(self):
+        result = self.engine.analyze("Boring and confusing", key_phrases=False)
+        self.assertEqual(result.sentiment, 'negative')
+        self.assertEqual(result.key_phrases, [])
+
+    def test_analyze_many_keeps_input_order(self):
+        results = self.engine.analyze_many(["great class", "bad class", "a class"])
+        self.assertEqual([result.sentiment for result in results], ['positive', 'negative', 'neutral'])
+
+    def test_cached_result_skips_the_backend(self):
+        self.engine.analyze("Clear and useful")
+        with mock.patch.object(LocalBackend, 'submit_sentiment') as submit:
+            result = self.engine.analyze("Clear and useful")
+        submit.assert_not_called()
+        self.assertEqual(result.sentiment, 'positive')
+
+    def test_analyze_many_returns_document_errors_in_place(self):
+        backend = LocalBackend()
+        submit = backend.submit_sentiment
+
+        def submit_sentiment(text, opinion_mining=True):
+            if text != 'broken':
+                return submit(text, opinion_mining)
+            future = Future()
+            future.set_exception(DocumentAnalysisError('InvalidDocument', 'Document text is empty.'))
+            return future
+
+        backend.submit_sentiment = submit_sentiment
+        results = AnalysisEngine(backend).analyze_many(["good", "broken", "bad"])
+        self.assertIsInstance(results[1], DocumentAnalysisError)
+        self.assertEqual([results[0].sentiment, results[2].sentiment], ['positive', 'negative'])
+
+
+class DocumentBatcherTests(SimpleTestCase):
+    def test_results_are_matched_by_document_id(self):
+        def operation(texts):
+            return [SimpleNamespace(id=str(i), text=text, is_error=False) for i, text in enumerate(texts)][::-1]
+
+        batcher = DocumentBatcher('test-order', operation, max_batch_size=3, max_wait_ms=50)
+        futures = [batcher.submit(text) for text in 'abc']
+        self.assertEqual([future.result(timeout=5).text for future in futures], ['a', 'b', 'c'])
+
+    def test_document_without_a_result_fails(self):
+        batcher = DocumentBatcher('test-missing', lambda texts: [SimpleNamespace(id='0', is_error=False)],
+                                  max_batch_size=2, max_wait_ms=50)
+        first, second = batcher.submit('a'), batcher.submit('b')
+        self.assertEqual(first.result(timeout=5).id, '0')
+        with self.assertRaises(DocumentAnalysisError):
+            second.result(timeout=5)
+
+    def test_error_documents_raise(self):
+        error = SimpleNamespace(is_error=True, error=SimpleNamespace(code='InvalidDocument', message='empty'))
+        batcher = DocumentBatcher('test-error', lambda texts: [error], max_batch_size=1)
+        with self.assertRaisesMessage(DocumentAnalysisError, 'InvalidDocument'):
+            batcher.submit('').result(timeout=5)
+
+
+class ClientRegistryTests(SimpleTestCase):
+    def test_client_is_created_once_per_process(self):
+        registry = ClientRegistry()
+        factory = mock.Mock(side_effect=lambda session: SimpleNamespace(session=session))
+        client = registry.get('service', factory)
+        self.assertIs(registry.get('service', factory), client)
+        self.assertEqual(factory.call_count, 1)
+        self.assertEqual(registry.stats()['clients']['service'],
+                         {'requests': 0, 'connections_created': 0, 'connections_reused': 0})
+
+        # In a forked child the parent's clients (and their sockets) are not reused
+        with mock.patch('feedback.clients.os.getpid', return_value=registry.stats()['pid'] + 1):
+            self.assertIsNot(registry.get('service', factory), client)
+        self.assertEqual(factory.call_count, 2)
+
+    def test_concurrent_first_use_creates_one_client(self):
+        registry = ClientRegistry()
+        created = []
+
+        def factory(session):
+            time.sleep(0.05)
+            created.append(session)
+            return session
+
+        threads = [threading.Thread(target=registry.get, args=('service', factory)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(created), 1)
+
+
+class AsyncClientTests(SimpleTestCase):
+    def test_clients_are_shared_within_a_loop_and_closed_with_it(self):
+        async def use_clients():
+            session = get_async_http_session()
+            self.assertIs(get_async_http_session(), session)
+            get_async_blob_service_client()
+            self.assertEqual(client_stats()['async_sessions'], 1)
+            return session
+
+        # Under WSGI every async view runs in a loop of its own
+        sessions = [async_to_sync(use_clients)() for _ in range(2)]
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertTrue(all(session.closed for session in sessions))
+        self.assertEqual(client_stats()['async_sessions'], 0)
+
+
+@override_settings(TASK_MAX_ATTEMPTS=3, TASK_RETRY_BACKOFF=0)
+@mock.patch('feedback.outbox.outbox_flusher.notify')
+@mock.patch('feedback.realtime.feedback_publisher.publish')
+class FeedbackAnalysisTaskTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('student', password='pw')
+        self.feedback = Feedback.objects.create(user=self.user, text='The lab was great', analysis_status='pending')
+        self.engine = AnalysisEngine(LocalBackend())
+
+    def test_retries_until_the_analysis_succeeds(self, publish, notify):
+        analyze = mock.Mock(side_effect=[RuntimeError('throttled'), self.engine.analyze('The lab was great')])
+        with mock.patch('feedback.tasks.analysis_engine.analyze', analyze):
+            process_feedback_analysis(self.feedback.id)
+        self.feedback.refresh_from_db()
+        self.assertEqual((self.feedback.analysis_status, self.feedback.analysis_attempts), ('completed', 2))
+        self.assertEqual(self.feedback.sentiment, 'positive')
+        self.assertEqual(CosmosOutbox.objects.get().body['user_id'], str(self.user.id))
+        self.assertEqual(publish.call_args[0][0]['analysis_status'], 'completed')
+
+    def test_gives_up_after_the_last_attempt(self, publish, notify):
+        with mock.patch('feedback.tasks.analysis_engine.analyze', side_effect=RuntimeError('service down')):
+            process_feedback_analysis(self.feedback.id)
+        self.feedback.refresh_from_db()
+        self.assertEqual((self.feedback.analysis_status, self.feedback.analysis_attempts), ('failed', 3))
+        self.assertEqual(self.feedback.analysis_error, 'service down')
+        self.assertFalse(CosmosOutbox.objects.exists())
+        self.assertEqual(publish.call_args[0][0]['analysis_status'], 'failed')
+
+    def test_submit_queues_the_analysis_after_commit(self, publish, notify):
+        self.client.force_login(self.user)
+        with mock.patch('feedback.views.enqueue_feedback_analysis') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/feedback/submit_feedback/', {'feedback': 'Too fast'})
+        self.assertEqual(response.status_code, 302)
+        feedback = Feedback.objects.get(text='Too fast')
+        enqueue.assert_called_once_with(feedback.id)
+        self.assertEqual(self.client.get(f'/feedback/feedback_status/{feedback.id}/').json()['analysis_status'],
+                         'pending')
+
+    def test_status_is_private_to_the_author_and_moderators(self, publish, notify):
+        self.client.force_login(CustomUser.objects.create_user('other', password='pw'))
+        self.assertEqual(self.client.get(f'/feedback/feedback_status/{self.feedback.id}/').status_code, 403)
+
+
+@mock.patch('feedback.outbox.outbox_flusher.notify')
+class CosmosOutboxTests(TestCase):
+    def items(self, *timestamps):
+        return [{'id': f'item-{i}', 'timestamp': timestamp, 'overall_sentiment': 'positive',
+                 'confidence_score_positive': 0.9, 'confidence_score_neutral': 0.1, 'confidence_score_negative': 0.0}
+                for i, timestamp in enumerate(timestamps)]
+
+    def test_writes_are_queued_with_their_partition_and_flushed_per_partition(self, notify):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue_cosmos_writes(self.items('2024-08-01T10:00:00', '2024-08-02T10:00:00', '2024-09-01T10:00:00'))
+        notify.assert_called_once_with(3)
+        self.assertEqual(sorted(CosmosOutbox.objects.values_list('partition_key', flat=True)),
+                         ['2024-08', '2024-08', '2024-09'])
+
+        with mock.patch('feedback.outbox.cosmos_db.upsert_batch') as upsert_batch:
+            self.assertEqual(flush_outbox(), (3, 3))
+        batches = {call.args[0]: [item['id'] for item in call.args[1]] for call in upsert_batch.call_args_list}
+        self.assertEqual(batches, {'2024-08': ['item-0', 'item-1'], '2024-09': ['item-2']})
+        self.assertFalse(CosmosOutbox.objects.exists())
+
+    def test_failed_batch_backs_off_and_is_retried(self, notify):
+        enqueue_cosmos_writes(self.items('2024-08-01T10:00:00'))
+        with mock.patch('feedback.outbox.cosmos_db.upsert_batch', side_effect=RuntimeError('429 Too Many Requests')):
+            self.assertEqual(flush_outbox(), (0, 1))
+        entry = CosmosOutbox.objects.get()
+        self.assertEqual((entry.attempts, entry.last_error, entry.claim_token), (1, '429 Too Many Requests', None))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+
+        # Not claimed again before its backoff has passed
+        with mock.patch('feedback.outbox.cosmos_db.upsert_batch') as upsert_batch:
+            self.assertEqual(flush_outbox(), (0, 0))
+            CosmosOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(flush_outbox(), (1, 1))
+        upsert_batch.assert_called_once()
+        self.assertFalse(CosmosOutbox.objects.exists())
+
+    def test_rows_claimed_by_another_flusher_are_skipped(self, notify):
+        enqueue_cosmos_writes(self.items('2024-08-01T10:00:00'))
+        CosmosOutbox.objects.update(claimed_until=timezone.now() + timedelta(minutes=1))
+        with mock.patch('feedback.outbox.cosmos_db.upsert_batch') as upsert_batch:
+            self.assertEqual(flush_outbox(), (0, 0))
+        upsert_batch.assert_not_called()
+
+    def test_rolled_back_writes_are_not_queued(self, notify):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_cosmos_writes(self.items('2024-08-01T10:00:00'))
+                raise RuntimeError('local write failed')
+        self.assertFalse(CosmosOutbox.objects.exists())
+        notify.assert_not_called()
+
+
+class FakeCosmosContainer:
+    """query_items(...).by_page(token) over fixed pages; the continuation token is the next page's index."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.queries = []
+        self.client_connection = SimpleNamespace(last_response_headers={'x-ms-request-charge': '2.5'})
+
+    def query_items(self, query, parameters, max_item_count, **options):
+        self.queries.append((query, parameters, options))
+        return SimpleNamespace(by_page=lambda token: self._pager(int(token or 0)))
+
+    def _pager(self, index):
+        pages = self.pages
+
+        class Pager:
+            continuation_token = None
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                self.continuation_token = str(index + 1) if index + 1 < len(pages) else None
+                return iter(pages[index])
+
+        return Pager()
+
+
+class CosmosQueryTests(SimpleTestCase):
+    def setUp(self):
+        with mock.patch('feedback.cosmos_db_utils.CosmosClient'):
+            self.manager = CosmosDBManager()
+        self.manager.container = FakeCosmosContainer([[{'id': 'a'}, {'id': 'b'}], [{'id': 'c'}]])
+
+    def test_partition_buckets(self):
+        self.assertEqual(partition_bucket('2024-08-01T10:00:00'), '2024-08')
+        self.assertEqual(month_buckets(datetime(2024, 11, 20), datetime(2025, 2, 1)),
+                         ['2024-11', '2024-12', '2025-01', '2025-02'])
+
+    def test_query_page_returns_the_continuation_and_charge(self):
+        page = self.manager.query_page('SELECT * FROM c', partition_key='2024-08', page_size=2)
+        self.assertEqual(([item['id'] for item in page.items], page.continuation, page.request_charge),
+                         (['a', 'b'], '1', 2.5))
+        self.assertEqual(self.manager.container.queries[0][2], {'partition_key': '2024-08'})
+
+        page = self.manager.query_page('SELECT * FROM c', continuation=page.continuation)
+        self.assertEqual(([item['id'] for item in page.items], page.continuation), (['c'], None))
+        self.assertEqual(self.manager.container.queries[1][2], {'enable_cross_partition_query': True})
+
+    def test_iter_query_follows_continuations(self):
+        self.assertEqual([item['id'] for item in self.manager.iter_query('SELECT * FROM c')], ['a', 'b', 'c'])
+
+    def test_time_range_only_queries_its_month_partitions(self):
+        list(self.manager.iter_feedback(since=datetime(2024, 7, 15), until=datetime(2024, 8, 10)))
+        partitions = [options.get('partition_key') for _, _, options in self.manager.container.queries]
+        self.assertEqual(partitions, ['2024-07', '2024-07', '2024-08', '2024-08'])
+        query, parameters, _ = self.manager.container.queries[0]
+        self.assertIn('c.timestamp >= @since AND c.timestamp < @until', query)
+        self.assertEqual(parameters[0], {'name': '@since', 'value': '2024-07-15T00:00:00'})
+
+
+class SentimentRollupTests(TestCase):
+    def item(self, timestamp, sentiment, positive):
+        return {'timestamp': timestamp, 'overall_sentiment': sentiment, 'confidence_score_positive': positive,
+                'confidence_score_neutral': 0.0, 'confidence_score_negative': 1.0 - positive}
+
+    def test_counters_are_incremented_per_hour_and_sentiment(self):
+        record_feedback([self.item('2024-08-01T10:05:00', 'positive', 0.8),
+                         self.item('2024-08-01T10:55:00', 'positive', 0.6)])
+        record_feedback([self.item('2024-08-01T10:30:00+00:00', 'positive', 1.0),
+                         self.item('2024-08-01T11:00:00', 'negative', 0.2),
+                         {'timestamp': '2024-08-01T11:00:00'}])
+        rollup = SentimentRollup.objects.get(sentiment='positive')
+        self.assertEqual(rollup.bucket_start.isoformat(), '2024-08-01T10:00:00+00:00')
+        self.assertEqual(rollup.count, 3)
+        self.assertAlmostEqual(rollup.sum_positive, 2.4)
+        self.assertEqual(SentimentRollup.objects.count(), 2)
+
+    def test_summary_averages_over_the_selected_buckets(self):
+        record_feedback([self.item('2024-08-01T10:00:00', 'positive', 0.8),
+                         self.item('2024-08-02T10:00:00', 'positive', 0.6),
+                         self.item('2024-08-02T12:00:00', 'negative', 0.1)])
+        summary = {row['overall_sentiment']: row for row in sentiment_summary()}
+        self.assertEqual((summary['positive']['count'], summary['negative']['count']), (2, 1))
+        self.assertAlmostEqual(summary['positive']['avg_positive'], 0.7)
+
+        since = timezone.make_aware(datetime(2024, 8, 2))
+        self.assertEqual([(row['overall_sentiment'], row['count']) for row in sentiment_summary(since=since)],
+                         [('negative', 1), ('positive', 1)])
+
+    def test_rebuild_replaces_the_counters(self):
+        record_feedback([self.item('2024-08-01T10:00:00', 'positive', 0.8)] * 5)
+        rebuild_rollups([self.item('2024-08-01T10:00:00', 'positive', 0.8)],
+                        [self.item('2024-08-01T10:00:00', 'neutral', 0.5)])
+        self.assertEqual(dict(SentimentRollup.objects.values_list('sentiment', 'count')),
+                         {'positive': 1, 'neutral': 1})
+
+
+class FeedbackAnalysisFieldsTests(TestCase):
+    def test_results_round_trip_through_the_columns(self):
+        result = AnalysisEngine(LocalBackend()).analyze("The examples were clear and useful")
+        feedback = Feedback.objects.create(text='x', **result.to_feedback_fields())
+        feedback.refresh_from_db()
+        self.assertEqual(feedback.analysis_results(), result.to_dict())
+        self.assertIsNone(Feedback.objects.create(text='y').analysis_results())
+
+
+class FeedbackAnalysisMigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('feedback', target)])
+        return executor.loader.project_state([('feedback', target)]).apps
+
+    def test_analysis_blobs_are_copied_into_columns(self):
+        apps = self.migrate('0006_sentimentrollup_and_more')
+        OldFeedback = apps.get_model('feedback', 'Feedback')
+        analyzed = OldFeedback.objects.create(text='x', analysis={
+            'sentiment': 'negative', 'overall_scores': {'positive': 0.1, 'neutral': 0.2, 'negative': 0.7},
+            'key_phrases': ['pace'], 'opinions': [],
+        })
+        pending = OldFeedback.objects.create(text='y')
+        try:
+            self.migrate('0007_feedback_analysis_fields')
+            copied = Feedback.objects.only('id', 'sentiment', 'score_negative', 'key_phrases').get(id=analyzed.id)
+            self.assertEqual((copied.sentiment, copied.score_negative, copied.key_phrases), ('negative', 0.7, ['pace']))
+            self.assertIsNone(Feedback.objects.only('id', 'sentiment').get(id=pending.id).sentiment)
+        finally:
+            self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('feedback')[0][1])
+
+
+class ParseFiltersTests(SimpleTestCase):
+    def test_known_filters(self):
+        filters = parse_filters({'status': 'reviewed', 'sentiment': 'negative', 'assistance': 'true'})
+        self.assertEqual(filters, {'status': 'reviewed', 'sentiment': 'negative', 'is_assistance_request': True})
+
+    def test_assistance_accepts_json_booleans(self):
+        self.assertEqual(parse_filters({'assistance': False}), {'is_assistance_request': False})
+        self.assertEqual(parse_filters({'assistance': ''}), {})
+
+    def test_invalid_values(self):
+        for params in ({'status': 'archived'}, {'sentiment': 'angry'}, {'assistance': 'maybe'}, {'since': 'x'}):
+            with self.assertRaises(ValueError):
+                parse_filters(params)
+
+    def test_unknown_keys_only_rejected_when_strict(self):
+        self.assertEqual(parse_filters({'stauts': 'reviewed'}), {})
+        with self.assertRaisesMessage(ValueError, 'stauts'):
+            parse_filters({'stauts': 'reviewed'}, strict=True)
+
+
+class FeedbackPageTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('manager', password='pw', role='manager')
+        for i in range(7):
+            Feedback.objects.create(user=self.user, text=f'feedback {i}', sentiment='negative' if i % 2 else 'positive')
+        # Rows sharing a timestamp are ordered by id, so none is skipped or repeated at a page boundary
+        Feedback.objects.filter(id__in=Feedback.objects.order_by('id').values('id')[1:5]) \
+            .update(submitted_at=timezone.now())
+
+    def test_pages_walk_every_row_once_in_order(self):
+        expected = list(Feedback.objects.order_by('-submitted_at', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                rows, cursor = feedback_page({}, cursor=cursor, page_size=3)
+                items = [serialize_feedback(row) for row in rows]
+            self.assertEqual({item['user'] for item in items}, {'manager'})
+            seen += [item['id'] for item in items]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_api_filters_and_rejects_bad_input(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/feedback/api/feedback/', {'sentiment': 'negative', 'page_size': 2})
+        self.assertEqual([item['sentiment'] for item in response.json()['items']], ['negative'] * 2)
+        following = self.client.get('/feedback/api/feedback/', {'sentiment': 'negative',
+                                                                 'cursor': response.json()['next_cursor']})
+        self.assertEqual(len(following.json()['items']), 1)
+        self.assertIsNone(following.json()['next_cursor'])
+        for params in ({'cursor': 'not-a-cursor'}, {'status': 'archived'}, {'page_size': 'ten'}):
+            self.assertEqual(self.client.get('/feedback/api/feedback/', params).status_code, 400, params)
+
+
+@mock.patch('feedback.realtime.feedback_publisher.publish')
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.submitted = Feedback.objects.create(text='one')
+        self.reviewed = Feedback.objects.create(text='two', status='reviewed')
+        self.approved = Feedback.objects.create(text='three', status='approved', is_assistance_request=True)
+
+    def test_ids_skip_rows_the_action_cannot_move(self, publish):
+        result = bulk_transition('review', ids=[self.submitted.id, self.reviewed.id, self.approved.id])
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(result['skipped_ids'], sorted([self.reviewed.id, self.approved.id]))
+        self.submitted.refresh_from_db()
+        self.assertEqual(self.submitted.status, 'reviewed')
+        self.assertIsNotNone(self.submitted.reviewed_at)
+
+    def test_filter(self, publish):
+        result = bulk_transition('reject', filters=parse_filters({'assistance': False}))
+        self.assertEqual((result['updated'], result['skipped']), (2, 0))
+        self.assertEqual(Feedback.objects.filter(status='rejected').count(), 2)
+        self.assertEqual(Feedback.objects.get(id=self.approved.id).status, 'approved')
+
+    def test_filter_reports_skipped_ids(self, publish):
+        result = bulk_transition('review', filters={'text__in': ['one', 'two', 'three']})
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(result['skipped'], 2)
+        self.assertEqual(result['skipped_ids'], sorted([self.reviewed.id, self.approved.id]))
+
+    def test_filter_larger_than_max_ids_is_refused(self, publish):
+        with mock.patch('feedback.moderation.MAX_IDS', 1):
+            with self.assertRaises(ValueError):
+                bulk_transition('approve', filters={'status__in': ['submitted', 'reviewed']})
+        self.assertFalse(Feedback.objects.filter(status='approved').exclude(id=self.approved.id).exists())
+
+    def test_one_aggregate_event_after_commit(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_transition('approve', ids=[self.submitted.id, self.reviewed.id])
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0]['count'], 2)
+
+
+@mock.patch('feedback.outbox.outbox_flusher.notify')
+@mock.patch('feedback.realtime.feedback_publisher.publish')
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'survey.csv')
+        with open(self.path, 'w') as f:
+            f.write('feedback\n' + ''.join(f'row {i} was great\n' for i in range(1, 11)))
+        engine = AnalysisEngine(LocalBackend())
+        self.analyze_many = engine.analyze_many
+        patcher = mock.patch('feedback.importer.analysis_engine', engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_imports_every_row(self, publish, notify):
+        state = import_feedback(self.path, chunk_size=3, parallelism=2)
+        self.assertEqual(state, {'last_row': 10, 'imported': 10, 'skipped': 0, 'failed': 0})
+        self.assertEqual(Feedback.objects.filter(sentiment='positive').count(), 10)
+        self.assertEqual(CosmosOutbox.objects.count(), 10)
+
+    def test_document_errors_are_counted_and_skipped(self, publish, notify):
+        def analyze_many(texts):
+            return [DocumentAnalysisError('InvalidDocument', 'x') if text.startswith('row 2 ') else result
+                    for text, result in zip(texts, self.analyze_many(texts))]
+
+        with mock.patch('feedback.importer.analysis_engine.analyze_many', analyze_many):
+            state = import_feedback(self.path, chunk_size=3, parallelism=1)
+        self.assertEqual(state, {'last_row': 10, 'imported': 9, 'skipped': 0, 'failed': 1})
+
+    def test_batch_error_stops_and_resume_continues_from_checkpoint(self, publish, notify):
+        def analyze_many(texts):
+            if any(text.startswith('row 7 ') for text in texts):
+                return [RuntimeError('throttled')] * len(texts)
+            return self.analyze_many(texts)
+
+        with mock.patch('feedback.importer.analysis_engine.analyze_many', analyze_many):
+            with self.assertRaisesMessage(RuntimeError, 'throttled'):
+                import_feedback(self.path, chunk_size=3, parallelism=1)
+        self.assertEqual(Feedback.objects.count(), 6)
+
+        # The same content uploaded again under another name resumes from the checkpoint
+        copy = os.path.join(self.directory, 'upload-2.csv')
+        shutil.copy(self.path, copy)
+        state = import_feedback(copy, chunk_size=3, parallelism=1)
+        self.assertEqual(state, {'last_row': 10, 'imported': 10, 'skipped': 0, 'failed': 0})
+        self.assertEqual(Feedback.objects.count(), 10)
+        self.assertEqual(len(set(CosmosOutbox.objects.values_list('item_id', flat=True))), 10)
+
+    def test_crash_before_the_checkpoint_save_does_not_duplicate(self, publish, notify):
+        save = Checkpoint.save
+        saves = []
+
+        def crash_on_second_save(checkpoint, state):
+            saves.append(state['last_row'])
+            if len(saves) == 2:
+                raise OSError('disk full')
+            save(checkpoint, state)
+
+        with mock.patch.object(Checkpoint, 'save', crash_on_second_save):
+            with self.assertRaises(OSError):
+                import_feedback(self.path, chunk_size=5, parallelism=1)
+        self.assertEqual(Feedback.objects.count(), 10)
+
+        state = import_feedback(self.path, chunk_size=5, parallelism=1)
+        self.assertEqual(state, {'last_row': 10, 'imported': 5, 'skipped': 5, 'failed': 0})
+        self.assertEqual(Feedback.objects.count(), 10)
+        self.assertEqual(CosmosOutbox.objects.count(), 10)
+        self.assertEqual(sum(SentimentRollup.objects.values_list('count', flat=True)), 10)
+
+    def test_rerun_and_restart_skip_imported_rows(self, publish, notify):
+        import_feedback(self.path, chunk_size=5)
+        # The checkpoint is removed once the import completes
+        self.assertEqual(os.listdir(self.directory), ['survey.csv'])
+        for restart in (False, True):
+            state = import_feedback(self.path, chunk_size=5, restart=restart)
+            self.assertEqual((state['imported'], state['skipped']), (0, 10))
+        self.assertEqual(Feedback.objects.count(), 10)
+        self.assertEqual(sum(SentimentRollup.objects.values_list('count', flat=True)), 10)
+
+    def test_uploaded_file_is_removed(self, publish, notify):
+        import_uploaded_file(self.path, chunk_size=5)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class FakeCosmosFeed:
+    """iter_feedback / iter_feedback_written of CosmosDBManager over an in-memory list."""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.late = []
+
+    def iter_feedback(self, since=None, until=None, page_size=100):
+        return iter(sorted(self.items, key=lambda item: item['timestamp']))
+
+    def iter_feedback_written(self, since_ts, until_ts, page_size=100):
+        return iter(self.late)
+
+
+def cosmos_feedback(item_id, timestamp, sentiment, positive, user_id='1'):
+    return {'id': item_id, 'timestamp': timestamp, 'overall_sentiment': sentiment, 'user_id': user_id,
+            'confidence_score_positive': positive, 'confidence_score_neutral': 0.0,
+            'confidence_score_negative': 1.0 - positive}
+
+
+class SentimentSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.snapshot = SentimentSnapshot(directory)
+        self.cosmos = FakeCosmosFeed([
+            cosmos_feedback('a', '2024-08-01T09:00:00', 'positive', 0.9),
+            cosmos_feedback('b', '2024-08-01T15:00:00', 'negative', 0.1, user_id='2'),
+            cosmos_feedback('c', '2024-08-03T10:00:00', 'positive', 0.7),
+        ])
+        patcher = mock.patch('feedback.snapshot.cosmos_db', self.cosmos)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start, self.end = datetime(2024, 8, 1), datetime(2024, 8, 4)
+
+    def test_daily_buckets(self):
+        self.assertEqual(self.snapshot.refresh(), 3)
+        buckets = self.snapshot.trends('day', self.start, self.end, window=2)
+        self.assertEqual([bucket['count'] for bucket in buckets], [2, 0, 1])
+        self.assertEqual(buckets[0]['bucket_start'], '2024-08-01T00:00:00+00:00')
+        self.assertEqual(buckets[0]['sentiments']['negative'], 1)
+        self.assertEqual(buckets[0]['mean_scores']['positive'], 0.5)
+        self.assertEqual(buckets[0]['positive_percentiles'], {'p50': 0.1, 'p90': 0.1})
+        self.assertIsNone(buckets[1]['mean_scores']['positive'])
+        self.assertEqual(buckets[2]['positive_moving_average'], 0.7)
+
+    def test_filters(self):
+        self.snapshot.refresh()
+        by_user = self.snapshot.trends('day', self.start, self.end, user_id='2')
+        self.assertEqual([bucket['count'] for bucket in by_user], [1, 0, 0])
+        positive = self.snapshot.trends('day', self.start, self.end, sentiment='positive')
+        self.assertEqual([bucket['count'] for bucket in positive], [1, 0, 1])
+
+    def test_late_items_are_merged_in_order_and_duplicates_skipped(self):
+        self.snapshot.refresh()
+        self.cosmos.late = [cosmos_feedback('d', '2024-08-02T12:00:00', 'neutral', 0.5),
+                            cosmos_feedback('c', '2024-08-03T10:00:00', 'positive', 0.7)]
+        self.assertEqual(self.snapshot.refresh(), 1)
+        self.assertEqual(self.snapshot.meta()['generation'], 1)
+        buckets = self.snapshot.trends('day', self.start, self.end)
+        self.assertEqual([bucket['count'] for bucket in buckets], [2, 1, 1])
+
+    @override_settings(SENTIMENT_TRENDS_MAX_BUCKETS=48)
+    def test_range_and_window_limits(self):
+        self.snapshot.refresh()
+        with self.assertRaisesMessage(ValueError, '72 hour buckets'):
+            self.snapshot.trends('hour', self.start, self.end)
+        with self.assertRaisesMessage(ValueError, 'window'):
+            self.snapshot.trends('day', self.start, self.end, window=4)
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+class FeedbackArchivalTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(FEEDBACK_ARCHIVE_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for i in range(5):
+            Feedback.objects.create(text=f'feedback {i}')
+
+    def archived_rows(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_rows_are_archived_and_deleted_in_chunks(self):
+        progress = mock.Mock()
+        result = archive_feedback(chunk_size=2, progress=progress)
+        self.assertEqual(result['archived'], 5)
+        self.assertEqual([row['text'] for row in self.archived_rows(result['path'])],
+                         [f'feedback {i}' for i in range(5)])
+        self.assertFalse(Feedback.objects.exists())
+        self.assertEqual([call.kwargs['archived'] for call in progress.call_args_list], [2, 4, 5])
+
+    def test_retention_keeps_recent_feedback(self):
+        old = Feedback.objects.order_by('id')[:2]
+        Feedback.objects.filter(id__in=[feedback.id for feedback in old]) \
+            .update(submitted_at=timezone.now() - timedelta(days=40))
+        result = archive_feedback(older_than_days=30)
+        self.assertEqual(result['archived'], 2)
+        self.assertEqual(Feedback.objects.count(), 3)
+
+    def test_nothing_to_archive_leaves_no_file(self):
+        self.assertEqual(archive_feedback(older_than_days=30), {'archived': 0, 'path': None})
+
+    def test_clear_history_runs_as_a_job(self):
+        admin = CustomUser.objects.create_user('admin', password='pw', role='admin')
+        self.client.force_login(admin)
+        job_ids = []
+
+        def start(*args, **kwargs):
+            job_ids.append(start_job(*args, **kwargs))
+            return job_ids[-1]
+
+        with mock.patch('feedback.tasks.get_executor', return_value=ImmediateExecutor()), \
+                mock.patch('feedback.views.start_job', start):
+            self.client.post('/feedback/clear_feedback_history/', {'older_than_days': ''})
+        job = get_job(job_ids[0])
+        self.assertEqual((job['kind'], job['state'], job['result']['archived']), ('archive', 'completed', 5))
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_ignored_headers(self):
+        for header in ('items=0-1', 'bytes=0-1,5-9', 'bytes=-', 'bytes=10-5'):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        for header, size in (('bytes=1000-', 1000), ('bytes=-0', 1000), ('bytes=-10', 0)):
+            with self.assertRaises(ValueError):
+                parse_range(header, size)
+
+
+class TranscriptCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = TranscriptCache(directory, max_entries=2, revalidate_after=300)
+        patcher = mock.patch('feedback.azure_storage.transcript_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.blob = mock.Mock()
+        service = mock.Mock()
+        service.get_container_client.return_value.get_blob_client.return_value = self.blob
+        patcher = mock.patch('feedback.azure_storage.get_blob_service_client', return_value=service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, text, etag):
+        downloader = mock.Mock(properties=SimpleNamespace(etag=etag))
+        downloader.readall.return_value = text.encode('utf-8')
+        self.blob.download_blob.return_value = downloader
+        self.blob.download_blob.side_effect = None
+
+    def expire(self, name):
+        entry = self.cache.get(name)
+        self.cache._memory_set(name, CachedTranscript(entry.text, entry.etag, entry.checked_at - 301))
+
+    def test_fresh_entry_is_served_without_storage(self):
+        self.serve('lesson one', '"v1"')
+        self.assertEqual(download_file('lesson.txt'), 'lesson one')
+        self.assertEqual(download_file('lesson.txt'), 'lesson one')
+        self.assertEqual(self.blob.download_blob.call_count, 1)
+        self.assertEqual(self.blob.download_blob.call_args.kwargs, {})
+
+    def test_stale_entry_is_revalidated_with_its_etag(self):
+        self.serve('lesson one', '"v1"')
+        download_file('lesson.txt')
+        self.expire('lesson.txt')
+        self.blob.download_blob.side_effect = HttpResponseError(response=mock.Mock(status_code=304))
+        self.assertEqual(download_file('lesson.txt'), 'lesson one')
+        self.assertEqual(self.blob.download_blob.call_args.kwargs,
+                         {'etag': '"v1"', 'match_condition': MatchConditions.IfModified})
+        self.assertTrue(self.cache.get('lesson.txt').is_fresh(300))
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+    def test_changed_blob_replaces_the_entry(self):
+        self.serve('lesson one', '"v1"')
+        download_file('lesson.txt')
+        self.expire('lesson.txt')
+        self.serve('lesson one, revised', '"v2"')
+        self.assertEqual(download_file('lesson.txt'), 'lesson one, revised')
+        self.assertEqual(self.cache.get('lesson.txt').etag, '"v2"')
+
+    def test_storage_error_falls_back_to_the_stale_copy(self):
+        self.serve('lesson one', '"v1"')
+        download_file('lesson.txt')
+        self.expire('lesson.txt')
+        self.blob.download_blob.side_effect = HttpResponseError(response=mock.Mock(status_code=503))
+        with self.assertLogs('feedback.azure_storage', 'ERROR'):
+            self.assertEqual(download_file('lesson.txt'), 'lesson one')
+
+    def test_disk_tier_survives_a_new_process_and_invalidation(self):
+        self.serve('lesson one', '"v1"')
+        download_file('lesson.txt')
+        restarted = TranscriptCache(self.cache.directory)
+        self.assertEqual(restarted.get('lesson.txt').text, 'lesson one')
+        restarted.invalidate('lesson.txt')
+        self.assertIsNone(self.cache.get('lesson.txt'))
+
+    def test_memory_tier_is_bounded(self):
+        for name in ('a', 'b', 'c'):
+            self.cache.set(name, name, '"v1"')
+        self.assertEqual(self.cache.stats()['size'], 2)
+        self.assertEqual(self.cache.get('a').text, 'a')
+        self.assertEqual(self.cache.stats()['disk_hits'], 1)
+
+
+class RetrievalTests(SimpleTestCase):
+    TOPICS = ['The mean is the sum of the values divided by their count.',
+              'Photosynthesis turns light, water and carbon dioxide into sugar.',
+              'The French revolution began in 1789 with the storming of the Bastille.',
+              'A prime number has exactly two divisors, one and itself.']
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = TranscriptIndexStore(directory, chunk_words=12, max_loaded=1)
+        patcher = mock.patch('feedback.retrieval.transcript_indexes', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transcript = ' '.join(self.TOPICS)
+
+    def test_long_sentences_are_cut_into_windows(self):
+        self.assertEqual(split_sentences('one two three four five', 2), ['one two', 'three four', 'five'])
+        self.assertEqual(split_sentences('First one. Second one!\n\nThird', 10),
+                         ['First one.', 'Second one!', 'Third'])
+
+    def test_chunks_hold_whole_sentences(self):
+        self.assertEqual(split_chunks(self.transcript, 12), self.TOPICS)
+
+    def test_search_ranks_the_chunks_sharing_the_question_terms(self):
+        index = TranscriptIndex.build(self.transcript, 12)
+        self.assertEqual(index.search('When did the revolution start at the Bastille?', 1), [2])
+        self.assertEqual(index.search('What is a prime divisor? And the mean?', 2), [0, 3])
+        self.assertEqual(index.search('summarize this', 2), [0, 1])
+
+    def test_saved_index_loads_with_the_same_results(self):
+        index = TranscriptIndex.build(self.transcript, 12)
+        path = os.path.join(self.store.directory, 'index.npz')
+        index.save(path)
+        loaded = TranscriptIndex.load(path)
+        self.assertEqual(loaded.chunks, index.chunks)
+        self.assertEqual(loaded.search('light and water', 1), index.search('light and water', 1))
+
+    def test_store_reuses_the_persisted_index(self):
+        self.store.get(self.transcript)
+        self.store.get('Another transcript entirely.')
+        with mock.patch.object(TranscriptIndex, 'build') as build:
+            self.assertEqual(self.store.get(self.transcript).chunks, self.TOPICS)
+        build.assert_not_called()
+
+    @override_settings(RETRIEVAL_CHUNK_WORDS=12, RETRIEVAL_TOP_K=1)
+    def test_relevant_chunks_only_for_long_transcripts(self):
+        self.assertIsNone(relevant_chunks(self.TOPICS[0], 'mean'))
+        self.assertEqual(relevant_chunks(self.transcript, 'What is photosynthesis?'), {1: self.TOPICS[1]})
+        self.assertEqual(transcript_context(self.transcript, 'What is photosynthesis?'), self.TOPICS[1])
+
+
+class LLMGatewayTests(SimpleTestCase):
+    def deadline(self, seconds=5):
+        return time.monotonic() + seconds
+
+    def test_queue_full_is_refused(self):
+        gateway = LLMGateway(max_concurrency=1, max_queue=0)
+        with gateway.slot(PRIORITY_CHAT, self.deadline()):
+            with self.assertRaises(LLMUnavailable) as refused:
+                with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                    pass
+        self.assertGreaterEqual(refused.exception.retry_after, 1)
+        self.assertEqual(gateway.stats()['rejected_busy'], 1)
+
+    def test_queue_wait_times_out(self):
+        gateway = LLMGateway(max_concurrency=1, queue_timeout=0.1)
+        with gateway.slot(PRIORITY_CHAT, self.deadline()):
+            with self.assertRaises(LLMUnavailable):
+                with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                    pass
+        self.assertEqual(gateway.stats()['queued'], 0)
+        with gateway.slot(PRIORITY_CHAT, self.deadline()):
+            self.assertEqual(gateway.stats()['active'], 1)
+
+    def test_chat_is_served_before_queued_summaries(self):
+        gateway = LLMGateway(max_concurrency=1)
+        order = []
+
+        def call(priority, name):
+            with gateway.slot(priority, self.deadline()):
+                order.append(name)
+
+        with gateway.slot(PRIORITY_CHAT, self.deadline()):
+            threads = [threading.Thread(target=call, args=(PRIORITY_SUMMARY, 'summary'))]
+            threads[0].start()
+            while gateway.stats()['queued'] < 1:
+                time.sleep(0.01)
+            threads.append(threading.Thread(target=call, args=(PRIORITY_CHAT, 'chat')))
+            threads[1].start()
+            while gateway.stats()['queued'] < 2:
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['chat', 'summary'])
+
+    def test_circuit_opens_and_a_successful_probe_closes_it(self):
+        gateway = LLMGateway(failure_threshold=2, reset_timeout=0.2)
+        for _ in range(2):
+            with gateway.slot(PRIORITY_CHAT, self.deadline()) as slot:
+                slot.fail()
+        self.assertEqual(gateway.stats()['circuit'], 'open')
+        with self.assertRaises(LLMUnavailable):
+            with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                pass
+
+        time.sleep(0.25)
+        with gateway.slot(PRIORITY_CHAT, self.deadline()):
+            self.assertEqual(gateway.stats()['circuit'], 'half-open')
+        self.assertEqual(gateway.stats()['circuit'], 'closed')
+
+    def test_failed_probe_reopens_the_circuit(self):
+        gateway = LLMGateway(failure_threshold=1, reset_timeout=0.1)
+        with self.assertRaises(RuntimeError):
+            with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                raise RuntimeError('connection refused')
+        time.sleep(0.15)
+        with self.assertRaises(RuntimeError):
+            with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                raise RuntimeError('connection refused')
+        self.assertEqual(gateway.stats()['circuit'], 'open')
+
+    def test_opening_the_circuit_refuses_queued_calls(self):
+        gateway = LLMGateway(max_concurrency=1, failure_threshold=1, reset_timeout=30)
+        errors = []
+
+        def call():
+            try:
+                with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                    pass
+            except LLMUnavailable as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        with self.assertRaises(RuntimeError):
+            with gateway.slot(PRIORITY_CHAT, self.deadline()):
+                for thread in threads:
+                    thread.start()
+                while gateway.stats()['queued'] < 2:
+                    time.sleep(0.01)
+                raise RuntimeError('connection refused')
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([str(e) for e in errors], ["The language model is unavailable"] * 2)
+        self.assertGreater(errors[0].retry_after, 1)
+        stats = gateway.stats()
+        self.assertEqual((stats['active'], stats['queued'], stats['rejected_open']), (0, 0, 2))
+
+
+class FakeOllamaResponse:
+    def __init__(self, status_code, chunks):
+        self.status_code = status_code
+        self.chunks = chunks
+
+    def json(self):
+        return {'response': ''.join(chunk.get('response', '') for chunk in self.chunks), 'done': True,
+                'context': self.chunks[-1]['context']}
+
+    def iter_lines(self):
+        for chunk in self.chunks:
+            yield json.dumps(chunk).encode('utf-8')
+
+    def close(self):
+        pass
+
+
+class FakeOllama:
+    """
+    Stands in for the HTTP sessions to Ollama's /api/generate. Each call answers `tokens` (streamed
+    one per line when asked to stream) with a context that gains the call number; `gate`, if set,
+    holds every call until it is released.
+    """
+
+    def __init__(self, tokens=('Hello', ' there'), status_code=200, gate=None):
+        self.tokens = tokens
+        self.status_code = status_code
+        self.gate = gate
+        self.entered = threading.Event()
+        self.requests = []
+
+    def _chunks(self, payload):
+        context = (payload.get('context') or []) + [len(self.requests)]
+        return [{'response': token, 'done': False} for token in self.tokens] + \
+            [{'response': '', 'done': True, 'context': context}]
+
+    def post(self, url, timeout=None, json=None, stream=False):
+        self.requests.append(json)
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return FakeOllamaResponse(self.status_code, self._chunks(json))
+
+    def aio(self):
+        return FakeAsyncOllama(self)
+
+
+class FakeAsyncOllamaResponse:
+    def __init__(self, response):
+        self.status = response.status_code
+        self._response = response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self):
+        return self._response.json()
+
+    @property
+    async def content(self):
+        for line in self._response.iter_lines():
+            yield line + b'\n'
+
+
+class FakeAsyncOllama:
+    def __init__(self, ollama):
+        self.ollama = ollama
+
+    def post(self, url, timeout=None, json=None):
+        return FakeAsyncOllamaResponse(self.ollama.post(url, json=json))
+
+
+class FakeLLMMixin:
+    """Routes the LLM helpers to a FakeOllama through a fresh gateway, so breaker state never leaks between tests."""
+
+    def use_llm(self, ollama, **gateway_options):
+        self.llm_gateway = LLMGateway(**gateway_options)
+        for target, value in (('feedback.llm.get_llm_session', lambda: ollama),
+                              ('feedback.llm.get_async_http_session', ollama.aio),
+                              ('feedback.llm.llm_gateway', self.llm_gateway)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return ollama
+
+
+def sse_events(body):
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        event, data = block.split('\n', 1)
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+@mock.patch('feedback.consumers.build_snapshot', lambda filters: {'by_status': {}, 'by_sentiment': {}, 'recent': []})
+class FeedbackConsumerTests(SimpleTestCase):
+    async def connect(self, role, path='/ws/feedback/'):
+        communicator = WebsocketCommunicator(FeedbackConsumer.as_asgi(), path)
+        communicator.scope['user'] = SimpleNamespace(is_authenticated=True, role=role)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_only_managers_and_admins_connect(self):
+        communicator, connected = await self.connect('user')
+        self.assertFalse(connected)
+        communicator, connected = await self.connect('manager')
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'snapshot')
+        await communicator.disconnect()
+
+    async def test_batches_are_filtered_per_connection(self):
+        negative, _ = await self.connect('admin', '/ws/feedback/?sentiment=negative')
+        everything, _ = await self.connect('manager')
+        for communicator in (negative, everything):
+            await communicator.receive_json_from()
+
+        await get_channel_layer().group_send('feedback_group', {'type': 'feedback_batch', 'events': [
+            {'id': 1, 'status': 'submitted', 'sentiment': 'positive'},
+            {'id': 2, 'status': 'submitted', 'sentiment': 'negative'},
+            {'bulk': 'approve', 'status': 'approved', 'count': 3, 'ids': None},
+        ]})
+        self.assertEqual([event.get('id') for event in (await negative.receive_json_from())['events']],
+                         [2, None])
+        self.assertEqual(len((await everything.receive_json_from())['events']), 3)
+
+        await negative.send_json_to({'action': 'subscribe', 'sentiment': ['positive']})
+        self.assertEqual((await negative.receive_json_from())['filters'],
+                         {'status': [], 'sentiment': ['positive']})
+        for communicator in (negative, everything):
+            await communicator.disconnect()
+
+    async def test_messages_are_relayed_to_every_dashboard(self):
+        sender, _ = await self.connect('admin')
+        listener, _ = await self.connect('manager')
+        for communicator in (sender, listener):
+            await communicator.receive_json_from()
+        await sender.send_json_to({'message': 'Reviewing the backlog now'})
+        for communicator in (sender, listener):
+            self.assertEqual(await communicator.receive_json_from(), {'message': 'Reviewing the backlog now'})
+            await communicator.disconnect()
+
+
+@mock.patch('feedback.views.download_file', lambda name: 'The mean is the average of the values.')
+@mock.patch('feedback.async_views.adownload_file', mock.AsyncMock(return_value='The mean is the average.'))
+class StreamingEndpointTests(FakeLLMMixin, TestCase):
+    def post_stream(self, url, **data):
+        response = self.client.post(url, json.dumps(data), content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return sse_events(b''.join(response.streaming_content))
+
+    def test_chat_stream_sends_tokens_then_done(self):
+        self.use_llm(FakeOllama(tokens=('The mean', ' is the average.')))
+        events = self.post_stream('/feedback/chatbot/stream/', message='What is the mean?', transcript_name='t.txt')
+        self.assertEqual(events, [('token', {'text': 'The mean'}), ('token', {'text': ' is the average.'}),
+                                  ('done', {})])
+
+    def test_chat_session_follow_up_sends_only_the_new_turn(self):
+        ollama = self.use_llm(FakeOllama())
+        events = self.post_stream('/feedback/chatbot/stream/', message='First question', transcript_name='t.txt',
+                                  session_id=None)
+        session_id = events[-1][1]['session_id']
+        self.post_stream('/feedback/chatbot/stream/', message='Second question', transcript_name='t.txt',
+                         session_id=session_id)
+
+        first, second = ollama.requests
+        self.assertIn('The mean is the average', first['prompt'])
+        self.assertEqual(second['prompt'], 'User: Second question\nAI:')
+        self.assertEqual(second['context'], [1])
+
+    def test_model_error_becomes_an_error_event(self):
+        self.use_llm(FakeOllama(status_code=500))
+        events = self.post_stream('/feedback/chatbot/stream/', message='Hi', transcript_name='t.txt')
+        self.assertEqual(events[-1][0], 'error')
+
+    def test_open_circuit_reports_retry_after(self):
+        self.use_llm(FakeOllama(status_code=500), failure_threshold=1, reset_timeout=60)
+        self.post_stream('/feedback/chatbot/stream/', message='Hi', transcript_name='t.txt')
+        events = self.post_stream('/feedback/chatbot/stream/', message='Hi', transcript_name='t.txt')
+        self.assertEqual(events[0][0], 'error')
+        self.assertGreater(events[0][1]['retry_after'], 1)
+
+        response = self.client.post('/feedback/chatbot/', json.dumps({'message': 'Hi', 'transcript_name': 't.txt',
+                                                                       'session_id': None}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_summary_stream_adds_the_header_and_is_stored(self):
+        ollama = self.use_llm(FakeOllama(tokens=('The lesson covers', ' averages.')))
+        events = self.post_stream('/feedback/summarize_lesson/stream/', transcript_name='t.txt')
+        text = ''.join(data['text'] for event, data in events if event == 'token')
+        self.assertTrue(text.startswith(SUMMARY_HEADER))
+        self.assertTrue(text.endswith('The lesson covers averages.'))
+
+        # The stored summary is sent as one chunk without calling the model again
+        events = self.post_stream('/feedback/summarize_lesson/stream/', transcript_name='t.txt')
+        self.assertEqual(events, [('token', {'text': text}), ('done', {})])
+        self.assertEqual(len(ollama.requests), 1)
+
+    async def test_async_chat_stream(self):
+        self.use_llm(FakeOllama(tokens=('A', 'B')))
+        response = await AsyncClient().post('/feedback/async/chatbot/stream/',
+                                            json.dumps({'message': 'Hi', 'transcript_name': 't.txt',
+                                                        'session_id': None}),
+                                            content_type='application/json')
+        events = sse_events(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([event for event, _ in events], ['token', 'token', 'done'])
+        self.assertTrue(events[-1][1]['session_id'])
+
+
+class LessonSummaryClaimTests(FakeLLMMixin, TestCase):
+    transcript = 'The median is the middle value of a sorted list.'
+
+    def setUp(self):
+        self.store = LessonSummaryStore()
+        self.key = lesson_summary_key(self.transcript, self.store.model)
+
+    def test_first_caller_claims_and_the_next_waits(self):
+        summary, claim = self.store._try_claim(self.key)
+        self.assertIsNone(summary)
+        self.assertEqual(claim, LessonSummary.objects.get(key=self.key).updated_at)
+        self.assertEqual(self.store._try_claim(self.key), (None, None))
+
+    def test_stale_claim_is_taken_over(self):
+        _, first = self.store._try_claim(self.key)
+        LessonSummary.objects.filter(key=self.key).update(updated_at=timezone.now() - timedelta(hours=1))
+        _, second = self.store._try_claim(self.key)
+        self.assertIsNotNone(second)
+        # The worker that lost its claim cannot release the new one
+        self.store._release(self.key, first)
+        self.assertTrue(LessonSummary.objects.filter(key=self.key, status='pending').exists())
+
+    def test_waiter_gets_the_summary_another_worker_stored(self):
+        LessonSummary.objects.create(key=self.key, model=self.store.model, status='pending')
+
+        def other_worker_finishes(seconds):
+            LessonSummary.objects.filter(key=self.key).update(status='ready', summary='Stored elsewhere')
+
+        self.assertEqual(self.store._claim_or_wait(self.key, other_worker_finishes), ('Stored elsewhere', None))
+
+    @override_settings(LESSON_SUMMARY_CLAIM_TIMEOUT=0)
+    def test_waiter_generates_itself_when_the_claim_does_not_finish(self):
+        ollama = self.use_llm(FakeOllama(tokens=('Medians.',)))
+        LessonSummary.objects.create(key=self.key, model=self.store.model, status='pending')
+        self.assertEqual(self.store.get(self.transcript), f"{SUMMARY_HEADER}\n\nMedians.")
+        self.assertEqual(len(ollama.requests), 1)
+
+    def test_failed_generation_releases_the_claim(self):
+        self.use_llm(FakeOllama(status_code=500))
+        self.assertEqual(self.store.get(self.transcript), SUMMARY_ERROR)
+        self.assertFalse(LessonSummary.objects.filter(key=self.key).exists())
+
+    @override_settings(LESSON_SUMMARY_CLAIM_TIMEOUT=0)
+    def test_failure_without_the_claim_keeps_the_other_workers_claim(self):
+        self.use_llm(FakeOllama(status_code=500))
+        LessonSummary.objects.create(key=self.key, model=self.store.model, status='pending')
+        # Claimed moments ago by another worker: too fresh to take over, but this caller stops waiting
+        LessonSummary.objects.filter(key=self.key).update(updated_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(self.store.get(self.transcript), SUMMARY_ERROR)
+        self.assertTrue(LessonSummary.objects.filter(key=self.key, status='pending').exists())
+
+    async def test_cancelled_aget_releases_the_claim(self):
+        started = asyncio.Event()
+
+        async def agenerate(*args):
+            started.set()
+            await asyncio.Event().wait()
+
+        with mock.patch('feedback.summaries.agenerate', agenerate):
+            task = asyncio.ensure_future(self.store.aget(self.transcript))
+            await asyncio.wait_for(started.wait(), 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.assertFalse(await LessonSummary.objects.filter(key=self.key).aexists())
+        self.assertEqual(self.store._inflight, {})
+
+
+class LessonSummarySingleFlightTests(FakeLLMMixin, TransactionTestCase):
+    def test_concurrent_requests_share_one_llm_call(self):
+        ollama = self.use_llm(FakeOllama(tokens=('Variance measures spread.',), gate=threading.Event()))
+        store = LessonSummaryStore()
+        transcript = 'Variance is the mean squared distance from the mean.'
+        results = []
+
+        def request():
+            try:
+                results.append(store.get(transcript))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request)]
+        threads[0].start()
+        self.assertTrue(ollama.entered.wait(5))
+        threads += [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.2)
+        ollama.gate.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(ollama.requests), 1)
+        self.assertEqual(results, [f"{SUMMARY_HEADER}\n\nVariance measures spread."] * 4)
+        self.assertEqual(LessonSummary.objects.get().status, 'ready')
+
+    def test_concurrent_streams_share_one_llm_call(self):
+        ollama = self.use_llm(FakeOllama(tokens=('Skew', ' describes', ' asymmetry.'), gate=threading.Event()))
+        store = LessonSummaryStore()
+        transcript = 'Skewness describes how asymmetric a distribution is.'
+        results = []
+
+        def request():
+            try:
+                results.append(''.join(store.stream(transcript)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request)]
+        threads[0].start()
+        self.assertTrue(ollama.entered.wait(5))
+        threads += [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.2)
+        ollama.gate.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(ollama.requests), 1)
+        stored = LessonSummary.objects.get()
+        self.assertEqual(stored.status, 'ready')
+        self.assertEqual(results, [stored.summary] * 4)
+
+
+@override_settings(SUMMARY_SECTION_WORDS=40)
+class SectionSummaryTests(TestCase):
+    def setUp(self):
+        self.sentences = [f'Point {i} of the lesson explains step {i * 7} of the method.' for i in range(40)]
+        self.transcript = ' '.join(self.sentences)
+        self.store = LessonSummaryStore()
+        patcher = mock.patch('feedback.summaries.generate', return_value='Covered.')
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sections_keep_every_sentence_and_their_size_is_bounded(self):
+        sections = split_sections(self.transcript, 40)
+        self.assertGreater(len(sections), 1)
+        self.assertEqual(' '.join(sections), self.transcript)
+        self.assertTrue(all(len(section.split()) <= 80 for section in sections))
+
+    def test_an_edit_only_changes_the_sections_around_it(self):
+        before = split_sections(self.transcript, 40)
+        self.sentences[20] = 'Point 20 was rewritten entirely for the new term.'
+        after = split_sections(' '.join(self.sentences), 40)
+        self.assertLessEqual(len(set(after) - set(before)), 2)
+
+    def test_sections_are_summarized_and_reduced(self):
+        sections = split_sections(self.transcript, 40)
+        content = self.store.reduce(self.transcript)
+        self.assertEqual(self.generate.call_count, len(sections))
+        self.assertEqual(content.split('\n\n'), ['Covered.'] * len(sections))
+        self.assertEqual(LessonSummary.objects.filter(status='ready').count(), len(set(sections)))
+
+    def test_unchanged_sections_reuse_their_stored_summaries(self):
+        self.store.reduce(self.transcript)
+        self.generate.reset_mock()
+        self.sentences[20] = 'Point 20 was rewritten entirely for the new term.'
+        self.store.reduce(' '.join(self.sentences))
+        self.assertLessEqual(self.generate.call_count, 2)
+
+    def test_failed_section_fails_the_summary(self):
+        self.generate.return_value = None
+        with self.assertRaises(LLMError):
+            self.store.reduce(self.transcript)
+
+    def test_long_transcript_key_depends_on_the_section_size(self):
+        key = lesson_summary_key(self.transcript)
+        with override_settings(SUMMARY_SECTION_WORDS=50):
+            self.assertNotEqual(lesson_summary_key(self.transcript), key)
+        self.assertEqual(lesson_summary_key(self.transcript), key)
+
+
+@override_settings(RETRIEVAL_CHUNK_WORDS=12, RETRIEVAL_TOP_K=1)
+class ChatSessionStoreTests(SimpleTestCase):
+    transcript = ' '.join(RetrievalTests.TOPICS)
+
+    def setUp(self):
+        self.store = ChatSessionStore('chat_sessions', max_context=5)
+        caches['chat_sessions'].clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.generate = mock.Mock()
+        for target, value in (('feedback.retrieval.transcript_indexes', TranscriptIndexStore(directory, 12)),
+                              ('feedback.chat_sessions.generate_json', self.generate)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def answer(self, context):
+        self.generate.return_value = {'response': 'An answer.', 'context': context}
+
+    def test_follow_up_sends_the_context_and_only_new_passages(self):
+        self.answer([1, 2])
+        response, session_id = self.store.reply('7', None, 'What is photosynthesis?', self.transcript)
+        self.assertEqual(response, 'An answer.')
+        self.assertIn('Transcript: Photosynthesis', self.generate.call_args[0][1])
+        self.assertIsNone(self.generate.call_args[0][2])
+
+        self.answer([1, 2, 3])
+        self.store.reply('7', session_id, 'Does photosynthesis need light?', self.transcript)
+        self.assertEqual(self.generate.call_args[0][1:], ('User: Does photosynthesis need light?\nAI:', [1, 2]))
+
+        self.store.reply('7', session_id, 'When did the revolution begin?', self.transcript)
+        prompt = self.generate.call_args[0][1]
+        self.assertTrue(prompt.startswith('Transcript (continued): The French revolution'))
+        session = self.store.open('7', session_id, self.transcript)
+        self.assertEqual((session.turns, session.sent_chunks), (3, [1, 2]))
+
+    def test_sessions_are_per_owner_and_transcript(self):
+        self.answer([1])
+        _, session_id = self.store.reply('7', None, 'What is a prime?', self.transcript)
+        self.assertNotEqual(self.store.open('8', session_id, self.transcript).session_id, session_id)
+        self.assertNotEqual(self.store.open('7', session_id, 'Another lesson.').session_id, session_id)
+        self.assertEqual(self.store.open('7', session_id, self.transcript).session_id, session_id)
+
+    def test_failed_turn_leaves_the_session_unchanged(self):
+        self.answer([1])
+        _, session_id = self.store.reply('7', None, 'What is a prime?', self.transcript)
+        self.generate.return_value = None
+        self.assertEqual(self.store.reply('7', session_id, 'And the mean?', self.transcript),
+                         (CHAT_ERROR, session_id))
+        session = self.store.open('7', session_id, self.transcript)
+        self.assertEqual((session.turns, session.context, session.sent_chunks), (1, [1], [3]))
+
+    def test_full_context_starts_over(self):
+        self.answer(list(range(6)))
+        _, session_id = self.store.reply('7', None, 'What is a prime?', self.transcript)
+        session = self.store.open('7', session_id, self.transcript)
+        self.assertEqual((session.context, session.sent_chunks), (None, []))
+        self.store.reply('7', session_id, 'And the mean?', self.transcript)
+        self.assertIn('Transcript: The mean', self.generate.call_args[0][1])
+
+
+class BlobUploadMixin:
+    def use_blob(self):
+        self.blob = mock.Mock()
+        self.blob.commit_block_list.return_value = {'etag': '"v1"'}
+        self.staged = {}
+        self.blob.stage_block.side_effect = lambda block_id, block, length: self.staged.__setitem__(block_id, block)
+        service = mock.Mock()
+        service.get_container_client.return_value.get_blob_client.return_value = self.blob
+        for target, value in (('feedback.uploads.get_blob_service_client', mock.Mock(return_value=service)),
+                              ('feedback.uploads.transcript_cache', mock.Mock()),
+                              ('feedback.uploads.time.sleep', mock.Mock())):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def committed(self):
+        block_ids = [block.id for block in self.blob.commit_block_list.call_args[0][0]]
+        return b''.join(self.staged[block_id] for block_id in block_ids)
+
+
+class BlockBlobUploadTests(BlobUploadMixin, SimpleTestCase):
+    def setUp(self):
+        self.use_blob()
+
+    def test_blocks_are_committed_in_order(self):
+        upload = BlockBlobUpload('transcripts', 'lesson.txt', 'text/plain', block_size=4)
+        for piece in (b'abc', b'defgh', b'ij'):
+            upload.write(piece)
+        result = upload.finish(10)
+        self.assertEqual(self.committed(), b'abcdefghij')
+        self.assertEqual(len(self.staged), 3)
+        self.assertEqual(len({len(block_id) for block_id in self.staged}), 1)
+        self.assertEqual((result.name, result.size, result.etag, result.error), ('lesson.txt', 10, '"v1"', None))
+
+    def test_staging_is_bounded_by_the_parallelism(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def stage_block(block_id, block, length):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            self.staged[block_id] = block
+            with lock:
+                active[0] -= 1
+
+        self.blob.stage_block.side_effect = stage_block
+        upload = BlockBlobUpload('transcripts', 'lecture.mp4', block_size=2, parallelism=2)
+        upload.write(b'x' * 12)
+        upload.finish(12)
+        self.assertEqual(self.committed(), b'x' * 12)
+        self.assertLessEqual(peak[0], 2)
+
+    def test_failed_block_is_retried_on_its_own(self):
+        failures = [ConnectionError('reset')]
+
+        def stage_block(block_id, block, length):
+            if failures:
+                raise failures.pop()
+            self.staged[block_id] = block
+
+        self.blob.stage_block.side_effect = stage_block
+        upload = BlockBlobUpload('transcripts', 'lesson.txt', block_size=4)
+        upload.write(b'abcdefgh')
+        with self.assertLogs('feedback.uploads', 'WARNING'):
+            result = upload.finish(8)
+        self.assertIsNone(result.error)
+        self.assertEqual(self.committed(), b'abcdefgh')
+        self.assertEqual(self.blob.stage_block.call_count, 3)
+
+    def test_block_that_keeps_failing_fails_the_upload(self):
+        self.blob.stage_block.side_effect = ConnectionError('reset')
+        upload = BlockBlobUpload('transcripts', 'lesson.txt', block_size=4, retries=1)
+        upload.write(b'abcd')
+        with self.assertLogs('feedback.uploads', 'WARNING'):
+            result = upload.finish(4)
+        self.assertIn('failed', result.error)
+        self.blob.commit_block_list.assert_not_called()
+
+
+@mock.patch('feedback.views.get_executor')
+class UploadTranscriptTests(BlobUploadMixin, TestCase):
+    def setUp(self):
+        self.use_blob()
+
+    def post(self, content=b'The mean is the average.', name='lesson.txt', content_type='text/plain'):
+        upload = SimpleUploadedFile(name, content, content_type=content_type)
+        return self.client.post('/feedback/upload_transcript/', {'file': upload})
+
+    def test_anonymous_upload_is_refused_before_staging(self, get_executor):
+        self.assertEqual(self.post().status_code, 403)
+        self.blob.stage_block.assert_not_called()
+
+    def test_handler_stops_parsing_for_users_who_may_not_upload(self, get_executor):
+        handler = BlobUploadHandler(SimpleNamespace(user=AnonymousUser()))
+        with self.assertLogs('feedback.uploads', 'WARNING'):
+            post, files = handler.handle_raw_input(None, {}, 100, b'boundary')
+        self.assertEqual((dict(post), dict(files)), ({}, {}))
+
+    def test_transcript_is_streamed_to_storage_and_indexed(self, get_executor):
+        self.client.force_login(CustomUser.objects.create_user('student', password='pw'))
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.committed(), b'The mean is the average.')
+        get_executor.return_value.submit.assert_called_once_with(index_transcript, 'lesson.txt')
+
+    def test_media_is_uploaded_but_not_indexed(self, get_executor):
+        self.client.force_login(CustomUser.objects.create_user('student', password='pw'))
+        self.assertEqual(self.post(b'\x00\x01', 'lecture.mp4', 'video/mp4').status_code, 200)
+        get_executor.return_value.submit.assert_not_called()
+
+    def test_failed_upload_is_reported(self, get_executor):
+        self.client.force_login(CustomUser.objects.create_user('student', password='pw'))
+        self.blob.commit_block_list.side_effect = ConnectionError('reset')
+        with self.assertLogs('feedback.uploads', 'ERROR'):
+            self.assertEqual(self.post().status_code, 500)
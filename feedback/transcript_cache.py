@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedTranscript:
+    text: str
+    etag: str
+    checked_at: float  # wall-clock time of the last download or successful revalidation
+
+    def is_fresh(self, revalidate_after):
+        return time.time() - self.checked_at < revalidate_after
+
+
+class TranscriptCache:
+    """
+    Transcripts by blob name, with the ETag they were downloaded at. The memory
+    tier is an LRU per process; the disk tier survives restarts and is shared
+    by the workers on one host. Entries younger than `revalidate_after` are
+    served without contacting storage; older ones are revalidated with a
+    conditional request by the caller (see azure_storage.download_file).
+    """
+
+    def __init__(self, directory, max_entries=64, revalidate_after=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'revalidated': 0, 'downloads': 0}
+
+    def _path(self, blob_name):
+        return os.path.join(self.directory, hashlib.sha256(blob_name.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, blob_name):
+        path = self._path(blob_name)
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is not None:
+                # The disk file is removed on invalidation, so its absence means another worker replaced the blob.
+                if os.path.exists(path):
+                    self._entries.move_to_end(blob_name)
+                    self._counters['memory_hits'] += 1
+                    return entry
+                del self._entries[blob_name]
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            entry = CachedTranscript(data['text'], data['etag'], data['checked_at'])
+        except FileNotFoundError:
+            with self._lock:
+                self._counters['misses'] += 1
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable cached transcript {blob_name}: {str(e)}")
+            with self._lock:
+                self._counters['misses'] += 1
+            return None
+
+        self._memory_set(blob_name, entry)
+        with self._lock:
+            self._counters['disk_hits'] += 1
+        return entry
+
+    def set(self, blob_name, text, etag):
+        entry = CachedTranscript(text, etag, time.time())
+        self._memory_set(blob_name, entry)
+        self._disk_write(blob_name, entry)
+        with self._lock:
+            self._counters['downloads'] += 1
+        return entry
+
+    def mark_checked(self, blob_name, entry):
+        # Storage answered 304 Not Modified: the cached text is current for another window.
+        entry = CachedTranscript(entry.text, entry.etag, time.time())
+        self._memory_set(blob_name, entry)
+        self._disk_write(blob_name, entry)
+        with self._lock:
+            self._counters['revalidated'] += 1
+        return entry
+
+    def invalidate(self, blob_name):
+        with self._lock:
+            self._entries.pop(blob_name, None)
+        try:
+            os.remove(self._path(blob_name))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+
+    def _memory_set(self, blob_name, entry):
+        with self._lock:
+            self._entries[blob_name] = entry
+            self._entries.move_to_end(blob_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_write(self, blob_name, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(blob_name)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'name': blob_name, 'text': entry.text, 'etag': entry.etag,
+                           'checked_at': entry.checked_at}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cached transcript {blob_name}: {str(e)}")
+
+
+transcript_cache = TranscriptCache(
+    directory=str(settings.TRANSCRIPT_CACHE_DIR),
+    max_entries=settings.TRANSCRIPT_CACHE_MAX_ENTRIES,
+    revalidate_after=settings.TRANSCRIPT_CACHE_REVALIDATE_AFTER,
+)
@@ -0,0 +1,185 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from azure.storage.blob import BlobBlock, ContentSettings
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from .azure_storage import get_blob_service_client
+from .transcript_cache import transcript_cache
+
+logger = logging.getLogger(__name__)
+
+_block_executor = None
+_block_executor_pid = None
+_block_executor_lock = threading.Lock()
+
+
+def block_executor():
+    # One pool per process stages the blocks of all uploads in progress.
+    global _block_executor, _block_executor_pid
+    pid = os.getpid()
+    if _block_executor_pid != pid:
+        with _block_executor_lock:
+            if _block_executor_pid != pid:
+                _block_executor = ThreadPoolExecutor(max_workers=settings.BLOB_UPLOAD_POOL_SIZE,
+                                                     thread_name_prefix='blob-upload')
+                _block_executor_pid = pid
+    return _block_executor
+
+
+def can_upload(user):
+    # Transcripts are uploaded from the Learn Now page, which any signed-in user can open.
+    return user.is_authenticated
+
+
+class UploadedBlob:
+    """What the upload handler puts in request.FILES: the committed blob, or the reason it failed."""
+
+    def __init__(self, name, size=0, content_type=None, etag=None, error=None):
+        self.name = name
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.error = error
+
+    def close(self):
+        pass
+
+
+class BlockBlobUpload:
+    """
+    Writes one blob as a series of staged blocks, committed in order by finish(). Up to `parallelism`
+    blocks are staged concurrently; write() blocks while that many are in flight, so the memory held is
+    at most `parallelism` + 1 blocks whatever the size of the file. A failed block is retried on its own.
+    """
+
+    def __init__(self, container, blob_name, content_type=None, block_size=4 * 1024 * 1024, parallelism=4,
+                 retries=3):
+        self.blob_name = blob_name
+        self.content_type = content_type
+        self.block_size = block_size
+        self.retries = retries
+        blob_service_client = get_blob_service_client()
+        self.blob_client = blob_service_client.get_container_client(container).get_blob_client(blob_name) \
+            if blob_service_client else None
+        # Block ids must all have the same length within a blob.
+        self._prefix = uuid.uuid4().hex[:12]
+        self._block_ids = []
+        self._buffer = bytearray()
+        self._futures = []
+        self._slots = threading.Semaphore(parallelism)
+        self.error = None if self.blob_client else "Could not connect to Azure Blob Storage"
+
+    def write(self, data):
+        if self.error is not None:
+            return
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            self._buffer = self._buffer[self.block_size:]
+            self._submit(block)
+
+    def _submit(self, block):
+        self._slots.acquire()
+        if self.error is not None:
+            self._slots.release()
+            return
+        block_id = f"{self._prefix}-{len(self._block_ids):06d}"
+        self._block_ids.append(block_id)
+        future = block_executor().submit(self._stage, block_id, block)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _stage(self, block_id, block):
+        for attempt in range(self.retries + 1):
+            try:
+                self.blob_client.stage_block(block_id, block, length=len(block))
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self.error = f"Block {block_id} failed: {str(e)}"
+                    raise
+                logger.warning(f"Retrying block {block_id} of {self.blob_name}: {str(e)}")
+                time.sleep(0.5 * 2 ** attempt)
+
+    def finish(self, size):
+        etag = None
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            wait(self._futures)
+            if self.error is None:
+                etag = self.blob_client.commit_block_list(
+                    [BlobBlock(block_id=block_id) for block_id in self._block_ids],
+                    content_settings=ContentSettings(content_type=self.content_type),
+                ).get('etag')
+                logger.info(f"Uploaded {self.blob_name} ({size} bytes) in {len(self._block_ids)} blocks")
+        except Exception as e:
+            logger.error(f"Error uploading file to Azure Blob Storage: {str(e)}")
+            self.error = self.error or str(e)
+        finally:
+            transcript_cache.invalidate(self.blob_name)
+        return UploadedBlob(self.blob_name, size, self.content_type, etag, self.error)
+
+    def abort(self):
+        # Staged blocks that are never committed are discarded by the storage service.
+        self.error = self.error or "Upload interrupted"
+        for future in self._futures:
+            future.cancel()
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """
+    Streams the uploaded `file_field` file into Blob Storage as it arrives instead of buffering it in
+    memory or in a temporary file; other file fields are passed on to the next handler, if any. Install
+    it before request.FILES is first read:
+
+        request.upload_handlers = [BlobUploadHandler(request, container)]
+
+    Requests from users who may not upload are stopped before any block is staged.
+    """
+
+    def __init__(self, request=None, container=None, file_field='file'):
+        super().__init__(request)
+        self.container = container or settings.AZURE_STORAGE_CONTAINER_TRANSCRIPT
+        self.file_field = file_field
+        self.upload = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Returning the (POST, FILES) pair ends parsing here, before any of the body is read.
+        if not can_upload(self.request.user):
+            logger.warning("Upload refused before staging: user may not upload")
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.file_field:
+            return
+        self.upload = BlockBlobUpload(
+            self.container, file_name, content_type,
+            block_size=settings.BLOB_UPLOAD_BLOCK_SIZE,
+            parallelism=settings.BLOB_UPLOAD_PARALLELISM,
+            retries=settings.BLOB_UPLOAD_BLOCK_RETRIES,
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload is None:
+            return raw_data
+        self.upload.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        upload, self.upload = self.upload, None
+        return upload.finish(file_size) if upload is not None else None
+
+    def upload_interrupted(self):
+        if self.upload is not None:
+            self.upload.abort()
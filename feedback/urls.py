@@ -1,13 +1,16 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('home/', views.home, name='home'),
     path('analyze_feedback/', views.analyze_feedback, name='analyze_feedback'),
     path('sentiment_summary/', views.get_sentiment_summary, name='sentiment_summary'),
+    path('sentiment_trends/', views.sentiment_trends, name='sentiment_trends'),
+    path('feedback_results/', views.feedback_results, name='feedback_results'),
     path('learn_now/', views.learn_now, name='learn_now'),
     path('register/', views.RegisterView.as_view(), name='register'),
     path('submit_feedback/', views.submit_feedback, name='submit_feedback'),
+    path('feedback_status/<int:feedback_id>/', views.feedback_status, name='feedback_status'),
     path('review_feedback/<int:feedback_id>/', views.review_feedback, name='review_feedback'),
     path('approve_feedback/<int:feedback_id>/', views.approve_feedback, name='approve_feedback'),
     path('reject_feedback/<int:feedback_id>/', views.reject_feedback, name='reject_feedback'),
@@ -17,10 +20,29 @@ urlpatterns = [
     path('set_language/', views.set_language, name='set_language'),
     path('custom_login/', views.custom_login, name='custom_login'),
     path('feedback_list/', views.feedback_list, name='feedback_list'),
+    path('api/feedback/', views.feedback_list_api, name='feedback_list_api'),
+    path('api/feedback/moderate/', views.bulk_moderate_feedback, name='bulk_moderate_feedback'),
     path('upload_transcript/', views.upload_transcript, name='upload_transcript'),
     path('get_transcript/<str:blob_name>/', views.get_transcript, name='get_transcript'),
+    path('download_transcript/<str:blob_name>/', views.download_transcript, name='download_transcript'),
     path('chatbot/', views.chatbot, name='chatbot'),
+    path('chatbot/stream/', views.chatbot_stream, name='chatbot_stream'),
+    path('chatbot/reset/', views.chatbot_reset, name='chatbot_reset'),
     path('summarize_lesson/', views.summarize_lesson, name='summarize_lesson'),
+    path('summarize_lesson/stream/', views.summarize_lesson_stream, name='summarize_lesson_stream'),
     path('submit_assistance/', views.submit_assistance, name='submit_assistance'),
     path('analyze_feedback_bot/', views.analyze_feedback_bot, name='analyze_feedback_bot'),
+    path('import_feedback/', views.import_feedback, name='import_feedback'),
+    path('jobs/<str:job_id>/', views.job_status, name='job_status'),
+    path('performance_stats/', views.performance_stats, name='performance_stats'),
+    path('async/analyze_feedback/', async_views.analyze_feedback, name='async_analyze_feedback'),
+    path('async/analyze_feedback_bot/', async_views.analyze_feedback_bot, name='async_analyze_feedback_bot'),
+    path('async/upload_transcript/', async_views.upload_transcript, name='async_upload_transcript'),
+    path('async/get_transcript/<str:blob_name>/', async_views.get_transcript, name='async_get_transcript'),
+    path('async/download_transcript/<str:blob_name>/', async_views.download_transcript,
+         name='async_download_transcript'),
+    path('async/chatbot/', async_views.chatbot, name='async_chatbot'),
+    path('async/chatbot/stream/', async_views.chatbot_stream, name='async_chatbot_stream'),
+    path('async/summarize_lesson/', async_views.summarize_lesson, name='async_summarize_lesson'),
+    path('async/summarize_lesson/stream/', async_views.summarize_lesson_stream, name='async_summarize_lesson_stream'),
 ]
\ No newline at end of file
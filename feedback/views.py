@@ -4,40 +4,52 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
-from django.utils import timezone
-from django.urls import reverse_lazy
+from django.db import transaction
+from django.urls import reverse, reverse_lazy
 from django.views import generic
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
 from .models import Feedback, CustomUser
 from .forms import CustomUserCreationForm
-from azure.ai.textanalytics import TextAnalyticsClient
-from azure.core.credentials import AzureKeyCredential
 from django.conf import settings
 from .cosmos_db_utils import cosmos_db
-from .azure_storage import upload_file, download_file, list_blobs
+from .azure_storage import download_file, list_blobs
+from .analysis import analysis_engine
+from .analysis_cache import analysis_cache
+from .transcript_cache import transcript_cache
+from .archival import archive_feedback
+from .chat_sessions import chat_sessions, session_owner
+from .clients import client_stats
+from .downloads import transcript_download
+from .llm_gateway import LLMUnavailable, llm_gateway, unavailable_response
+from .llm import get_chatbot_response, stream_chatbot_response, CHAT_ERROR, SUMMARY_ERROR
+from .retrieval import index_transcript
+from .summaries import lesson_summaries, precompute_lesson_summary
+from .streaming import sse_response, sse_stream
+from .uploads import BlobUploadHandler, can_upload
+from .tasks import (enqueue_feedback_analysis, process_feedback_analysis, start_job, get_job,
+                    refresh_snapshot_in_background, get_executor)
+from .importer import import_uploaded_file
+from .listing import DEFAULT_PAGE_SIZE, feedback_page, parse_filters, serialize_feedback
+from .moderation import MAX_IDS, TRANSITIONS, bulk_transition, can_moderate, transition
+from .outbox import enqueue_cosmos_write
+from .realtime import analysis_event, feedback_publisher, publish_feedback_on_commit
+from .rollups import sentiment_summary
+from .snapshot import sentiment_snapshot, INTERVALS, SENTIMENT_CODES
 import json
+import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 from decouple import config
-from django.views.decorators.cache import cache_page
-from django.core.cache import cache
 from .azure_storage import list_blobs
 from django.conf import settings
 from django.contrib import messages
 from django.shortcuts import render
-import requests
 
 logger = logging.getLogger(__name__)
 
 
 
-def authenticate_client():
-    key = settings.AZURE_SUBSCRIPTION_KEY
-    endpoint = settings.AZURE_SENTIMENT_ENDPOINT
-    return TextAnalyticsClient(endpoint=endpoint, credential=AzureKeyCredential(key))
-
-
 @login_required
 def home(request):
     theme = request.session.get('theme', 'light')
@@ -52,61 +64,15 @@ def analyze_feedback(request):
         if not feedback_text:
             return JsonResponse({'error': 'No feedback provided'}, status=400)
 
-        client = authenticate_client()
-
         try:
-            sentiment_response = client.analyze_sentiment(documents=[feedback_text], show_opinion_mining=True)[0]
-            key_phrases_response = client.extract_key_phrases(documents=[feedback_text])[0]
-
-            overall_sentiment = sentiment_response.sentiment
-            sentiment_scores = sentiment_response.confidence_scores
-            key_phrases = key_phrases_response.key_phrases
-
-            results = {
-                'sentiment': overall_sentiment,
-                'overall_scores': {
-                    'positive': sentiment_scores.positive,
-                    'neutral': sentiment_scores.neutral,
-                    'negative': sentiment_scores.negative
-                },
-                'key_phrases': key_phrases,
-                'opinions': []
-            }
-
-            for sentence in sentiment_response.sentences:
-                for mined_opinion in sentence.mined_opinions:
-                    target = mined_opinion.target
-                    assessments = [{
-                        'text': assessment.text,
-                        'sentiment': assessment.sentiment,
-                        'confidence_scores': {
-                            'positive': assessment.confidence_scores.positive,
-                            'neutral': assessment.confidence_scores.neutral,
-                            'negative': assessment.confidence_scores.negative
-                        }
-                    } for assessment in mined_opinion.assessments]
-                    results['opinions'].append({
-                        'target': target.text,
-                        'sentiment': target.sentiment,
-                        'assessments': assessments
-                    })
-
-            # Store in Cosmos DB
-            cosmos_data = {
-                'id': str(uuid.uuid4()),
-                'feedback_text': feedback_text,
-                'overall_sentiment': overall_sentiment,
-                'confidence_score_positive': sentiment_scores.positive,
-                'confidence_score_neutral': sentiment_scores.neutral,
-                'confidence_score_negative': sentiment_scores.negative,
-                'key_phrases': key_phrases,
-                'opinions': results['opinions'],
-                'timestamp': datetime.utcnow().isoformat(),
-                'user_id': str(request.user.id) if request.user.is_authenticated else 'anonymous'
-            }
-            cosmos_db.store_feedback(cosmos_data)
-
-            return JsonResponse({'results': [results]})
+            result = analysis_engine.analyze(feedback_text)
+
+            # Queue for Cosmos DB
+            user_id = str(request.user.id) if request.user.is_authenticated else 'anonymous'
+            enqueue_cosmos_write(result.to_cosmos(feedback_text, user_id))
+            feedback_publisher.publish(analysis_event(result))
+
+            return JsonResponse({'results': [result.to_dict()]})
         except Exception as e:
             logger.error(f"Error in analyze_feedback: {str(e)}", exc_info=True)
             return JsonResponse({'error': 'Failed to analyze sentiment due to a server error'}, status=500)
@@ -124,50 +90,13 @@ def analyze_feedback_bot(request):
             if not feedback_text:
                 return JsonResponse({'error': 'No feedback provided'}, status=400)
 
-            client = authenticate_client()
-
-            # Perform sentiment analysis with opinion mining
-            sentiment_response = client.analyze_sentiment(documents=[feedback_text], show_opinion_mining=True)[0]
-
-            # Perform key phrase extraction
-            key_phrases_response = client.extract_key_phrases(documents=[feedback_text])[0]
-
-            # Process opinions
-            opinions = []
-            for sentence in sentiment_response.sentences:
-                for mined_opinion in sentence.mined_opinions:
-                    target = mined_opinion.target
-                    assessments = [{
-                        'text': assessment.text,
-                        'sentiment': assessment.sentiment,
-                        'confidence_scores': {
-                            'positive': assessment.confidence_scores.positive,
-                            'neutral': assessment.confidence_scores.neutral,
-                            'negative': assessment.confidence_scores.negative
-                        }
-                    } for assessment in mined_opinion.assessments]
-                    opinions.append({
-                        'target': target.text,
-                        'sentiment': target.sentiment,
-                        'assessments': assessments
-                    })
-
-            # Prepare data for storage
-            cosmos_data = {
-                'id': str(uuid.uuid4()),
-                'feedback_text': feedback_text,
-                'overall_sentiment': sentiment_response.sentiment,
-                'confidence_score_positive': sentiment_response.confidence_scores.positive,
-                'confidence_score_neutral': sentiment_response.confidence_scores.neutral,
-                'confidence_score_negative': sentiment_response.confidence_scores.negative,
-                'key_phrases': key_phrases_response.key_phrases,
-                'opinions': opinions,
-                'timestamp': datetime.utcnow().isoformat(),
-                'user_id': str(request.user.id) if request.user.is_authenticated else 'anonymous'
-            }
-
-            # Store the feedback in Cosmos DB
-            cosmos_db.store_feedback(cosmos_data)
+            # Sentiment analysis with opinion mining and key phrase extraction
+            result = analysis_engine.analyze(feedback_text)
+
+            # Queue the feedback for Cosmos DB
+            user_id = str(request.user.id) if request.user.is_authenticated else 'anonymous'
+            enqueue_cosmos_write(result.to_cosmos(feedback_text, user_id))
+            feedback_publisher.publish(analysis_event(result))
 
             return JsonResponse({'status': 'success', 'message': 'Feedback submitted successfully'})
 
@@ -202,77 +131,84 @@ def submit_feedback(request):
     if request.method == 'POST':
         feedback_text = request.POST.get('feedback')
         if feedback_text:
-            client = authenticate_client()
-            try:
-                # Sentiment analysis with opinion mining
-                sentiment_response = client.analyze_sentiment(documents=[feedback_text], show_opinion_mining=True)[0]
-
-                # Key phrase extraction
-                key_phrases_response = client.extract_key_phrases(documents=[feedback_text])[0]
-
-                # Process opinions
-                opinions = []
-                for sentence in sentiment_response.sentences:
-                    for mined_opinion in sentence.mined_opinions:
-                        target = mined_opinion.target
-                        assessments = [{
-                            'text': assessment.text,
-                            'sentiment': assessment.sentiment,
-                            'confidence_scores': {
-                                'positive': assessment.confidence_scores.positive,
-                                'neutral': assessment.confidence_scores.neutral,
-                                'negative': assessment.confidence_scores.negative
-                            }
-                        } for assessment in mined_opinion.assessments]
-                        opinions.append({
-                            'target': target.text,
-                            'sentiment': target.sentiment,
-                            'assessments': assessments
-                        })
-
-                # Prepare data for storage
-                feedback_data = {
-                    'id': str(uuid.uuid4()),
-                    'feedback_text': feedback_text,
-                    'overall_sentiment': sentiment_response.sentiment,
-                    'confidence_score_positive': sentiment_response.confidence_scores.positive,
-                    'confidence_score_neutral': sentiment_response.confidence_scores.neutral,
-                    'confidence_score_negative': sentiment_response.confidence_scores.negative,
-                    'key_phrases': key_phrases_response.key_phrases,
-                    'opinions': opinions,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'user_id': str(request.user.id)
-                }
-
-                # Store in Cosmos DB
-                cosmos_db.store_feedback(feedback_data)
-
-                # Create Feedback object in Django DB
-                feedback = Feedback.objects.create(
-                    user=request.user,
-                    text=feedback_text,
-                    sentiment=sentiment_response.sentiment,
-                    sentiment_scores=json.dumps(sentiment_response.confidence_scores.__dict__),
-                    key_phrases=json.dumps(key_phrases_response.key_phrases),
-                    opinions=json.dumps(opinions)
-                )
-
+            # Only the raw row is written on the request path; analysis and the Cosmos write run afterwards.
+            feedback = Feedback.objects.create(
+                user=request.user,
+                text=feedback_text,
+                analysis_status='pending'
+            )
+            if settings.FEEDBACK_ASYNC_ANALYSIS:
+                transaction.on_commit(lambda: enqueue_feedback_analysis(feedback.id))
+                messages.success(request, 'Feedback submitted successfully. Analysis is in progress.')
+            else:
+                process_feedback_analysis(feedback.id)
+                feedback.refresh_from_db()
+                if feedback.analysis_status == 'failed':
+                    messages.error(request, 'An error occurred while processing your feedback. Please try again.')
+                    return render(request, 'feedback/submit_feedback.html')
                 messages.success(request, 'Feedback submitted successfully.')
-                return redirect('feedback_list')
-            except Exception as e:
-                logger.error(f"Error in submit_feedback: {str(e)}", exc_info=True)
-                messages.error(request, 'An error occurred while processing your feedback. Please try again.')
+            return redirect('feedback_list')
         else:
             messages.error(request, 'Please provide feedback text.')
     return render(request, 'feedback/submit_feedback.html')
 
 
+@login_required
+def feedback_status(request, feedback_id):
+    feedback = get_object_or_404(Feedback, id=feedback_id)
+    if feedback.user_id != request.user.id and request.user.role not in ['manager', 'admin']:
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    return JsonResponse({
+        'id': feedback.id,
+        'status': feedback.status,
+        'analysis_status': feedback.analysis_status,
+        'analysis_attempts': feedback.analysis_attempts,
+        'analysis_error': feedback.analysis_error or None,
+        'results': feedback.analysis_results(),
+    })
+
+
 @login_required
 @user_passes_test(lambda u: u.role in ['manager', 'admin'])
 def feedback_list(request):
-    feedbacks = Feedback.objects.all()
-    logger.info(f"Retrieved {feedbacks.count()} feedbacks")
-    return render(request, 'feedback/feedback_list.html', {'feedbacks': feedbacks})
+    try:
+        filters = parse_filters(request.GET)
+        feedbacks, next_cursor = feedback_page(filters, cursor=request.GET.get('cursor'))
+    except ValueError as e:
+        messages.error(request, str(e))
+        filters = {}
+        feedbacks, next_cursor = feedback_page(filters)
+
+    next_params = None
+    if next_cursor:
+        next_params = request.GET.copy()
+        next_params['cursor'] = next_cursor
+        next_params = next_params.urlencode()
+
+    logger.info(f"Retrieved {len(feedbacks)} feedbacks")
+    return render(request, 'feedback/feedback_list.html', {
+        'feedbacks': feedbacks,
+        'next_params': next_params,
+        'filters': request.GET,
+        'status_choices': Feedback.STATUS_CHOICES,
+        'sentiment_choices': Feedback.SENTIMENT_CHOICES,
+    })
+
+
+@login_required
+@user_passes_test(lambda u: u.role in ['manager', 'admin'])
+def feedback_list_api(request):
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+        feedbacks, next_cursor = feedback_page(parse_filters(request.GET), cursor=request.GET.get('cursor'),
+                                               page_size=page_size)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'items': [serialize_feedback(feedback) for feedback in feedbacks],
+        'next_cursor': next_cursor
+    })
 
 
 @login_required
@@ -280,10 +216,7 @@ def feedback_list(request):
 def review_feedback(request, feedback_id):
     feedback = get_object_or_404(Feedback, id=feedback_id)
     if request.method == 'POST':
-        feedback.status = 'reviewed'
-        feedback.reviewed_at = timezone.now()
-        feedback.save()
-        logger.info(f"Feedback {feedback_id} reviewed with status: {feedback.status}")
+        transition(feedback, 'review')
     return redirect('feedback_list')
 
 
@@ -292,10 +225,7 @@ def review_feedback(request, feedback_id):
 def approve_feedback(request, feedback_id):
     feedback = get_object_or_404(Feedback, id=feedback_id)
     if request.method == 'POST':
-        feedback.status = 'approved'
-        feedback.approved_at = timezone.now()
-        feedback.save()
-        logger.info(f"Feedback {feedback_id} approved with status: {feedback.status}")
+        transition(feedback, 'approve')
     return redirect('feedback_list')
 
 
@@ -304,20 +234,56 @@ def approve_feedback(request, feedback_id):
 def reject_feedback(request, feedback_id):
     feedback = get_object_or_404(Feedback, id=feedback_id)
     if request.method == 'POST':
-        feedback.status = 'rejected'
-        feedback.rejected_at = timezone.now()
-        feedback.save()
-        logger.info(f"Feedback {feedback_id} rejected with status: {feedback.status}")
+        transition(feedback, 'reject')
     return redirect('feedback_list')
 
 
+@login_required
+@user_passes_test(lambda u: u.role in ['manager', 'admin'])
+@require_POST
+def bulk_moderate_feedback(request):
+    # {"action": "approve", "ids": [1, 2]} or {"action": "approve", "filter": {"status": "reviewed", ...}}
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    action = data.get('action')
+    if action not in TRANSITIONS:
+        return JsonResponse({'error': f"action must be one of {', '.join(TRANSITIONS)}"}, status=400)
+    if not can_moderate(request.user, action):
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids) or len(ids) > MAX_IDS:
+            return JsonResponse({'error': f'ids must be a list of at most {MAX_IDS} integers'}, status=400)
+        return JsonResponse(bulk_transition(action, ids=ids))
+
+    if not isinstance(data.get('filter'), dict):
+        return JsonResponse({'error': 'Provide ids or a non-empty filter'}, status=400)
+    try:
+        filters = parse_filters(data['filter'], strict=True)
+        if not filters:
+            raise ValueError('Provide ids or a non-empty filter')
+        return JsonResponse(bulk_transition(action, filters=filters))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
 @login_required
 @user_passes_test(lambda u: u.role == 'admin')
 def clear_feedback_history(request):
     if request.method == 'POST':
-        Feedback.objects.all().delete()
-        messages.success(request, 'Feedback history cleared.')
-        logger.info("All feedback history cleared")
+        older_than_days = request.POST.get('older_than_days') or None
+        if older_than_days is not None and not older_than_days.isdigit():
+            messages.error(request, 'Retention must be a whole number of days.')
+            return redirect('feedback_list')
+
+        # Archived to compressed JSONL and deleted in chunks by a background job
+        job_id = start_job('archive', archive_feedback, older_than_days=older_than_days)
+        messages.success(request, f'Feedback history is being archived and cleared (job {job_id}).')
+        logger.info(f"Started feedback archive job {job_id} (older than {older_than_days or 0} days)")
         return redirect('feedback_list')
 
 
@@ -347,15 +313,20 @@ def set_language(request):
 @csrf_exempt
 @require_POST
 def upload_transcript(request):
+    if not can_upload(request.user):
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    # The file goes to Blob Storage block by block while the request body is read
+    request.upload_handlers = [BlobUploadHandler(request)]
     if 'file' not in request.FILES:
         return JsonResponse({'error': 'No file provided'}, status=400)
 
     file = request.FILES['file']
-    file_content = file.read()
-    file_name = file.name
-
-    success = upload_file(file_content, file_name)
-    if success:
+    if file.error is None:
+        # Lecture media goes through the same endpoint; only transcripts are indexed and summarized
+        if (file.content_type or '').startswith('text/'):
+            get_executor().submit(index_transcript, file.name)
+            if settings.LESSON_SUMMARY_PRECOMPUTE:
+                get_executor().submit(precompute_lesson_summary, file.name)
         return JsonResponse({'message': 'File uploaded successfully'})
     else:
         return JsonResponse({'error': 'Failed to upload file'}, status=500)
@@ -369,6 +340,12 @@ def get_transcript(request, blob_name):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@require_http_methods(['GET', 'HEAD'])
+def download_transcript(request, blob_name):
+    # Streams the raw blob; supports Range, If-Range and ETag/Last-Modified conditional requests
+    return transcript_download(request, blob_name)
+
+
 @csrf_exempt
 def chatbot(request):
     if request.method == 'POST':
@@ -383,31 +360,48 @@ def chatbot(request):
         if transcript is None:
             return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
 
-        response = get_chatbot_response(message, transcript)
-        return JsonResponse({'response': response})
+        try:
+            if 'session_id' not in data:
+                return JsonResponse({'response': get_chatbot_response(message, transcript)})
+            # Session mode: send "session_id": null to start, then the returned id on each follow-up.
+            response, session_id = chat_sessions.reply(session_owner(request.user), data['session_id'], message,
+                                                       transcript)
+        except LLMUnavailable as e:
+            return unavailable_response(e)
+        return JsonResponse({'response': response, 'session_id': session_id})
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+@csrf_exempt
+@require_POST
+def chatbot_stream(request):
+    data = json.loads(request.body)
+    message = data.get('message')
+    transcript_name = data.get('transcript_name')
 
-def get_chatbot_response(message, transcript):
-    system_message = (
-        "You are an AI assistant helping students understand educational content. "
-        "Provide concise and accurate answers based on the transcript content. "
-        "Format your responses with key points and brief explanations."
-    )
+    if not message or not transcript_name:
+        return JsonResponse({'error': 'No message or transcript name provided'}, status=400)
 
-    prompt = f"{system_message}\n\nTranscript: {transcript}\n\nUser: {message}\nAI:"
+    transcript = download_file(transcript_name)
+    if transcript is None:
+        return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
 
-    response = requests.post('http://localhost:11434/api/generate', json={
-        'model': 'llama2',
-        'prompt': prompt,
-        'stream': False
-    })
+    if 'session_id' not in data:
+        return sse_response(sse_stream(stream_chatbot_response(message, transcript), CHAT_ERROR))
+    owner = session_owner(request.user)
+    session = chat_sessions.open(owner, data['session_id'], transcript)
+    return sse_response(sse_stream(chat_sessions.stream(owner, session, message, transcript), CHAT_ERROR,
+                                   {'session_id': session.session_id}))
 
-    if response.status_code == 200:
-        return response.json()['response']
-    else:
-        return "Sorry, I encountered an error while processing your request."
+
+@csrf_exempt
+@require_POST
+def chatbot_reset(request):
+    data = json.loads(request.body)
+    if not data.get('session_id'):
+        return JsonResponse({'error': 'No session id provided'}, status=400)
+    chat_sessions.reset(session_owner(request.user), data['session_id'])
+    return JsonResponse({'success': True})
 
 
 @csrf_exempt
@@ -424,41 +418,29 @@ def summarize_lesson(request):
         if transcript is None:
             return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
 
-        summary = get_lesson_summary(transcript)
+        summary = lesson_summaries.get(transcript)
         return JsonResponse({'summary': summary})
+    except LLMUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         logger.error(f"Error in summarize_lesson: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def get_lesson_summary(transcript):
-    system_message = """
-Summarize the key concepts from the lesson content below, ensuring a clear and concise presentation. Follow these guidelines strictly:
-
-1. Start with "Key Concepts in Data Science:" as the main header.
-2. Do not use bullet points or numbering.
-3. Present the summary as a cohesive paragraph.
-4. Focus on the most important information and key takeaways.
-5. Aim for a summary of about 100-150 words.
-
-Ensure the summary is clear, concise, and easy to understand.
-"""
+@csrf_exempt
+@require_POST
+def summarize_lesson_stream(request):
+    data = json.loads(request.body)
+    transcript_name = data.get('transcript_name')
 
-    prompt = f"{system_message}\n\nTranscript: {transcript}\n\nSummary:"
+    if not transcript_name:
+        return JsonResponse({'error': 'No transcript name provided'}, status=400)
 
-    response = requests.post('http://localhost:11434/api/generate', json={
-        'model': 'llama3.1',  # Changed from 'llama2' to 'llama3.1'
-        'prompt': prompt,
-        'stream': False
-    })
+    transcript = download_file(transcript_name)
+    if transcript is None:
+        return JsonResponse({'error': 'Failed to retrieve transcript'}, status=400)
 
-    if response.status_code == 200:
-        summary = response.json()['response']
-        if not summary.startswith("Key Concepts in Data Science:"):
-            summary = "Key Concepts in Data Science:\n\n" + summary
-        return summary
-    else:
-        return "Sorry, I encountered an error while summarizing the lesson."
+    return sse_response(sse_stream(lesson_summaries.stream(transcript), SUMMARY_ERROR))
 
 
 @csrf_exempt
@@ -468,56 +450,149 @@ def submit_assistance(request):
         message = data.get('message')
         is_assistance_request = data.get('is_assistance_request', False)
 
-        feedback = Feedback.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            text=message,
-            status='submitted',
-            is_assistance_request=is_assistance_request
-        )
-
+        result = None
         if not is_assistance_request:
             # Perform sentiment analysis using Azure API
-            client = authenticate_client()
-            sentiment_response = client.analyze_sentiment(documents=[message])[0]
-
-            # Save to Cosmos DB
-            cosmos_data = {
-                'id': str(uuid.uuid4()),
-                'feedback_text': message,
-                'sentiment': sentiment_response.sentiment,
-                'positive_score': sentiment_response.confidence_scores.positive,
-                'neutral_score': sentiment_response.confidence_scores.neutral,
-                'negative_score': sentiment_response.confidence_scores.negative,
-                'timestamp': datetime.utcnow().isoformat(),
-                'user_id': str(request.user.id) if request.user.is_authenticated else 'anonymous'
-            }
-            cosmos_db.store_feedback(cosmos_data)
+            result = analysis_engine.analyze(message, opinion_mining=False, key_phrases=False)
+
+        # The Cosmos item is queued in the same transaction as the local row
+        with transaction.atomic():
+            feedback = Feedback.objects.create(
+                user=request.user if request.user.is_authenticated else None,
+                text=message,
+                status='submitted',
+                is_assistance_request=is_assistance_request,
+                **(result.to_feedback_fields() if result is not None else {})
+            )
+
+            if result is not None:
+                cosmos_data = {
+                    'id': str(uuid.uuid4()),
+                    'feedback_text': message,
+                    'sentiment': result.sentiment,
+                    'positive_score': result.scores.positive,
+                    'neutral_score': result.scores.neutral,
+                    'negative_score': result.scores.negative,
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'user_id': str(request.user.id) if request.user.is_authenticated else 'anonymous'
+                }
+                enqueue_cosmos_write(cosmos_data)
+            publish_feedback_on_commit(feedback)
 
         return JsonResponse({'status': 'success'})
 
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
 
-@cache_page(60 * 15)  # Cache for 15 minutes
 def get_sentiment_summary(request):
+    # Read from the incrementally maintained rollups, so cost is O(buckets) and there is no staleness
     try:
-        query = """
-        SELECT 
-            c.overall_sentiment,
-            COUNT(1) as count,
-            AVG(c.confidence_score_positive) as avg_positive,
-            AVG(c.confidence_score_neutral) as avg_neutral,
-            AVG(c.confidence_score_negative) as avg_negative
-        FROM c
-        GROUP BY c.overall_sentiment
-        """
-        results = cosmos_db.get_sentiment_results(query)
-        return JsonResponse(results, safe=False)
+        return JsonResponse(sentiment_summary(), safe=False)
     except Exception as e:
         logger.error(f"Error in get_sentiment_summary: {str(e)}", exc_info=True)
         return JsonResponse({'error': 'Failed to retrieve sentiment summary'}, status=500)
 
 
+@csrf_exempt
+@login_required
+@user_passes_test(lambda u: u.role == 'admin')
+@require_POST
+def import_feedback(request):
+    if 'file' not in request.FILES:
+        return JsonResponse({'error': 'No file provided'}, status=400)
+
+    upload = request.FILES['file']
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(upload.name)}")
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+
+    job_id = start_job('import', import_uploaded_file, path,
+                       text_field=request.POST.get('text_field', 'feedback'), user=request.user)
+    return JsonResponse({'job_id': job_id, 'status_url': reverse('job_status', args=[job_id])}, status=202)
+
+
+@login_required
+@user_passes_test(lambda u: u.role in ['manager', 'admin'])
+def job_status(request, job_id):
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({'error': 'Unknown job'}, status=404)
+    return JsonResponse(job)
+
+
+@login_required
+@user_passes_test(lambda u: u.role == 'admin')
+def performance_stats(request):
+    return JsonResponse({
+        'connections': client_stats(),
+        'analysis_cache': analysis_cache.stats(),
+        'transcript_cache': transcript_cache.stats(),
+        'llm_gateway': llm_gateway.stats(),
+    })
+
+
+@login_required
+@user_passes_test(lambda u: u.role in ['manager', 'admin'])
+def sentiment_trends(request):
+    interval = request.GET.get('interval', 'day')
+    sentiment = request.GET.get('sentiment')
+    if interval not in INTERVALS:
+        return JsonResponse({'error': f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+    if sentiment and sentiment not in SENTIMENT_CODES:
+        return JsonResponse({'error': 'Unknown sentiment'}, status=400)
+
+    try:
+        end = datetime.fromisoformat(request.GET['end']) if 'end' in request.GET else datetime.utcnow()
+        start = datetime.fromisoformat(request.GET['start']) if 'start' in request.GET \
+            else end - timedelta(seconds=INTERVALS[interval] * 30)
+        window = int(request.GET['window']) if 'window' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or window'}, status=400)
+
+    if sentiment_snapshot.is_stale():
+        refresh_snapshot_in_background()
+
+    try:
+        buckets = sentiment_snapshot.trends(interval, start, end, sentiment=sentiment,
+                                            user_id=request.GET.get('user_id'), window=window)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'interval': interval,
+        'refreshed_at': sentiment_snapshot.meta()['refreshed_at'],
+        'buckets': buckets
+    })
+
+
+@login_required
+@user_passes_test(lambda u: u.role in ['manager', 'admin'])
+def feedback_results(request):
+    # Paged Cosmos results; ?month=YYYY-MM keeps the query on a single partition
+    month = request.GET.get('month')
+    try:
+        page_size = min(int(request.GET.get('page_size', 50)), 500)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page_size'}, status=400)
+
+    try:
+        page = cosmos_db.query_page(
+            'SELECT * FROM c ORDER BY c.timestamp DESC',
+            partition_key=month,
+            page_size=page_size,
+            continuation=request.GET.get('continuation')
+        )
+        return JsonResponse({
+            'items': page.items,
+            'continuation': page.continuation,
+            'request_charge': page.request_charge
+        })
+    except Exception as e:
+        logger.error(f"Error in feedback_results: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'Failed to retrieve feedback results'}, status=500)
+
+
 @login_required
 def learn_now(request):
     video_url = f"https://{settings.AZURE_STORAGE_ACCOUNT_NAME}.blob.core.windows.net/{settings.AZURE_STORAGE_CONTAINER_NAME}/Introduction_to_Data_and_Data_Science_Final.mp4"
@@ -51,6 +51,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let isFirstInteraction = true;
     let currentAction = '';
+    let chatSessionId = null;  // server-side chat session, so follow-up questions skip the transcript
 
     chatbotToggle.addEventListener('click', () => {
         chatbotWindow.classList.toggle('hidden');
@@ -171,7 +172,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     body: JSON.stringify({
                         message: message,
                         action: currentAction,
-                        transcript_name: document.querySelector('#transcript-select') ? document.querySelector('#transcript-select').value : ''
+                        transcript_name: document.querySelector('#transcript-select') ? document.querySelector('#transcript-select').value : '',
+                        session_id: chatSessionId
                     })
                 })
                     .then(response => response.json())
@@ -179,6 +181,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         if (data.error) {
                             throw new Error(data.error);
                         }
+                        chatSessionId = data.session_id;
                         appendMessage('bot', data.response);
                     })
                     .catch(error => {